@@ -0,0 +1,177 @@
+"""
+Driver de carga HTTP para `app_flask`.
+
+Por defecto usa el cliente de pruebas de Flask en el mismo proceso (mide el
+coste de la aplicación sin red); con `--url` ataca un servidor ya arrancado.
+Informa, por ruta y en total, de latencias p50/p95/p99, throughput y memoria.
+
+Uso (desde backend/):
+    python benchmarks/bench_http.py --data /tmp/catalog_100k/datos_procesados.csv --output http.json
+    python benchmarks/bench_http.py --url http://127.0.0.1:5000 --concurrency 16 --duration 30
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from common import compare_to_baseline, environment, memory_mb, save_results, summarize
+
+# Mezcla de peticiones representativa: (nombre, método, ruta, generador del cuerpo JSON)
+REQUEST_MIX = [
+    ('get-recommendations', 'POST', lambda rnd, n: ('/api/get-recommendations',
+                                                    {'song_idx': rnd.randrange(n)})),
+    ('get-recommendations-batch', 'POST', lambda rnd, n: ('/api/get-recommendations/batch',
+                                                          {'song_indices': [rnd.randrange(n) for _ in range(50)]})),
+    ('popular-songs', 'GET', lambda rnd, n: (f'/api/popular-songs?limit={rnd.choice([20, 50, 100])}', None)),
+    ('songs-by-mood', 'GET', lambda rnd, n: (f"/api/songs-by-mood?mood={rnd.choice(['feliz', 'triste', 'ansiedad', 'energía'])}&limit=10", None)),
+    ('songs-by-feature', 'GET', lambda rnd, n: (f"/api/songs-by-feature?feature={rnd.choice(['recent', 'danceable', 'acoustic', 'live'])}&limit=20", None)),
+    ('search-suggestions', 'GET', lambda rnd, n: (f"/api/search-suggestions?q={rnd.choice(['lo', 'lov', 'nigh', 'the', 'sum', 'mo'])}&limit=10", None)),
+    ('find-song', 'POST', lambda rnd, n: ('/api/find-song', {'name': rnd.choice(['Love', 'Night', 'Queen', 'Beatles'])})),
+]
+
+
+def test_client_sender(app):
+    """Enviar peticiones con el cliente de pruebas de Flask (un cliente por hilo)."""
+    local = threading.local()
+
+    def send(method, path, body):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        response = local.client.open(path, method=method, json=body)
+        response.get_data()
+        return response.status_code
+    return send
+
+
+def url_sender(base_url):
+    """Enviar peticiones reales por HTTP a un servidor en `base_url`."""
+    def send(method, path, body):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+    return send
+
+
+def wait_ready(base_url, timeout=120):
+    """Esperar a que `/api/ready` responda 200."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/api/ready', timeout=2) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'El servidor en {base_url} no estuvo listo a tiempo')
+
+
+def run_load(send, duration, concurrency, n_rows, seed=0):
+    """
+    Lanzar la mezcla de peticiones desde `concurrency` hilos durante `duration` segundos.
+
+    Returns:
+        dict: {'total': resumen, '<ruta>': resumen, ...} con errores por ruta
+    """
+    by_route = {name: [] for name, _, _ in REQUEST_MIX}
+    errors = {name: 0 for name, _, _ in REQUEST_MIX}
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client(worker_id):
+        rnd = random.Random(seed + worker_id)
+        local = {name: [] for name in by_route}
+        local_errors = {name: 0 for name in by_route}
+        while time.time() < deadline:
+            name, method, make = rnd.choice(REQUEST_MIX)
+            path, body = make(rnd, n_rows)
+            start = time.perf_counter()
+            try:
+                ok = send(method, path, body) < 400
+            except (urllib.error.URLError, ConnectionError):
+                ok = False
+            if ok:
+                local[name].append(time.perf_counter() - start)
+            else:
+                local_errors[name] += 1
+        with lock:
+            for name in by_route:
+                by_route[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {'total': summarize([t for values in by_route.values() for t in values], elapsed)}
+    results['total']['errors'] = sum(errors.values())
+    for name, values in by_route.items():
+        results[name] = summarize(values, elapsed)
+        results[name]['errors'] = errors[name]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', help='CSV del catálogo para el modo en proceso')
+    parser.add_argument('--url', help='URL de un servidor ya arrancado (p. ej. http://127.0.0.1:5000)')
+    parser.add_argument('--rows', type=int, help='Canciones del catálogo del servidor (modo --url)')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--cache', action='store_true', help='Mantener activa la caché de respuestas')
+    parser.add_argument('--output', help='Guardar los resultados en un JSON')
+    parser.add_argument('--baseline', help='JSON con una ejecución anterior para comparar')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.url:
+        wait_ready(args.url)
+        send = url_sender(args.url.rstrip('/'))
+        n_rows = args.rows or 1000
+    else:
+        if args.data:
+            os.environ['HARMONIC_DATA_PATH'] = os.path.abspath(args.data)
+        if not args.cache:
+            # Medir el trabajo real del recomendador, no las respuestas cacheadas
+            os.environ['RESPONSE_CACHE_MAX_ENTRIES'] = '0'
+        import app_flask
+        app_flask.warm_up()
+        send = test_client_sender(app_flask.app)
+        n_rows = len(app_flask.get_recommender().df)
+
+    run_load(send, min(2, args.duration), args.concurrency, n_rows)  # calentamiento
+    benchmarks = run_load(send, args.duration, args.concurrency, n_rows, seed=1)
+    if not args.url:
+        benchmarks['memory'] = {k: v for k, v in memory_mb().items() if v is not None}
+
+    for name, stats in benchmarks.items():
+        if 'p50_ms' in stats:
+            print(f"{name:28} n={stats['n']:6} p50={stats['p50_ms']:8.2f}ms p95={stats['p95_ms']:8.2f}ms "
+                  f"p99={stats['p99_ms']:8.2f}ms {stats['throughput_rps']:9.1f} req/s errores={stats['errors']}")
+
+    results = {'environment': environment(), 'mode': 'url' if args.url else 'test_client',
+               'concurrency': args.concurrency, 'benchmarks': benchmarks}
+    if args.output:
+        save_results(results, args.output)
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Micro-benchmarks de los métodos de `SongRecommender`.
+
+Mide el tiempo de inicialización (la primera ejecución sobre un CSV nuevo
+incluye la compilación del snapshot), la memoria del proceso y las latencias
+p50/p95/p99 de cada método público con parámetros aleatorios pero
+reproducibles.
+
+Uso (desde backend/):
+    python benchmarks/bench_recommender.py --data /tmp/catalog_100k/datos_procesados.csv \\
+        --output results.json [--baseline baseline.json]
+"""
+import argparse
+import random
+import sys
+import time
+
+from common import compare_to_baseline, environment, memory_mb, save_results, time_calls
+from recommender import SongRecommender
+
+
+def build_cases(recommender, iterations, seed=0):
+    """Parámetros de cada benchmark: {nombre: (función, [args, ...])}."""
+    rnd = random.Random(seed)
+    n_rows = len(recommender.df)
+    names = recommender.df['name'].to_numpy()
+    rows = [rnd.randrange(n_rows) for _ in range(iterations)]
+    prefixes = [str(names[row])[:rnd.randint(2, 5)] for row in rows]
+    moods = list(recommender.rules.aliases)
+    features = list(recommender.rules.features)
+
+    return {
+        'find_songs': (recommender.find_songs, [(str(names[row]),) for row in rows]),
+        'search_suggestions': (recommender.search_suggestions, [(p, 10) for p in prefixes]),
+        'search_suggestions_ranked': (recommender.search_suggestions, [(p, 10, True) for p in prefixes]),
+        'get_popular_songs_20': (recommender.get_popular_songs, [(20,)] * iterations),
+        'get_popular_songs_500': (recommender.get_popular_songs, [(500,)] * iterations),
+        'get_songs_by_mood': (recommender.get_songs_by_mood,
+                              [(rnd.choice(moods), 10) for _ in range(iterations)]),
+        'get_songs_by_feature': (recommender.get_songs_by_feature,
+                                 [(rnd.choice(features), 20) for _ in range(iterations)]),
+        'get_songs_by_filter': (recommender.get_songs_by_filter,
+                                [([('tempo_original', '>=', 90 + rnd.randrange(40)),
+                                   ('popularity_original', '>=', 50)], None, 20)
+                                 for _ in range(iterations)]),
+        'get_recommendations': (recommender.get_recommendations, [(row,) for row in rows]),
+        'get_recommendations_batch_100': (recommender.get_recommendations_batch,
+                                          [([rnd.randrange(n_rows) for _ in range(100)], 5)
+                                           for _ in range(max(1, iterations // 10))]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', help='CSV del catálogo (por defecto, el del backend)')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--only', nargs='*', help='Ejecutar solo estos benchmarks')
+    parser.add_argument('--output', help='Guardar los resultados en un JSON')
+    parser.add_argument('--baseline', help='JSON con una ejecución anterior para comparar')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Variación relativa a partir de la cual se marca una regresión')
+    args = parser.parse_args()
+
+    memory_before = memory_mb()
+    start = time.perf_counter()
+    recommender = SongRecommender(data_path=args.data)
+    init_seconds = time.perf_counter() - start
+
+    results = {
+        'environment': environment(),
+        'catalog': {'rows': len(recommender.df), 'path': recommender.data_path},
+        'benchmarks': {
+            'init': {'seconds': init_seconds},
+            'memory': {key: value for key, value in memory_mb().items() if value is not None},
+        },
+    }
+    memory_after = memory_mb()
+    for key in ('rss_mb', 'anon_mb'):
+        results['benchmarks']['memory'][key.replace('_mb', '_delta_mb')] = (
+            (memory_after[key] or 0) - (memory_before[key] or 0))
+
+    for name, (fn, calls) in build_cases(recommender, args.iterations).items():
+        if args.only and name not in args.only:
+            continue
+        fn(*calls[0])  # primera llamada fuera de la medición
+        results['benchmarks'][name] = stats = time_calls(fn, calls)
+        print(f"{name:32} n={stats['n']:5} p50={stats['p50_ms']:8.3f}ms "
+              f"p95={stats['p95_ms']:8.3f}ms p99={stats['p99_ms']:8.3f}ms "
+              f"{stats['throughput_rps']:10.1f} ops/s")
+
+    memory = results['benchmarks']['memory']
+    print(f"init={init_seconds:.3f}s  RSS={memory.get('rss_mb', 0):.0f}MB "
+          f"anónima={memory.get('anon_mb', 0):.0f}MB (catálogo: +{memory['anon_delta_mb']:.0f}MB)")
+
+    if args.output:
+        save_results(results, args.output)
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Coste de servir las páginas del frontend con y sin `static_assets`.
+
+Simula cargas de página de un navegador (la página y sus imágenes) con el
+cliente de pruebas de Flask y compara dos aplicaciones mínimas con las rutas
+del frontend: la de `static_assets` y la anterior (`send_from_directory`
+resolviendo la ruta del frontend en cada petición, sin compresión ni
+Cache-Control):
+
+- primera visita: caché del navegador vacía,
+- visita repetida: el navegador revalida con If-None-Match y no vuelve a
+  pedir las URLs que recibió con `immutable`.
+
+Informa, por escenario, de bytes transferidos, peticiones y tiempo de CPU del
+servidor por carga de página. Ejecutar antes `python static_assets.py` para
+medir con las variantes precomprimidas.
+
+Uso (desde backend/):
+    python benchmarks/bench_static.py [--iterations 200] [--output static.json]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+from flask import Flask, abort, request, send_from_directory
+
+from common import compare_to_baseline, environment, save_results, summarize
+
+# Páginas del frontend (ruta -> fichero) y cabecera Accept-Encoding de un navegador actual
+PAGES = {'/': 'index.html', '/noticia-musica-salud': 'noticia-musica-salud.html',
+         '/newspaper-2035': 'newspaper-2035.html', '/article-detail-2035': 'article-detail-2035.html'}
+ACCEPT_ENCODING = 'gzip, deflate, br'
+
+
+def legacy_app():
+    """Las rutas del frontend tal y como se servían antes de `static_assets`."""
+    from static_assets import get_frontend_path
+
+    app = Flask('legacy_static')
+    for route, filename in PAGES.items():
+        app.add_url_rule(route, filename, lambda filename=filename: send_from_directory(get_frontend_path(), filename))
+    app.add_url_rule('/images/<path:filename>', 'images', lambda filename: send_from_directory(
+        os.path.join(get_frontend_path(), 'images'), filename))
+    return app
+
+
+def static_assets_app():
+    """Las mismas rutas servidas con `static_assets` (como en app_flask)."""
+    from static_assets import get_frontend_path, load_static_assets, send_asset
+
+    assets = load_static_assets(get_frontend_path())
+    app = Flask('static_assets')
+
+    def serve(name):
+        asset = assets.get(name)
+        if asset is None:
+            abort(404)
+        return send_asset(asset, request.args.get('v'))
+    for route, filename in PAGES.items():
+        app.add_url_rule(route, filename, lambda filename=filename: serve(filename))
+    app.add_url_rule('/images/<path:filename>', 'images', lambda filename: serve(f'images/{filename}'))
+    return app
+
+
+def decoded_body(response):
+    """Cuerpo de la respuesta sin la codificación de transferencia."""
+    if response.headers.get('Content-Encoding') == 'gzip':
+        import gzip
+        return gzip.decompress(response.data)
+    if response.headers.get('Content-Encoding') == 'br':
+        import brotli
+        return brotli.decompress(response.data)
+    return response.data
+
+
+class Browser:
+    """Caché mínima de un navegador: ETags, URLs inmutables y HTML ya descargados."""
+
+    def __init__(self, client):
+        self.client = client
+        self.etags = {}
+        self.immutable = set()
+        self.pages = {}
+
+    def fetch(self, url, stats):
+        if url in self.immutable:
+            return None
+        headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        if url in self.etags:
+            headers['If-None-Match'] = self.etags[url]
+        start, cpu_start = time.perf_counter(), time.process_time()
+        response = self.client.get(url, headers=headers)
+        body = response.get_data()
+        stats['cpu'] += time.process_time() - cpu_start
+        stats['wall'] += time.perf_counter() - start
+        stats['requests'] += 1
+        stats['bytes'] += len(body) + sum(len(k) + len(v) + 4 for k, v in response.headers.items())
+        if response.status_code == 200:
+            if 'ETag' in response.headers:
+                self.etags[url] = response.headers['ETag']
+            if 'immutable' in response.headers.get('Cache-Control', ''):
+                self.immutable.add(url)
+        return response
+
+    def load_page(self, page, stats):
+        """Pedir una página y las imágenes que referencia."""
+        response = self.fetch(page, stats)
+        if response.status_code == 200:
+            self.pages[page] = decoded_body(response).decode('utf-8')
+        # Tras un 304, las imágenes son las del HTML cacheado
+        for image in re.findall(r'src="(images/[^"]+)"', self.pages.get(page, '')):
+            self.fetch('/' + image, stats)
+
+
+def run_scenario(app, repeat, iterations):
+    """Latencias y medias de bytes, peticiones y CPU por carga de página."""
+    pages = list(PAGES)
+    latencies = []
+    stats = {'bytes': 0, 'requests': 0, 'cpu': 0.0, 'wall': 0.0}
+    for i in range(iterations):
+        browser = Browser(app.test_client())
+        page = pages[i % len(pages)]
+        if repeat:
+            browser.load_page(page, dict.fromkeys(stats, 0))
+        # Solo cuentan las peticiones (no la descompresión en el "navegador")
+        start = stats['wall']
+        browser.load_page(page, stats)
+        latencies.append(stats['wall'] - start)
+    result = summarize(latencies)
+    result.update(page_load_bytes=stats['bytes'] / iterations,
+                  page_load_requests=stats['requests'] / iterations,
+                  page_load_cpu_ms=stats['cpu'] * 1000 / iterations)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output', help='Guardar los resultados en un JSON')
+    parser.add_argument('--baseline', help='JSON con una ejecución anterior para comparar')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args()
+
+    apps = {'legacy': legacy_app(), 'static_assets': static_assets_app()}
+    benchmarks = {}
+    for name, app in apps.items():
+        run_scenario(app, False, len(PAGES))  # calentamiento
+        for scenario, repeat in (('first_visit', False), ('repeat_visit', True)):
+            benchmarks[f'{name}/{scenario}'] = run_scenario(app, repeat, args.iterations)
+
+    for name, stats in benchmarks.items():
+        print(f"{name:30} {stats['page_load_bytes'] / 1024:9.1f} KB {stats['page_load_requests']:5.1f} peticiones "
+              f"CPU {stats['page_load_cpu_ms']:7.2f}ms p50={stats['p50_ms']:7.2f}ms")
+    for scenario in ('first_visit', 'repeat_visit'):
+        before, after = benchmarks[f'legacy/{scenario}'], benchmarks[f'static_assets/{scenario}']
+        print(f"{scenario}: bytes {after['page_load_bytes'] / before['page_load_bytes'] - 1:+.0%}, "
+              f"peticiones {after['page_load_requests'] / before['page_load_requests'] - 1:+.0%}, "
+              f"CPU {after['page_load_cpu_ms'] / before['page_load_cpu_ms'] - 1:+.0%} por carga de página")
+
+    results = {'environment': environment(), 'iterations': args.iterations, 'benchmarks': benchmarks}
+    if args.output:
+        save_results(results, args.output)
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Utilidades compartidas por los benchmarks: estadísticas de latencia, memoria
+del proceso y comparación de resultados con una ejecución base.
+"""
+import json
+import os
+import platform
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Permitir importar los módulos del backend al ejecutar los scripts directamente
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Sufijos de las métricas en las que un valor mayor es peor (el resto, como throughput, al revés)
+LOWER_IS_BETTER = ('_ms', '_mb', 'seconds', '_bytes', '_requests')
+
+
+def percentile(values, pct):
+    """Percentil por el método del vecino más cercano (sobre valores ordenados)."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(latencies, elapsed=None):
+    """
+    Resumen de una lista de latencias en segundos.
+
+    Returns:
+        dict: n, media, p50/p95/p99 en milisegundos y throughput si se indica `elapsed`
+    """
+    summary = {'n': len(latencies)}
+    if latencies:
+        summary.update(mean_ms=sum(latencies) / len(latencies) * 1000,
+                       p50_ms=percentile(latencies, 50) * 1000,
+                       p95_ms=percentile(latencies, 95) * 1000,
+                       p99_ms=percentile(latencies, 99) * 1000)
+    if elapsed:
+        summary['throughput_rps'] = len(latencies) / elapsed
+    return summary
+
+
+def time_calls(fn, args_list):
+    """Ejecutar `fn(*args)` para cada elemento de `args_list` y devolver su resumen."""
+    latencies = []
+    start = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def memory_mb(pid=None):
+    """
+    RSS, PSS y memoria anónima de un proceso en MB (Linux; None si no está disponible).
+
+    La memoria anónima (heap, arrays y objetos Python) es lo que cuesta cada
+    worker adicional; las páginas de los ficheros mapeados del snapshot se
+    comparten a través de la caché del sistema operativo.
+    """
+    pid = pid or os.getpid()
+    usage = {'rss_mb': None, 'pss_mb': None, 'anon_mb': None}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Rss:'):
+                    usage['rss_mb'] = int(line.split()[1]) / 1024
+                elif line.startswith('Pss:'):
+                    usage['pss_mb'] = int(line.split()[1]) / 1024
+                elif line.startswith('Anonymous:'):
+                    usage['anon_mb'] = int(line.split()[1]) / 1024
+    except OSError:
+        try:
+            import resource
+            usage['rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        except ImportError:
+            pass
+    return usage
+
+
+def environment():
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def compare_to_baseline(results, baseline_path, threshold=0.10):
+    """
+    Comparar métricas con un JSON base e imprimir las variaciones.
+
+    Se recorren los bloques `{nombre: {métrica: valor}}` de `results['benchmarks']`.
+
+    Returns:
+        list: Regresiones (nombre, métrica, base, actual) por encima de `threshold`
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f).get('benchmarks', {})
+
+    regressions = []
+    for name, metrics in results.get('benchmarks', {}).items():
+        for metric, value in metrics.items():
+            base = baseline.get(name, {}).get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(base, (int, float)) or not base:
+                continue
+            change = (value - base) / base
+            worse = change > threshold if metric.endswith(LOWER_IS_BETTER) else change < -threshold
+            marker = '  <-- REGRESIÓN' if worse and metric != 'n' else ''
+            print(f'{name:40} {metric:15} {base:12.3f} -> {value:12.3f} ({change:+.1%}){marker}')
+            if marker:
+                regressions.append((name, metric, base, value))
+    return regressions
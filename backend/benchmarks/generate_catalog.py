@@ -0,0 +1,123 @@
+"""
+Generador de catálogos sintéticos con el esquema de `datos_procesados.csv`.
+
+Produce columnas escaladas en [0, 1], sus `*_original`, nombres y listas de
+artistas con el formato de Spotify ("['A', 'B']") y un `cluster` asignado por
+centroide más cercano en el espacio de `NUMERIC_FEATURES`, de modo que los
+clusters tienen sentido para los índices KNN.
+
+Uso (desde backend/):
+    python benchmarks/generate_catalog.py --rows 100000 --output /tmp/catalog_100k/datos_procesados.csv
+    python benchmarks/generate_catalog.py --preset 1m --output /tmp/catalog_1m/datos_procesados.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from common import BACKEND_DIR  # noqa: F401  (añade backend/ al sys.path)
+from catalog import NUMERIC_FEATURES
+
+PRESETS = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+WORDS = ['love', 'night', 'yesterday', 'blue', 'dance', 'heart', 'rain', 'fire', 'moon',
+         'sky', 'river', 'dream', 'gold', 'road', 'home', 'corazón', 'noche', 'amor',
+         'luna', 'vida', 'summer', 'baby', 'girl', 'time', 'world', 'light', 'soul',
+         'city', 'feel', 'star', 'wild', 'young', 'forever', 'tonight', 'sueño', 'mar']
+
+FIRST = ['The', 'Los', 'DJ', 'Lil', 'Big', 'Little', 'Saint', 'Miss', 'Mister', 'La']
+LAST = ['Beatles', 'Stones', 'Queen', 'Adele', 'Shakira', 'Sinatra', 'Punk', 'Rosalía',
+        'Davis', 'Beyoncé', 'Coldplay', 'Drake', 'Bunny', 'Marley', 'Jackson', 'Swift',
+        'Presley', 'Cash', 'Wonder', 'Gaye', 'Franklin', 'Hendrix', 'Joplin', 'Parton']
+
+
+def make_artists(rng, n_artists):
+    """Vocabulario de artistas únicos (nombres de una o dos palabras y con números)."""
+    names = set()
+    while len(names) < n_artists:
+        parts = [rng.choice(FIRST), rng.choice(LAST)] if rng.random() < 0.6 else [rng.choice(LAST)]
+        if len(names) >= len(FIRST) * len(LAST):
+            parts.append(str(rng.integers(1, 10_000)))
+        names.add(' '.join(parts))
+    return np.array(sorted(names), dtype=object)
+
+
+def generate(n_rows, n_clusters=10, seed=0):
+    """
+    Generar un DataFrame sintético.
+
+    Args:
+        n_rows (int): Número de canciones
+        n_clusters (int): Número de clusters
+        seed (int): Semilla del generador aleatorio
+
+    Returns:
+        pd.DataFrame: Catálogo con el esquema de datos_procesados.csv
+    """
+    rng = np.random.default_rng(seed)
+
+    # Valores originales con distribuciones aproximadas a las de Spotify
+    year = rng.integers(1921, 2021, n_rows)
+    popularity = np.clip(rng.normal(35, 20, n_rows), 0, 100).round()
+    duration_ms = np.clip(rng.lognormal(12.3, 0.35, n_rows), 30_000, 1_500_000).astype(np.int64)
+    loudness = np.clip(rng.normal(-11, 5, n_rows), -60, 3)
+    tempo = np.clip(rng.normal(117, 30, n_rows), 30, 240)
+
+    df = pd.DataFrame({
+        'id': [f'{i:022x}' for i in range(n_rows)],
+        'name': [' '.join(rng.choice(WORDS, rng.integers(1, 4))).title() for _ in range(n_rows)],
+    })
+
+    # Artistas con frecuencia tipo Zipf (unos pocos muy prolíficos)
+    artists = make_artists(rng, max(50, n_rows // 20))
+    weights = 1 / np.arange(1, len(artists) + 1)
+    weights /= weights.sum()
+    counts = rng.choice([1, 1, 1, 2, 3], n_rows)
+    picked = rng.choice(len(artists), size=(n_rows, 3), p=weights)
+    df['artists'] = [str([str(a) for a in artists[row[:c]]]) for row, c in zip(picked, counts)]
+
+    df['year'] = (year - 1921) / 99
+    for column in ['acousticness', 'danceability', 'instrumentalness', 'liveness', 'speechiness']:
+        df[column] = rng.beta(2, 3, n_rows)
+    df['duration_ms'] = (duration_ms - duration_ms.min()) / max(1, duration_ms.max() - duration_ms.min())
+    df['loudness'] = (loudness + 60) / 63
+    df['popularity'] = popularity / 100
+    df['tempo'] = (tempo - 30) / 210
+
+    df['year_original'] = year
+    df['popularity_original'] = popularity
+    df['duration_ms_original'] = duration_ms
+    df['loudness_original'] = loudness
+    df['tempo_original'] = tempo
+
+    # Cluster = centroide más cercano (calculado por bloques para no disparar la memoria)
+    features = df[NUMERIC_FEATURES].to_numpy(dtype=np.float32)
+    centroids = features[rng.choice(n_rows, n_clusters, replace=False)]
+    clusters = np.empty(n_rows, dtype=np.int64)
+    for start in range(0, n_rows, 100_000):
+        block = features[start:start + 100_000]
+        distances = ((block[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        clusters[start:start + 100_000] = distances.argmin(axis=1)
+    df['cluster'] = clusters
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, help='Número de canciones')
+    parser.add_argument('--preset', choices=sorted(PRESETS), help='Tamaño predefinido')
+    parser.add_argument('--clusters', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', required=True, help='Ruta del CSV a generar')
+    args = parser.parse_args()
+
+    n_rows = args.rows or PRESETS.get(args.preset, PRESETS['10k'])
+    df = generate(n_rows, args.clusters, args.seed)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    df.to_csv(args.output, index=False)
+    print(f'{n_rows} canciones escritas en {args.output}')
+
+
+if __name__ == '__main__':
+    main()
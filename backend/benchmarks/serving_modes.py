@@ -0,0 +1,94 @@
+"""
+Prueba de carga: modo "sync" frente a modo "gthread" de gunicorn.
+
+Arranca el servidor con `gunicorn_config.py` en cada modo, espera a que
+`/api/ready` responda 200, lanza peticiones concurrentes durante un tiempo
+fijo y compara throughput, latencias y memoria (RSS y PSS de todos los
+procesos de gunicorn).
+
+Uso (desde backend/):
+    python benchmarks/serving_modes.py --duration 20 --concurrency 32 --output serving.json
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+
+from bench_http import run_load, url_sender, wait_ready
+from common import BACKEND_DIR, environment, memory_mb
+
+
+def process_tree(pid):
+    """PIDs del maestro de gunicorn y de todos sus workers."""
+    pids = [pid]
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                for child in f.read().split():
+                    pids.extend(process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def memory_usage(pid):
+    """RSS y PSS totales en MB (PSS reparte las páginas compartidas entre procesos)."""
+    usage = [memory_mb(p) for p in process_tree(pid)]
+    return {key: sum(u[key] or 0 for u in usage) for key in ('rss_mb', 'pss_mb')}
+
+
+def benchmark_mode(mode, port, args):
+    env = dict(os.environ, PORT=str(port), HARMONIC_WORKER_CLASS=mode,
+               WEB_CONCURRENCY=str(args.workers if mode == 'sync' else args.thread_workers),
+               HARMONIC_THREADS=str(args.threads),
+               # Sin caché de respuestas, para medir el trabajo real del recomendador
+               RESPONSE_CACHE_MAX_ENTRIES='0')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py',
+                               'app_flask:app'], cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        wait_ready(base_url)
+        send = url_sender(base_url)
+        run_load(send, min(2, args.duration), args.concurrency, args.rows)  # calentamiento
+        result = run_load(send, args.duration, args.concurrency, args.rows, seed=1)['total']
+        result.update(memory_usage(server.pid))
+        result.update(mode=mode, workers=int(env['WEB_CONCURRENCY']),
+                      threads=args.threads if mode == 'gthread' else 1)
+        return result
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() * 2 + 1,
+                        help='Workers en modo sync')
+    parser.add_argument('--thread-workers', type=int, default=os.cpu_count(),
+                        help='Workers en modo gthread')
+    parser.add_argument('--threads', type=int, default=8, help='Hilos por worker en modo gthread')
+    parser.add_argument('--rows', type=int, default=1000,
+                        help='Rango de índices de canción usados en las peticiones')
+    parser.add_argument('--port', type=int, default=5100)
+    parser.add_argument('--output', help='Guardar los resultados en un JSON')
+    args = parser.parse_args()
+
+    results = [benchmark_mode(mode, args.port + i, args) for i, mode in enumerate(['sync', 'gthread'])]
+    for r in results:
+        print(f"{r['mode']:8} workers={r['workers']:3} threads={r['threads']:2} "
+              f"{r['throughput_rps']:8.1f} req/s  p50={r['p50_ms']:.1f}ms p95={r['p95_ms']:.1f}ms "
+              f"p99={r['p99_ms']:.1f}ms  RSS={r['rss_mb']:.0f}MB PSS={r['pss_mb']:.0f}MB "
+              f"errores={r['errors']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'modes': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
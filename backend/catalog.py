@@ -0,0 +1,467 @@
+"""
+Snapshot binario columnar del catálogo de canciones.
+
+El CSV `datos_procesados.csv` se compila una sola vez a un directorio con:
+
+- una matriz float32 C-contigua con las `NUMERIC_FEATURES` (`features.npy`),
+  que es la que usan directamente los índices KNN,
+- un `.npy` por cada columna numérica; las enteras (año, duración, cluster)
+  con el dtype entero más estrecho que admite su rango,
+- tablas de strings (blob de texto + offsets) para `name`, `artists`, etc.;
+  las columnas con muchos valores repetidos se guardan como categorías
+  (códigos + valores únicos) y al cargarlas cada valor se crea una sola vez,
+- un `manifest.json` con la versión del formato y la huella del CSV de origen.
+
+Cada worker abre los `.npy` con `np.load(..., mmap_mode='r')`, de modo que
+las páginas se comparten entre procesos a través de la caché del sistema
+operativo y el arranque no necesita parsear el CSV.
+
+Quien compila o publica un snapshot toma el cerrojo `<snapshot>.lock`
+(`snapshot_lock`); un proceso que no encuentra el snapshot o lo encuentra a
+medio publicar espera a ese cerrojo y vuelve a mirar en lugar de leer el CSV.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin cerrojo entre procesos
+    fcntl = None
+
+SNAPSHOT_FORMAT_VERSION = 2
+SNAPSHOT_SUFFIX = '.snapshot'
+DATA_FILENAME = 'datos_procesados.csv'
+
+NUMERIC_FEATURES = ['acousticness', 'danceability', 'duration_ms',
+                    'instrumentalness', 'liveness', 'loudness',
+                    'popularity', 'speechiness', 'tempo']
+
+# Una columna de texto se guarda como categoría si tiene como mucho esta
+# proporción de valores distintos
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+REQUIRED_ORIGINAL_COLUMNS = ['year_original', 'popularity_original',
+                             'duration_ms_original', 'loudness_original',
+                             'tempo_original']
+
+# Cerrojos de snapshot que ya tiene el hilo actual (snapshot_lock es reentrante)
+_held_locks = threading.local()
+
+
+def resolve_data_path():
+    """
+    Obtener la ruta del CSV de datos.
+
+    `HARMONIC_DATA_PATH` permite indicarla explícitamente; si no, primero
+    intenta en backend/data/ (para Railway con Root Directory = backend) y
+    luego en ../data/ (para desarrollo local).
+    """
+    if os.environ.get('HARMONIC_DATA_PATH'):
+        data_path = os.environ['HARMONIC_DATA_PATH']
+        if not os.path.exists(data_path):
+            raise FileNotFoundError(f"No se encontró el archivo de datos en: {data_path}")
+        return data_path
+
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(backend_dir, 'data', DATA_FILENAME)
+
+    # Si no existe, intentar en la carpeta padre (desarrollo local)
+    if not os.path.exists(data_path):
+        parent_dir = os.path.dirname(backend_dir)
+        data_path = os.path.join(parent_dir, 'data', DATA_FILENAME)
+
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"No se encontró el archivo de datos en: {data_path}")
+
+    return data_path
+
+
+def snapshot_path_for(csv_path):
+    """Directorio del snapshot asociado a un CSV (junto al propio CSV)."""
+    base, _ = os.path.splitext(csv_path)
+    return base + SNAPSHOT_SUFFIX
+
+
+def source_fingerprint(csv_path):
+    """Huella del CSV (tamaño y fecha de modificación) para detectar cambios."""
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def catalog_version(fingerprint):
+    """Identificador corto de una versión del catálogo a partir de su huella."""
+    return hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def validate_columns(df):
+    """Verificar que tenemos todas las columnas originales necesarias."""
+    missing_columns = [col for col in REQUIRED_ORIGINAL_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Faltan columnas originales en el CSV: {missing_columns}")
+
+
+def _write_string_table(directory, name, values):
+    """Guardar una columna de texto como blob + offsets (en caracteres)."""
+    nulls = pd.isna(values)
+    strings = ['' if null else str(v) for v, null in zip(values, nulls)]
+    lengths = np.fromiter((len(s) for s in strings), dtype=np.int64, count=len(strings))
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    blob = ''.join(strings).encode('utf-8')
+    with open(os.path.join(directory, f'{name}.str'), 'wb') as f:
+        f.write(blob)
+    np.save(os.path.join(directory, f'{name}.offsets.npy'), offsets)
+    if nulls.any():
+        np.save(os.path.join(directory, f'{name}.nulls.npy'), np.asarray(nulls, dtype=bool))
+        return True
+    return False
+
+
+def _narrow_integers(values):
+    """Convertir una columna entera al dtype entero más estrecho que admite su rango."""
+    if values.dtype.kind not in 'iu' or not len(values):
+        return values
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= values.min() and values.max() <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+def _write_category_table(directory, name, values):
+    """Guardar una columna de texto repetitiva como códigos + tabla de valores únicos."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    has_nulls = _write_string_table(directory, name, uniques)
+    np.save(os.path.join(directory, f'{name}.codes.npy'), _narrow_integers(codes))
+    return has_nulls
+
+
+def _read_category_table(directory, name):
+    """
+    Reconstruir una columna categórica como array de objetos.
+
+    Los valores repetidos son el mismo objeto `str` (uno por valor único).
+    """
+    uniques = _read_string_table(directory, name, False)
+    codes = np.load(os.path.join(directory, f'{name}.codes.npy'))
+    values = np.empty(len(codes), dtype=object)
+    values[:] = np.nan
+    present = codes >= 0
+    values[present] = uniques[codes[present]]
+    return values
+
+
+def _read_string_table(directory, name, has_nulls):
+    """Reconstruir una columna de texto como array de objetos."""
+    with open(os.path.join(directory, f'{name}.str'), 'rb') as f:
+        text = f.read().decode('utf-8')
+    offsets = np.load(os.path.join(directory, f'{name}.offsets.npy')).tolist()
+    values = np.empty(len(offsets) - 1, dtype=object)
+    values[:] = [text[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+    if has_nulls:
+        nulls = np.load(os.path.join(directory, f'{name}.nulls.npy'))
+        values[nulls] = np.nan
+    return values
+
+
+@contextlib.contextmanager
+def snapshot_lock(snapshot_dir):
+    """
+    Cerrojo exclusivo entre procesos (`flock` sobre `<snapshot>.lock`) para
+    compilar, ampliar o publicar un snapshot.
+
+    Es reentrante dentro de un mismo hilo, así `load_snapshot` puede llamarse
+    con el cerrojo ya tomado.
+    """
+    held = _held_locks.__dict__.setdefault('paths', set())
+    lock_path = os.path.abspath(f'{snapshot_dir}.lock')
+    if lock_path in held:
+        yield
+        return
+    with open(lock_path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        held.add(lock_path)
+        try:
+            yield
+        finally:
+            held.discard(lock_path)
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def compile_snapshot(csv_path, snapshot_dir=None):
+    """
+    Compilar el CSV a un snapshot binario.
+
+    La escritura se hace en un directorio temporal que luego se renombra con
+    el cerrojo del snapshot tomado, así un worker nunca ve un snapshot a
+    medio escribir ni dos procesos lo compilan a la vez.
+
+    Args:
+        csv_path (str): Ruta del CSV de origen
+        snapshot_dir (str): Directorio destino (por defecto, junto al CSV)
+
+    Returns:
+        str: Ruta del snapshot compilado
+    """
+    snapshot_dir = snapshot_dir or snapshot_path_for(csv_path)
+    with snapshot_lock(snapshot_dir):
+        tmp_dir = f'{snapshot_dir}.tmp-{uuid.uuid4().hex}'
+        write_snapshot(csv_path, tmp_dir)
+        publish_directory(tmp_dir, snapshot_dir)
+    return snapshot_dir
+
+
+def write_snapshot(csv_path, directory):
+    """
+    Escribir el snapshot de un CSV en `directory` (que no debe existir), sin publicarlo.
+
+    Returns:
+        dict: Manifest escrito
+    """
+    fingerprint = source_fingerprint(csv_path)
+    df = pd.read_csv(csv_path)
+    validate_columns(df)
+
+    os.makedirs(directory)
+    try:
+        columns = []
+        for name in df.columns:
+            values = df[name].to_numpy()
+            if values.dtype.kind in 'biuf':
+                values = np.ascontiguousarray(_narrow_integers(values))
+                np.save(os.path.join(directory, f'{name}.npy'), values)
+                columns.append({'name': name, 'kind': 'numeric', 'dtype': values.dtype.str})
+            elif df[name].nunique(dropna=False) <= CATEGORY_MAX_UNIQUE_RATIO * len(df):
+                _write_category_table(directory, name, values)
+                columns.append({'name': name, 'kind': 'category'})
+            else:
+                has_nulls = _write_string_table(directory, name, values)
+                columns.append({'name': name, 'kind': 'string', 'nulls': has_nulls})
+
+        features = np.ascontiguousarray(df[NUMERIC_FEATURES].to_numpy(dtype=np.float32))
+        np.save(os.path.join(directory, 'features.npy'), features)
+
+        manifest = {
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'n_rows': int(len(df)),
+            'columns': columns,
+            'features': NUMERIC_FEATURES,
+            'source': fingerprint,
+        }
+        write_manifest(directory, manifest)
+
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    return manifest
+
+
+def write_manifest(directory, manifest):
+    """Escribir el `manifest.json` de un snapshot."""
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+
+def _append_string_table(snapshot, directory, name, has_nulls, values):
+    """Copiar una tabla de texto del snapshot añadiendo `values` al final."""
+    nulls = pd.isna(values)
+    strings = ['' if null else str(v) for v, null in zip(values, nulls)]
+    old_offsets = np.load(os.path.join(snapshot.path, f'{name}.offsets.npy'), mmap_mode='r')
+    lengths = np.fromiter((len(s) for s in strings), dtype=np.int64, count=len(strings))
+    offsets = np.concatenate([old_offsets, old_offsets[-1] + np.cumsum(lengths)])
+
+    with open(os.path.join(snapshot.path, f'{name}.str'), 'rb') as src, \
+            open(os.path.join(directory, f'{name}.str'), 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+        dst.write(''.join(strings).encode('utf-8'))
+    np.save(os.path.join(directory, f'{name}.offsets.npy'), offsets)
+
+    if has_nulls or nulls.any():
+        old_nulls = (np.load(os.path.join(snapshot.path, f'{name}.nulls.npy')) if has_nulls
+                     else np.zeros(len(old_offsets) - 1, dtype=bool))
+        np.save(os.path.join(directory, f'{name}.nulls.npy'),
+                np.concatenate([old_nulls, np.asarray(nulls, dtype=bool)]))
+        return True
+    return False
+
+
+def _append_category_table(snapshot, directory, name, values):
+    """Ampliar una columna categórica: los valores nuevos se añaden a la tabla de únicos."""
+    uniques = _read_string_table(snapshot.path, name, False)
+    old_codes = np.load(os.path.join(snapshot.path, f'{name}.codes.npy'), mmap_mode='r')
+
+    values = pd.Series(values, dtype=object)
+    codes = pd.Index(uniques).get_indexer(values)
+    unknown = (codes < 0) & values.notna().to_numpy()
+    extra_codes, extra_uniques = pd.factorize(values[unknown], use_na_sentinel=True)
+    codes[unknown] = len(uniques) + extra_codes
+
+    _write_string_table(directory, name, np.concatenate([uniques, extra_uniques.to_numpy(dtype=object)]))
+    all_codes = np.concatenate([old_codes.astype(np.int64), codes.astype(np.int64)])
+    np.save(os.path.join(directory, f'{name}.codes.npy'), _narrow_integers(all_codes))
+
+
+def extend_snapshot(snapshot, delta, snapshot_dir):
+    """
+    Escribir en `snapshot_dir` el snapshot con filas nuevas añadidas al final.
+
+    No se vuelve a leer el CSV: cada columna se copia del snapshot y se
+    amplía (las enteras se vuelven a estrechar con el rango combinado). El
+    manifest se escribe sin huella de origen (`source`), que se fija al
+    publicar, una vez añadidas las filas al CSV.
+
+    Args:
+        snapshot (CatalogSnapshot): Snapshot actual
+        delta (dict): {columna: array con los valores de las filas nuevas}
+        snapshot_dir (str): Directorio destino (debe existir y estar vacío)
+
+    Returns:
+        dict: Manifest escrito
+    """
+    n_new = len(delta[snapshot.feature_names[0]])
+    columns = []
+    for column in snapshot.manifest['columns']:
+        name = column['name']
+        values = delta[name]
+        if column['kind'] == 'numeric':
+            old = snapshot.columns[name]
+            if old.dtype.kind in 'iu' and values.dtype.kind in 'iu':
+                combined = _narrow_integers(np.concatenate([old.astype(np.int64), values.astype(np.int64)]))
+            else:
+                combined = np.concatenate([old, values])
+            np.save(os.path.join(snapshot_dir, f'{name}.npy'), np.ascontiguousarray(combined))
+            columns.append({'name': name, 'kind': 'numeric', 'dtype': combined.dtype.str})
+        elif column['kind'] == 'category':
+            _append_category_table(snapshot, snapshot_dir, name, values)
+            columns.append({'name': name, 'kind': 'category'})
+        else:
+            has_nulls = _append_string_table(snapshot, snapshot_dir, name, column['nulls'], values)
+            columns.append({'name': name, 'kind': 'string', 'nulls': has_nulls})
+
+    features = np.column_stack([np.asarray(delta[name], dtype=np.float32) for name in snapshot.feature_names])
+    np.save(os.path.join(snapshot_dir, 'features.npy'),
+            np.ascontiguousarray(np.concatenate([snapshot.features, features.reshape(n_new, -1)])))
+
+    manifest = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'n_rows': int(snapshot.n_rows + n_new),
+        'columns': columns,
+        'features': snapshot.feature_names,
+        'source': None,
+    }
+    write_manifest(snapshot_dir, manifest)
+    return manifest
+
+
+def publish_directory(tmp_dir, target_dir):
+    """
+    Sustituir `target_dir` por `tmp_dir` (ya escrito por completo) con renombrados.
+
+    Entre los dos renombrados `target_dir` no existe: los snapshots se
+    publican con `snapshot_lock` tomado para que los lectores esperen. Si otro
+    proceso publica a la vez y gana la carrera, se descarta `tmp_dir` y se
+    conserva el suyo.
+    """
+    try:
+        if os.path.exists(target_dir):
+            old_dir = f'{target_dir}.old-{uuid.uuid4().hex}'
+            os.rename(target_dir, old_dir)
+            os.rename(tmp_dir, target_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.rename(tmp_dir, target_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(target_dir):
+            raise
+
+
+class CatalogSnapshot:
+    """Vista de solo lectura sobre un snapshot compilado y memory-mapped."""
+
+    def __init__(self, snapshot_dir):
+        with open(os.path.join(snapshot_dir, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Versión de snapshot no soportada en {snapshot_dir}")
+
+        self.path = snapshot_dir
+        self.n_rows = self.manifest['n_rows']
+        self.feature_names = self.manifest['features']
+        self.features = np.load(os.path.join(snapshot_dir, 'features.npy'), mmap_mode='r')
+
+        self.columns = {}
+        for column in self.manifest['columns']:
+            name = column['name']
+            if column['kind'] == 'numeric':
+                self.columns[name] = np.load(os.path.join(snapshot_dir, f'{name}.npy'), mmap_mode='r')
+            elif column['kind'] == 'category':
+                self.columns[name] = _read_category_table(snapshot_dir, name)
+            else:
+                self.columns[name] = _read_string_table(snapshot_dir, name, column['nulls'])
+
+    def is_fresh(self, csv_path):
+        """Indicar si el snapshot corresponde a la versión actual del CSV."""
+        return self.manifest['source'] == source_fingerprint(csv_path)
+
+    def to_dataframe(self):
+        """DataFrame que comparte memoria con los arrays mapeados (sin copias)."""
+        return pd.DataFrame(self.columns, copy=False)
+
+
+def load_snapshot(csv_path, compile_if_stale=True):
+    """
+    Cargar el snapshot de un CSV, compilándolo si falta o está desactualizado.
+
+    Args:
+        csv_path (str): Ruta del CSV de origen
+        compile_if_stale (bool): Recompilar si el snapshot no coincide con el CSV
+
+    Returns:
+        CatalogSnapshot: Snapshot listo para usar, o None si no hay uno válido
+    """
+    snapshot_dir = snapshot_path_for(csv_path)
+    snapshot = _open_fresh_snapshot(csv_path, snapshot_dir)
+    if snapshot is not None:
+        return snapshot
+
+    # Falta, está desactualizado o se está publicando: esperar a quien lo esté
+    # escribiendo y volver a mirar antes de compilarlo
+    with snapshot_lock(snapshot_dir):
+        snapshot = _open_fresh_snapshot(csv_path, snapshot_dir)
+        if snapshot is None and compile_if_stale:
+            snapshot = CatalogSnapshot(compile_snapshot(csv_path, snapshot_dir))
+    return snapshot
+
+
+def _open_fresh_snapshot(csv_path, snapshot_dir):
+    """Snapshot de `snapshot_dir` si existe y corresponde al CSV actual, o None."""
+    if not os.path.exists(os.path.join(snapshot_dir, 'manifest.json')):
+        return None
+    try:
+        snapshot = CatalogSnapshot(snapshot_dir)
+        if snapshot.is_fresh(csv_path):
+            return snapshot
+    except (ValueError, KeyError, OSError):
+        pass
+    return None
+
+
+if __name__ == "__main__":
+    # Compilar el snapshot: python catalog.py [ruta/al/datos_procesados.csv]
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else resolve_data_path()
+    path = compile_snapshot(csv_path)
+    snapshot = CatalogSnapshot(path)
+    print(f"Snapshot compilado en {path} ({snapshot.n_rows} canciones)")
@@ -0,0 +1,171 @@
+"""
+Índices KNN por cluster precalculados.
+
+En lugar de entrenar un `NearestNeighbors` la primera vez que un worker ve un
+cluster, todos los índices (KD-tree) se construyen de una vez, se serializan
+dentro del snapshot del catálogo (`cluster_index.joblib`) y se cargan al
+arrancar. `verify_cluster_indexes` compara los vecinos del índice con una
+búsqueda euclídea exacta por fuerza bruta.
+"""
+import os
+import sys
+import uuid
+
+import joblib
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+INDEX_FORMAT_VERSION = 1
+INDEX_FILENAME = 'cluster_index.joblib'
+
+# Vecinos por consulta: la propia canción + 5 recomendaciones
+N_NEIGHBORS = 6
+
+
+def cluster_members(clusters, cluster_id):
+    """
+    Filas que forman parte del índice de un cluster.
+
+    Si el cluster es muy pequeño, se usan todas las canciones.
+    """
+    members = np.flatnonzero(clusters == cluster_id)
+    if len(members) < N_NEIGHBORS:
+        members = np.arange(len(clusters))
+    return members
+
+
+def build_cluster_index(X, members):
+    """
+    Crear y entrenar el modelo KNN para un conjunto de filas.
+
+    Args:
+        X (np.ndarray): Matriz de características (n_canciones, n_features)
+        members (np.ndarray): Filas globales que forman el cluster
+
+    Returns:
+        dict: {'model': NearestNeighbors, 'indices': filas globales}
+    """
+    knn = NearestNeighbors(n_neighbors=min(N_NEIGHBORS, len(members)),
+                           algorithm='kd_tree', metric='euclidean')
+    knn.fit(X[members])
+    return {'model': knn, 'indices': members}
+
+
+def build_cluster_indexes(X, clusters):
+    """Construir los índices de todos los clusters del catálogo."""
+    return {int(cluster_id): build_cluster_index(X, cluster_members(clusters, cluster_id))
+            for cluster_id in np.unique(clusters)}
+
+
+def update_cluster_indexes(indexes, X, clusters):
+    """
+    Reconstruir solo los índices cuyas filas han cambiado tras añadir canciones.
+
+    Las filas nuevas van al final del catálogo, así que un cluster ha cambiado
+    si y solo si ahora tiene más miembros (los clusters pequeños, indexados
+    con todo el catálogo, cambian siempre).
+
+    Returns:
+        tuple: (índices por cluster, clusters reconstruidos)
+    """
+    updated, rebuilt = {}, []
+    for cluster_id in np.unique(clusters):
+        members = cluster_members(clusters, cluster_id)
+        entry = indexes.get(int(cluster_id))
+        if entry is None or len(entry['indices']) != len(members):
+            entry = build_cluster_index(X, members)
+            rebuilt.append(int(cluster_id))
+        updated[int(cluster_id)] = entry
+    return updated, rebuilt
+
+
+def save_cluster_indexes(indexes, directory, n_rows):
+    """
+    Serializar los índices en `directory` de forma atómica.
+
+    Returns:
+        str: Ruta del fichero escrito
+    """
+    path = os.path.join(directory, INDEX_FILENAME)
+    tmp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+    payload = {'format_version': INDEX_FORMAT_VERSION, 'n_rows': int(n_rows), 'models': indexes}
+    try:
+        joblib.dump(payload, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def load_cluster_indexes(directory, n_rows):
+    """
+    Cargar los índices serializados de `directory`.
+
+    Returns:
+        dict: Índices por cluster, o None si no existen o no corresponden al catálogo
+    """
+    path = os.path.join(directory, INDEX_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        # Los árboles se mapean en memoria: sus arrays se comparten entre workers
+        payload = joblib.load(path, mmap_mode='r')
+    except Exception:
+        return None
+    if payload.get('format_version') != INDEX_FORMAT_VERSION or payload.get('n_rows') != n_rows:
+        return None
+    return payload['models']
+
+
+def exact_neighbors(X, members, row, k):
+    """Vecinos euclídeos exactos de `row` entre `members` (fuerza bruta)."""
+    distances = np.sqrt(((X[members].astype(np.float64) - X[row]) ** 2).sum(axis=1))
+    order = np.argsort(distances, kind='stable')[:k]
+    return members[order], distances[order]
+
+
+def verify_cluster_indexes(indexes, X, clusters, sample_size=200, seed=0):
+    """
+    Comparar los vecinos del índice con la búsqueda euclídea exacta.
+
+    Se comparan las distancias ordenadas, ya que ante empates el orden de los
+    índices puede variar legítimamente.
+
+    Args:
+        indexes (dict): Índices por cluster
+        X (np.ndarray): Matriz de características
+        clusters (np.ndarray): Cluster de cada canción
+        sample_size (int): Número de canciones a comprobar
+
+    Returns:
+        dict: {'checked': int, 'mismatches': [filas con resultados distintos]}
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(X), size=min(sample_size, len(X)), replace=False)
+    mismatches = []
+    for row in rows:
+        entry = indexes[int(clusters[row])]
+        k = entry['model'].n_neighbors
+        distances, _ = entry['model'].kneighbors(X[row].reshape(1, -1))
+        _, expected_distances = exact_neighbors(X, entry['indices'], row, k)
+        # Con distancias iguales, los índices solo pueden diferir por empates
+        if not np.allclose(distances[0], expected_distances, rtol=1e-6, atol=1e-9):
+            mismatches.append(int(row))
+    return {'checked': int(len(rows)), 'mismatches': mismatches}
+
+
+if __name__ == "__main__":
+    # Construir y verificar los índices: python cluster_index.py [ruta/al/csv]
+    from catalog import load_snapshot, resolve_data_path
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else resolve_data_path()
+    snapshot = load_snapshot(csv_path)
+    X = snapshot.features
+    clusters = np.asarray(snapshot.columns['cluster'])
+
+    indexes = build_cluster_indexes(X, clusters)
+    path = save_cluster_indexes(indexes, snapshot.path, snapshot.n_rows)
+    report = verify_cluster_indexes(load_cluster_indexes(snapshot.path, snapshot.n_rows), X, clusters)
+    print(f"{len(indexes)} índices guardados en {path}")
+    print(f"Verificación: {report['checked']} canciones, {len(report['mismatches'])} discrepancias")
@@ -1,10 +1,61 @@
+import gc
 import multiprocessing
 import os
+import tempfile
 
 bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+
+# Modo de servicio (HARMONIC_WORKER_CLASS):
+# - "sync": un proceso por petición concurrente (por defecto).
+# - "gthread": pocos procesos con varios hilos cada uno; los hilos comparten
+#   un único SongRecommender por proceso, así la memoria no crece con la
+#   concurrencia (las consultas son llamadas cortas a NumPy que liberan el GIL).
+worker_class = os.environ.get('HARMONIC_WORKER_CLASS', 'sync')
+if worker_class not in ('sync', 'gthread'):
+    raise ValueError(f"HARMONIC_WORKER_CLASS no válido: {worker_class!r} (sync o gthread)")
+if worker_class == 'gthread':
+    workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+    threads = int(os.environ.get('HARMONIC_THREADS', 8))
+else:
+    workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# Con varios workers, las sesiones de /api/playlist se comparten en disco para
+# que "dame N más" funcione en cualquier worker (entre máquinas distintas hace
+# falta un PLAYLIST_SESSION_DIR común o enrutamiento fijo por sesión)
+if workers > 1:
+    os.environ.setdefault('PLAYLIST_SESSION_DIR', os.path.join(tempfile.gettempdir(), 'harmonic-playlist-sessions'))
+
 timeout = 120
 keepalive = 5
 max_requests = 1000
 max_requests_jitter = 50
+
+# Preload: el catálogo, los índices y las vistas se construyen una sola vez en
+# el maestro y los workers (también los reciclados por max_requests) los
+# heredan con copy-on-write. HARMONIC_PRELOAD=0 vuelve a la carga por worker.
+preload_app = os.environ.get('HARMONIC_PRELOAD', '1') == '1'
+
+
+def when_ready(server):
+    """Con preload, calentar el recomendador en el maestro antes del primer fork."""
+    if not server.cfg.preload_app:
+        return
+    from app_flask import warm_up
+    state = warm_up()
+    server.log.info(f"Recomendador precargado en el maestro: arranque en frío "
+                    f"{state['cold_start_seconds']:.3f}s, warm-up {state['warmup_seconds']:.3f}s")
+    # Evitar que el recolector de basura toque (y copie) las páginas heredadas
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    """
+    Sin preload, cada worker se calienta antes de aceptar peticiones.
+
+    En ambos modos, cada worker arranca su vigilante del CSV
+    (HARMONIC_RELOAD_INTERVAL): los hilos del maestro no sobreviven al fork.
+    """
+    from app_flask import start_catalog_watcher, warm_up
+    if not worker.cfg.preload_app:
+        warm_up()
+    start_catalog_watcher()
@@ -0,0 +1,273 @@
+"""
+harmonic-build: compilación offline del catálogo y de todos sus artefactos.
+
+Lee el CSV y genera en un directorio de artefactos versionado:
+
+- el snapshot columnar con la matriz de características (`catalog.py`),
+- los índices KNN de cada cluster (`cluster_index.py`),
+- los índices de autocompletado y de títulos/artistas,
+- las vistas materializadas (populares, estados de ánimo, características),
+- opcionalmente, la tabla de vecinos precalculados (`--neighbors`).
+
+Los artefactos se construyen en paralelo en un pool de procesos (los índices
+KNN repartidos por clusters). Al terminar se escribe `build.json` con la
+versión del catálogo, el tiempo de cada etapa y el SHA-256 de cada fichero, y
+el directorio se publica de forma atómica.
+
+Por defecto el directorio es el snapshot junto al CSV, que el servidor ya
+carga sin trabajo adicional. Con `--output` se genera en otra ruta y el
+servidor lo usa con `HARMONIC_ARTIFACT_DIR` (sin necesitar el CSV).
+
+Uso:
+    python harmonic_build.py [ruta/al/csv] [--output DIR] [--workers N] [--neighbors]
+    python harmonic_build.py --verify DIR
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+from catalog import (CatalogSnapshot, catalog_version, publish_directory, resolve_data_path,
+                     snapshot_lock, snapshot_path_for, write_snapshot)
+from cluster_index import build_cluster_index, cluster_members, save_cluster_indexes
+from lookup_index import LookupIndex, save_lookup_index
+from neighbor_table import DEFAULT_TABLE_K, build_neighbor_table
+from rules import RuleEngine, load_rules
+from search_index import SearchIndex, save_search_index
+from views import MaterializedViews, save_views
+
+BUILD_FORMAT_VERSION = 1
+BUILD_MANIFEST = 'build.json'
+
+# Clusters por tarea al construir los índices KNN
+CLUSTERS_PER_TASK = 4
+
+# Catálogo abierto en cada proceso del pool
+_worker = {}
+
+
+def _open_catalog(directory):
+    """Snapshot y DataFrame del directorio en construcción (una vez por proceso)."""
+    if _worker.get('directory') != directory:
+        snapshot = CatalogSnapshot(directory)
+        _worker.update(directory=directory, snapshot=snapshot, df=snapshot.to_dataframe())
+    return _worker['snapshot'], _worker['df']
+
+
+def _build_cluster_indexes(directory, cluster_ids):
+    """Tarea: índices KNN de unos cuantos clusters (se devuelven al proceso principal)."""
+    start = time.perf_counter()
+    snapshot, df = _open_catalog(directory)
+    clusters = df['cluster'].to_numpy()
+    indexes = {int(c): build_cluster_index(snapshot.features, cluster_members(clusters, c))
+               for c in cluster_ids}
+    return indexes, time.perf_counter() - start
+
+
+def _build_search_index(directory):
+    start = time.perf_counter()
+    _, df = _open_catalog(directory)
+    save_search_index(SearchIndex.build(df), directory, len(df))
+    return time.perf_counter() - start
+
+
+def _build_lookup_index(directory):
+    start = time.perf_counter()
+    _, df = _open_catalog(directory)
+    save_lookup_index(LookupIndex.build(df), directory, len(df))
+    return time.perf_counter() - start
+
+
+def _build_views(directory):
+    start = time.perf_counter()
+    _, df = _open_catalog(directory)
+    save_views(MaterializedViews.build(RuleEngine(df), load_rules()), directory, len(df))
+    return time.perf_counter() - start
+
+
+class _InlinePool:
+    """Ejecuta las tareas en el propio proceso (--workers 1) con la interfaz del pool."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        _worker.clear()
+
+
+def _build_artifacts(directory, workers, timings):
+    """Construir en paralelo los índices y las vistas dentro de `directory`."""
+    snapshot = CatalogSnapshot(directory)
+    cluster_ids = np.unique(np.asarray(snapshot.columns['cluster'])).tolist()
+    groups = [cluster_ids[i:i + CLUSTERS_PER_TASK] for i in range(0, len(cluster_ids), CLUSTERS_PER_TASK)]
+
+    pool = _InlinePool() if workers == 1 else ProcessPoolExecutor(workers)
+    with pool:
+        # Primero las tareas largas de un solo proceso; los clusters rellenan el resto
+        singles = {name: pool.submit(fn, directory) for name, fn in (
+            ('search_index', _build_search_index),
+            ('lookup_index', _build_lookup_index),
+            ('views', _build_views))}
+        cluster_tasks = [pool.submit(_build_cluster_indexes, directory, group) for group in groups]
+
+        indexes = {}
+        timings['cluster_index'] = 0.0
+        for task in cluster_tasks:
+            group_indexes, seconds = task.result()
+            indexes.update(group_indexes)
+            timings['cluster_index'] += seconds
+        for name, task in singles.items():
+            timings[name] = task.result()
+
+    start = time.perf_counter()
+    save_cluster_indexes(indexes, directory, snapshot.n_rows)
+    timings['cluster_index_save'] = time.perf_counter() - start
+
+
+def file_checksums(directory):
+    """SHA-256 y tamaño de cada fichero del directorio: {ruta relativa: {...}}."""
+    checksums = {}
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, directory)
+            if relative == BUILD_MANIFEST:
+                continue
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            checksums[relative] = {'sha256': digest.hexdigest(), 'bytes': os.path.getsize(path)}
+    return dict(sorted(checksums.items()))
+
+
+def build(csv_path=None, output_dir=None, workers=None, neighbors=False, neighbor_k=DEFAULT_TABLE_K):
+    """
+    Compilar el catálogo y todos sus artefactos en un directorio versionado.
+
+    Args:
+        csv_path (str): CSV del catálogo (por defecto, el del servidor)
+        output_dir (str): Directorio destino (por defecto, el snapshot junto al CSV)
+        workers (int): Procesos del pool (por defecto, uno por CPU; 1 = sin pool)
+        neighbors (bool): Precalcular también la tabla de vecinos
+        neighbor_k (int): Vecinos por canción en la tabla
+
+    Returns:
+        dict: Contenido de `build.json`
+    """
+    total_start = time.perf_counter()
+    csv_path = csv_path or resolve_data_path()
+    output_dir = output_dir or snapshot_path_for(csv_path)
+    workers = workers or os.cpu_count() or 1
+    staging = f'{output_dir}.build-{uuid.uuid4().hex}'
+    timings = {}
+
+    try:
+        start = time.perf_counter()
+        write_snapshot(csv_path, staging)
+        timings['snapshot'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _build_artifacts(staging, workers, timings)
+        timings['artifacts_wall'] = time.perf_counter() - start
+
+        snapshot = CatalogSnapshot(staging)
+        if neighbors:
+            start = time.perf_counter()
+            build_neighbor_table(snapshot, neighbor_k, workers=workers)
+            timings['neighbors'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        files = file_checksums(staging)
+        timings['checksums'] = time.perf_counter() - start
+        timings['total'] = time.perf_counter() - total_start
+
+        manifest = {
+            'format_version': BUILD_FORMAT_VERSION,
+            'catalog_version': catalog_version(snapshot.manifest['source']),
+            'source': snapshot.manifest['source'],
+            'n_rows': snapshot.n_rows,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'workers': workers,
+            'timings': timings,
+            'files': files,
+        }
+        with open(os.path.join(staging, BUILD_MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    with snapshot_lock(output_dir):
+        publish_directory(staging, output_dir)
+    return manifest
+
+
+def read_build_manifest(directory):
+    """Contenido de `build.json` de un directorio de artefactos."""
+    with open(os.path.join(directory, BUILD_MANIFEST), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != BUILD_FORMAT_VERSION:
+        raise ValueError(f"Versión de build no soportada en {directory}")
+    return manifest
+
+
+def load_build(directory):
+    """
+    Abrir un directorio de artefactos generado con `build`.
+
+    Raises:
+        FileNotFoundError: Si el directorio no contiene un build completo
+    """
+    if not os.path.exists(os.path.join(directory, BUILD_MANIFEST)):
+        raise FileNotFoundError(f"{directory} no es un directorio de artefactos (falta {BUILD_MANIFEST})")
+    snapshot = CatalogSnapshot(directory)
+    snapshot.build = read_build_manifest(directory)
+    return snapshot
+
+
+def verify_build(directory):
+    """
+    Comprobar los ficheros de un directorio de artefactos contra sus checksums.
+
+    Returns:
+        list: Ficheros que faltan o cuyo contenido no coincide
+    """
+    expected = read_build_manifest(directory)['files']
+    actual = file_checksums(directory)
+    return sorted(name for name, info in expected.items() if actual.get(name) != info)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='harmonic-build',
+                                     description='Compilar el catálogo y todos sus artefactos')
+    parser.add_argument('data', nargs='?', help='CSV del catálogo (por defecto, el del servidor)')
+    parser.add_argument('--output', help='Directorio de artefactos (por defecto, el snapshot junto al CSV)')
+    parser.add_argument('--workers', type=int, help='Procesos (por defecto, uno por CPU)')
+    parser.add_argument('--neighbors', action='store_true', help='Precalcular la tabla de vecinos')
+    parser.add_argument('--neighbor-k', type=int, default=DEFAULT_TABLE_K)
+    parser.add_argument('--verify', metavar='DIR', help='Solo comprobar los checksums de un directorio')
+    args = parser.parse_args()
+
+    if args.verify:
+        bad = verify_build(args.verify)
+        print(f"{len(bad)} ficheros con checksum incorrecto" + (f": {bad}" if bad else ''))
+        sys.exit(1 if bad else 0)
+
+    manifest = build(args.data, args.output, args.workers, args.neighbors, args.neighbor_k)
+    print(f"Catálogo {manifest['catalog_version']} ({manifest['n_rows']} canciones, "
+          f"{len(manifest['files'])} ficheros) compilado con {manifest['workers']} procesos")
+    for stage, seconds in manifest['timings'].items():
+        print(f"  {stage:<20} {seconds:8.2f}s")
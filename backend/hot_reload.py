@@ -0,0 +1,203 @@
+"""
+Recarga en caliente del catálogo.
+
+`CatalogReloader` guarda la referencia al `SongRecommender` activo. Cuando el
+CSV cambia (vigilante en segundo plano o endpoint de administración), se
+construye y se calienta un recomendador nuevo fuera del camino de las
+peticiones y después se sustituye la referencia de una sola vez: las
+peticiones en curso terminan con la versión anterior (ya tienen su
+referencia) y las nuevas usan la nueva.
+
+Con varios workers, cada proceso tiene su propio `CatalogReloader`. Para que
+una recarga pedida a uno de ellos llegue a todos, `request_reload` escribe un
+fichero de aviso (`trigger_path`) y cada proceso lo comprueba como mucho una
+vez por segundo (`check_trigger`, en cada petición y en el vigilante).
+
+Los índices de canción (`song_idx`) son posiciones en el catálogo; al cambiar
+de versión se calcula la correspondencia de filas por `id` para poder traducir
+los índices que los clientes obtuvieron de la versión anterior.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+# Cada cuántos segundos, como mucho, se mira el fichero de aviso de recarga
+TRIGGER_CHECK_INTERVAL = 1.0
+
+
+class CatalogReloader:
+    """Referencia intercambiable al recomendador activo."""
+
+    def __init__(self, factory, on_swap=None, logger=None, trigger_path=None):
+        """
+        Args:
+            factory (callable): Crea un `SongRecommender` con la versión actual del CSV
+            on_swap (callable): on_swap(anterior, nuevo) tras cada cambio de versión
+            logger (logging.Logger): Log para recargas y errores del vigilante
+            trigger_path (str): Fichero de aviso de recarga compartido por los workers
+        """
+        self.factory = factory
+        self.on_swap = on_swap
+        self.logger = logger
+        self.trigger_path = trigger_path
+        self.current = None
+        self.last_reload = None
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._trigger_lock = threading.Lock()
+        self._watcher = None
+        self._reload_thread = None
+        # Los avisos anteriores al arranque no cuentan: el catálogo se carga ya actualizado
+        self._seen_trigger = self._trigger_stamp()
+        self._next_trigger_check = 0.0
+
+    def get(self):
+        """Recomendador activo, creándolo la primera vez."""
+        recommender = self.current
+        if recommender is None:
+            # En modo con hilos, solo un hilo construye el recomendador
+            with self._load_lock:
+                if self.current is None:
+                    self.current = self.factory()
+                recommender = self.current
+        return recommender
+
+    def reload(self, force=False):
+        """
+        Cargar la versión actual del CSV si ha cambiado y activarla.
+
+        Solo se construye una versión a la vez; si ya hay una recarga en
+        marcha, esta llamada espera a que termine y vuelve a comprobar.
+
+        Args:
+            force (bool): Reconstruir aunque el CSV no haya cambiado
+
+        Returns:
+            dict: {'reloaded', 'version', 'previous_version', 'seconds'}
+        """
+        with self._reload_lock:
+            old = self.get()
+            if not force and not old.is_stale():
+                return {'reloaded': False, 'version': old.version,
+                        'previous_version': old.previous_version, 'seconds': 0.0}
+
+            start = time.perf_counter()
+            new = self.factory()
+            new.warm_up()
+            new.link_previous(old)
+            # Asignar la referencia es atómico: no hace falta bloquear a los lectores
+            self.current = new
+            seconds = time.perf_counter() - start
+            self.last_reload = {'version': new.version, 'previous_version': old.version,
+                                'seconds': seconds, 'at': time.time()}
+            if self.on_swap:
+                self.on_swap(old, new)
+            if self.logger:
+                self.logger.info(f"Catálogo recargado: {old.version} -> {new.version} en {seconds:.3f}s")
+            return dict(self.last_reload, reloaded=True)
+
+    def reload_in_background(self, force=False):
+        """
+        Lanzar `reload` en un hilo aparte (para el endpoint de administración).
+
+        Returns:
+            bool: False si ya había una recarga en marcha
+        """
+        if self._reload_thread is not None and self._reload_thread.is_alive():
+            return False
+
+        def run():
+            try:
+                self.reload(force)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Error recargando el catálogo: {e}")
+
+        self._reload_thread = threading.Thread(target=run, name='catalog-reload', daemon=True)
+        self._reload_thread.start()
+        return True
+
+    def request_reload(self, force=False):
+        """
+        Pedir una recarga a todos los procesos que comparten `trigger_path` y
+        empezarla en este.
+
+        Returns:
+            bool: False si este proceso ya tenía una recarga en marcha
+        """
+        if self.trigger_path:
+            tmp_path = f'{self.trigger_path}.tmp-{uuid.uuid4().hex}'
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump({'force': bool(force), 'at': time.time(), 'pid': os.getpid()}, f)
+                os.replace(tmp_path, self.trigger_path)
+                self._seen_trigger = self._trigger_stamp()
+            except OSError as e:
+                if self.logger:
+                    self.logger.error(f"No se pudo escribir el aviso de recarga {self.trigger_path}: {e}")
+        return self.reload_in_background(force)
+
+    def check_trigger(self):
+        """
+        Empezar una recarga si otro proceso la ha pedido desde la última vez.
+
+        Es barato (un `stat` como mucho cada TRIGGER_CHECK_INTERVAL segundos),
+        así que se puede llamar en cada petición.
+
+        Returns:
+            bool: True si se ha lanzado una recarga
+        """
+        if not self.trigger_path or time.monotonic() < self._next_trigger_check:
+            return False
+        if not self._trigger_lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_trigger_check = time.monotonic() + TRIGGER_CHECK_INTERVAL
+            stamp = self._trigger_stamp()
+            if stamp is None or stamp == self._seen_trigger:
+                return False
+            try:
+                with open(self.trigger_path) as f:
+                    force = bool(json.load(f).get('force'))
+            except (OSError, ValueError, AttributeError):
+                force = False
+            # Si ya hay una recarga en marcha, el aviso se vuelve a mirar en la siguiente comprobación
+            started = self.reload_in_background(force)
+            if started:
+                self._seen_trigger = stamp
+            return started
+        finally:
+            self._trigger_lock.release()
+
+    def _trigger_stamp(self):
+        if not self.trigger_path:
+            return None
+        try:
+            return os.stat(self.trigger_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def start_watcher(self, interval):
+        """
+        Comprobar cada `interval` segundos si el CSV ha cambiado (hilo en segundo plano).
+
+        Se llama una vez por proceso (en cada worker de gunicorn: los hilos no
+        sobreviven al fork del maestro).
+        """
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+
+        def watch():
+            while True:
+                try:
+                    self.check_trigger()
+                    self.reload()
+                except Exception as e:
+                    if self.logger:
+                        self.logger.error(f"Error recargando el catálogo: {e}")
+                time.sleep(interval)
+
+        self._watcher = threading.Thread(target=watch, name='catalog-watcher', daemon=True)
+        self._watcher.start()
@@ -0,0 +1,281 @@
+"""
+Ingesta incremental de canciones nuevas.
+
+Añadir unos miles de canciones no requiere reescribir el CSV ni reentrenar
+todos los índices:
+
+1. El CSV de entrada (mismo esquema que `datos_procesados.csv`) se lee por
+   bloques de `chunk_rows` filas; nunca se carga entero. Cada bloque se
+   valida, se descartan los `id` ya presentes y cada canción se asigna al
+   cluster con el centroide más cercano (el `cluster` de la entrada, si
+   viene, se ignora). Las filas se van escribiendo a un fichero temporal y
+   solo se conservan sus columnas en memoria.
+2. El snapshot se copia ampliado con las filas nuevas al final, de modo que
+   los `song_idx` existentes no cambian.
+3. Se reconstruyen solo los índices KNN de los clusters que reciben
+   canciones; los índices de n-gramas, de títulos/artistas y las vistas
+   materializadas se amplían sin recalcular las filas antiguas.
+4. Las filas se añaden al CSV y el snapshot nuevo se publica con su huella,
+   así que los servidores lo cargan sin recompilar (con
+   `HARMONIC_RELOAD_INTERVAL` lo detectan solos; si no, con
+   `POST /api/admin/reload`).
+
+Las ingestas sobre un mismo catálogo se hacen de una en una: cada una toma el
+cerrojo del snapshot (`catalog.snapshot_lock`) mientras lo amplía y publica.
+
+Uso: python ingest.py nuevas.csv [--data ruta/al/datos_procesados.csv]
+"""
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from catalog import (CatalogSnapshot, extend_snapshot, load_snapshot, publish_directory,
+                     resolve_data_path, snapshot_lock, snapshot_path_for, source_fingerprint,
+                     validate_columns, write_manifest)
+from cluster_index import (build_cluster_indexes, load_cluster_indexes, save_cluster_indexes,
+                           update_cluster_indexes)
+from lookup_index import LookupIndex, load_lookup_index, save_lookup_index
+from rules import RuleEngine, load_rules
+from search_index import SearchIndex, load_search_index, save_search_index
+from views import MaterializedViews, load_views, save_views
+
+# Filas por bloque al leer el CSV de entrada
+DEFAULT_CHUNK_ROWS = 50_000
+
+
+def read_csv_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Leer un CSV por bloques de `chunk_rows` filas (DataFrames)."""
+    with pd.read_csv(path, chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+def cluster_centroids(X, clusters):
+    """
+    Centroide de cada cluster del catálogo.
+
+    Returns:
+        tuple: (ids de cluster, centroides float64 de forma (n_clusters, n_features))
+    """
+    cluster_ids = np.unique(clusters)
+    centroids = np.stack([X[clusters == c].mean(axis=0, dtype=np.float64) for c in cluster_ids])
+    return cluster_ids, centroids
+
+
+def nearest_clusters(features, cluster_ids, centroids):
+    """Cluster con el centroide más cercano a cada fila de `features`."""
+    features = features.astype(np.float64)
+    # |x - c|^2 = |x|^2 - 2 x·c + |c|^2 (sin materializar las diferencias)
+    distances = (features ** 2).sum(axis=1)[:, None] - 2 * features @ centroids.T + (centroids ** 2).sum(axis=1)
+    return cluster_ids[np.argmin(distances, axis=1)]
+
+
+class DeltaReader:
+    """Valida los bloques de canciones nuevas y acumula sus columnas."""
+
+    def __init__(self, snapshot):
+        self.columns = [column['name'] for column in snapshot.manifest['columns']]
+        self.kinds = {column['name']: column['kind'] for column in snapshot.manifest['columns']}
+        self.feature_names = snapshot.feature_names
+        clusters = np.asarray(snapshot.columns['cluster'])
+        self.cluster_ids, self.centroids = cluster_centroids(snapshot.features, clusters)
+        self.seen_ids = set(snapshot.columns['id'])
+        self.parts = {name: [] for name in self.columns}
+        self.added = 0
+        self.skipped = 0
+
+    def add(self, chunk, out):
+        """
+        Validar un bloque, asignar el cluster de sus canciones y escribirlas en `out`.
+
+        Los valores que se conservan son los releídos del texto escrito: así
+        coinciden exactamente con los que daría recompilar el CSV entero.
+
+        Args:
+            chunk (pd.DataFrame): Bloque del CSV de entrada
+            out (file): Fichero de texto donde se escriben las filas nuevas (sin cabecera)
+
+        Returns:
+            int: Canciones nuevas en el bloque
+
+        Raises:
+            ValueError: Si faltan columnas o hay valores numéricos no válidos
+        """
+        missing = [name for name in self.columns if name not in chunk.columns and name != 'cluster']
+        if missing:
+            raise ValueError(f"Faltan columnas en el CSV de entrada: {missing}")
+        validate_columns(chunk)
+
+        # Descartar canciones ya presentes (en el catálogo o en bloques anteriores)
+        ids = chunk['id'].astype(str)
+        new = ~ids.isin(self.seen_ids).to_numpy() & ~ids.duplicated().to_numpy()
+        self.skipped += int((~new).sum())
+        chunk = chunk.loc[new].copy()
+        if chunk.empty:
+            return 0
+        self.seen_ids.update(ids[new])
+
+        for name in self.columns:
+            if self.kinds[name] == 'numeric' and name != 'cluster':
+                chunk[name] = pd.to_numeric(chunk[name])
+        features = chunk[self.feature_names].to_numpy(dtype=np.float64)
+        if not np.isfinite(features).all():
+            raise ValueError("Las características numéricas de las canciones nuevas no pueden estar vacías")
+        chunk['cluster'] = nearest_clusters(features, self.cluster_ids, self.centroids)
+        text = chunk[self.columns].to_csv(header=False, index=False)
+        out.write(text)
+        chunk = pd.read_csv(io.StringIO(text), header=None, names=self.columns,
+                            dtype={name: object for name in self.columns if self.kinds[name] != 'numeric'})
+
+        for name in self.columns:
+            self.parts[name].append(chunk[name].to_numpy())
+        self.added += len(chunk)
+        return len(chunk)
+
+    def delta(self):
+        """Columnas de todas las filas nuevas: {columna: array}."""
+        return {name: np.concatenate(parts) for name, parts in self.parts.items()}
+
+
+def _timed(timings, name, fn):
+    start = time.perf_counter()
+    result = fn()
+    timings[name] = time.perf_counter() - start
+    return result
+
+
+def _write_artifacts(snapshot, directory, timings):
+    """
+    Ampliar los índices y vistas del snapshot actual en `directory`.
+
+    Si algún artefacto no existe en el snapshot actual, se construye entero.
+
+    Returns:
+        list: Clusters cuyo índice KNN se ha reconstruido
+    """
+    extended = CatalogSnapshot(directory)
+    df = extended.to_dataframe()
+    start, n_rows = snapshot.n_rows, extended.n_rows
+    previous = df.iloc[:start]
+    clusters = df['cluster'].to_numpy()
+
+    def cluster_indexes():
+        indexes = load_cluster_indexes(snapshot.path, start)
+        if indexes is None:
+            indexes = build_cluster_indexes(extended.features, clusters)
+            rebuilt = sorted(indexes)
+        else:
+            indexes, rebuilt = update_cluster_indexes(indexes, extended.features, clusters)
+        save_cluster_indexes(indexes, directory, n_rows)
+        return rebuilt
+
+    def search_index():
+        index = load_search_index(snapshot.path, previous)
+        index = index.extended(df, start) if index is not None else SearchIndex.build(df)
+        save_search_index(index, directory, n_rows)
+
+    def lookup_index():
+        index = load_lookup_index(snapshot.path, previous)
+        index = index.extended(df, start) if index is not None else LookupIndex.build(df)
+        save_lookup_index(index, directory, n_rows)
+
+    def views():
+        rules = load_rules()
+        current = load_views(snapshot.path, start, rules)
+        if current is not None:
+            current = current.extended(df, start)
+        else:
+            current = MaterializedViews.build(RuleEngine(df), rules)
+        save_views(current, directory, n_rows)
+
+    rebuilt = _timed(timings, 'cluster_index', cluster_indexes)
+    _timed(timings, 'search_index', search_index)
+    _timed(timings, 'lookup_index', lookup_index)
+    _timed(timings, 'views', views)
+    return rebuilt
+
+
+def _append_csv(csv_path, rows_path):
+    """Añadir al CSV del catálogo las filas (sin cabecera) de `rows_path`."""
+    with open(csv_path, 'rb+') as dst:
+        dst.seek(0, os.SEEK_END)
+        if dst.tell():
+            dst.seek(-1, os.SEEK_END)
+            if dst.read(1) != b'\n':
+                dst.write(b'\n')
+        with open(rows_path, 'rb') as src:
+            shutil.copyfileobj(src, dst)
+
+
+def ingest_csv(delta_path, csv_path=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Añadir al catálogo las canciones de un CSV sin reconstruirlo entero.
+
+    Args:
+        delta_path (str): CSV con las canciones nuevas (esquema de datos_procesados.csv)
+        csv_path (str): CSV del catálogo (por defecto, el del servidor)
+        chunk_rows (int): Filas por bloque al leer `delta_path`
+
+    Returns:
+        dict: {'added', 'skipped', 'n_rows', 'rebuilt_clusters', 'seconds', 'timings'}
+    """
+    start = time.perf_counter()
+    csv_path = csv_path or resolve_data_path()
+    # Cerrojo del snapshot: ingestas y compilaciones del mismo catálogo se hacen de una en una
+    with snapshot_lock(snapshot_path_for(csv_path)):
+        snapshot = load_snapshot(csv_path)
+        reader = DeltaReader(snapshot)
+        timings = {}
+
+        rows_file = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False,
+                                                dir=os.path.dirname(os.path.abspath(csv_path)),
+                                                encoding='utf-8', newline='')
+        tmp_dir = f'{snapshot.path}.tmp-{uuid.uuid4().hex}'
+        try:
+            def read():
+                with rows_file:
+                    for chunk in read_csv_chunks(delta_path, chunk_rows):
+                        reader.add(chunk, rows_file)
+            _timed(timings, 'read', read)
+
+            report = {'added': reader.added, 'skipped': reader.skipped, 'n_rows': snapshot.n_rows,
+                      'rebuilt_clusters': [], 'timings': timings}
+            if not reader.added:
+                report['seconds'] = time.perf_counter() - start
+                return report
+
+            os.makedirs(tmp_dir)
+            manifest = _timed(timings, 'snapshot', lambda: extend_snapshot(snapshot, reader.delta(), tmp_dir))
+            report['rebuilt_clusters'] = _write_artifacts(snapshot, tmp_dir, timings)
+
+            # Publicar: primero las filas en el CSV y después el snapshot con su huella
+            _append_csv(csv_path, rows_file.name)
+            manifest['source'] = source_fingerprint(csv_path)
+            write_manifest(tmp_dir, manifest)
+            publish_directory(tmp_dir, snapshot.path)
+        finally:
+            os.remove(rows_file.name)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    report.update(n_rows=manifest['n_rows'], seconds=time.perf_counter() - start)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Añadir canciones nuevas al catálogo sin reconstruirlo')
+    parser.add_argument('delta', help='CSV con las canciones nuevas (esquema de datos_procesados.csv)')
+    parser.add_argument('--data', help='CSV del catálogo (por defecto, el del servidor)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    report = ingest_csv(args.delta, args.data, args.chunk_rows)
+    print(f"{report['added']} canciones añadidas ({report['skipped']} ya existían); "
+          f"catálogo con {report['n_rows']} canciones en {report['seconds']:.2f}s")
+    print(f"Índices KNN reconstruidos: {report['rebuilt_clusters']}")
+    print('Etapas: ' + ', '.join(f'{name} {seconds:.2f}s' for name, seconds in report['timings'].items()))
@@ -0,0 +1,259 @@
+"""
+Instrumentación de las peticiones y de las partes calientes del recomendador.
+
+- `stage(nombre)`: cronómetro de una etapa (KNN, serialización, JSON...). Se
+  acumula en la petición en curso y en un histograma global por etapa.
+- `init_app(app)`: mide cada petición por ruta, añade la cabecera
+  `Server-Timing` con las etapas y registra los histogramas que se exponen en
+  formato de texto de Prometheus (`render_metrics`).
+- Perfilado opcional de peticiones lentas con cProfile
+  (`HARMONIC_PROFILE_SLOW_MS`, `HARMONIC_PROFILE_SAMPLE`, `HARMONIC_PROFILE_DIR`).
+
+Las métricas son por proceso: con varios workers, cada scrape ve el suyo.
+"""
+import contextvars
+import cProfile
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+
+# Límites superiores (segundos) de los buckets de los histogramas
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Caracteres no válidos en los nombres de Server-Timing y de los ficheros de perfil
+_TOKEN_RE = re.compile(r'[^A-Za-z0-9!#$%&\'*+.^_`|~-]')
+
+# Etapas de la petición en curso: {nombre: segundos}
+_current_stages = contextvars.ContextVar('harmonic_stages', default=None)
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas, al estilo de Prometheus."""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {labels: (list(counts), count, total)
+                      for labels, (counts, count, total) in self._series.items()}
+        for labels, (counts, count, total) in sorted(series.items()):
+            base = _format_labels(self.label_names, labels)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{_with_le(base, repr(bound))} {bucket_count}')
+            lines.append(f'{self.name}_bucket{_with_le(base, "+Inf")} {count}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+            lines.append(f'{self.name}_sum{{{base}}} {total:.6f}')
+        return lines
+
+
+class Counter:
+    """Contador con etiquetas."""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            lines.append(f'{self.name}{{{_format_labels(self.label_names, labels)}}} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _with_le(base, bound):
+    return '{' + (base + ',' if base else '') + f'le="{bound}"' + '}'
+
+
+REQUEST_DURATION = Histogram('harmonic_request_duration_seconds',
+                             'Duración de las peticiones HTTP por ruta', ('route', 'method'))
+REQUESTS_TOTAL = Counter('harmonic_requests_total',
+                         'Peticiones HTTP por ruta y código de estado', ('route', 'method', 'status'))
+STAGE_DURATION = Histogram('harmonic_stage_duration_seconds',
+                           'Duración de las etapas internas (KNN, serialización, JSON...)', ('stage',))
+SLOW_PROFILES = Counter('harmonic_slow_request_profiles_total',
+                        'Perfiles cProfile guardados de peticiones lentas', ('route',))
+
+
+@contextmanager
+def stage(name):
+    """
+    Cronometrar una etapa del trabajo de la petición.
+
+    El tiempo se suma a la etapa del mismo nombre de la petición en curso (si
+    la hay) y se registra en el histograma `harmonic_stage_duration_seconds`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stages = _current_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+        STAGE_DURATION.observe((name,), elapsed)
+
+
+def server_timing(stages, total):
+    """Valor de la cabecera `Server-Timing` (duraciones en milisegundos)."""
+    parts = [f'{_TOKEN_RE.sub("_", name)};dur={seconds * 1000:.3f}' for name, seconds in stages.items()]
+    parts.append(f'total;dur={total * 1000:.3f}')
+    return ', '.join(parts)
+
+
+class SlowRequestProfiler:
+    """
+    Perfila una muestra de las peticiones con cProfile y guarda el perfil de
+    las que superan `threshold_ms` (se abre después con `pstats` o snakeviz).
+
+    Solo se perfila una petición a la vez por proceso: cProfile no admite
+    perfiles simultáneos y así el coste queda acotado en modo con hilos.
+    """
+
+    def __init__(self, threshold_ms, sample_rate=1.0, output_dir=None):
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir or os.path.join(tempfile.gettempdir(), 'harmonic-profiles')
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._busy = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Perfilador configurado por entorno, o None si no está activado."""
+        threshold = os.environ.get('HARMONIC_PROFILE_SLOW_MS')
+        if not threshold:
+            return None
+        return cls(float(threshold), float(os.environ.get('HARMONIC_PROFILE_SAMPLE', 1.0)),
+                   os.environ.get('HARMONIC_PROFILE_DIR'))
+
+    def start(self):
+        if random.random() >= self.sample_rate or not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Otro perfilador activo en el proceso
+            self._busy.release()
+            return None
+        return profile
+
+    def stop(self, profile, route, elapsed):
+        """Detener el perfil y guardarlo si la petición fue lenta."""
+        try:
+            profile.disable()
+            if elapsed < self.threshold:
+                return None
+            name = _TOKEN_RE.sub('_', route.strip('/')) or 'root'
+            path = os.path.join(self.output_dir,
+                                f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{name}-{elapsed * 1000:.0f}ms.prof')
+            profile.dump_stats(path)
+            SLOW_PROFILES.inc((route,))
+            return path
+        finally:
+            self._busy.release()
+
+
+def init_app(app, profiler=None):
+    """
+    Registrar la medición de peticiones en una aplicación Flask.
+
+    Args:
+        app (Flask): Aplicación
+        profiler (SlowRequestProfiler): Perfilador de peticiones lentas (opcional)
+    """
+    @app.before_request
+    def _start_timer():
+        g.harmonic_start = time.perf_counter()
+        g.harmonic_stages = {}
+        g.harmonic_stages_token = _current_stages.set(g.harmonic_stages)
+        g.harmonic_profile = profiler.start() if profiler else None
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('harmonic_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+
+        REQUEST_DURATION.observe((route, request.method), elapsed)
+        REQUESTS_TOTAL.inc((route, request.method, str(response.status_code)))
+        response.headers['Server-Timing'] = server_timing(g.harmonic_stages, elapsed)
+
+        profile = g.pop('harmonic_profile', None)
+        if profile is not None:
+            path = profiler.stop(profile, route, elapsed)
+            if path:
+                app.logger.warning(f'Petición lenta {request.method} {route} ({elapsed * 1000:.0f}ms): perfil en {path}')
+        return response
+
+    @app.teardown_request
+    def _reset_stages(exc):
+        token = g.pop('harmonic_stages_token', None)
+        if token is not None:
+            _current_stages.reset(token)
+        # Si after_request no llegó a ejecutarse (excepción), liberar el perfilador
+        profile = g.pop('harmonic_profile', None)
+        if profile is not None:
+            profiler.stop(profile, request.path, 0.0)
+
+
+def render_metrics(gauges=None):
+    """
+    Todas las métricas en formato de texto de Prometheus.
+
+    Args:
+        gauges (dict): Valores instantáneos adicionales {nombre: (ayuda, valor)}
+
+    Returns:
+        str: Cuerpo para la respuesta de `/metrics`
+    """
+    lines = []
+    for metric in (REQUEST_DURATION, REQUESTS_TOTAL, STAGE_DURATION, SLOW_PROFILES):
+        lines.extend(metric.render())
+    for name, (help_text, value) in (gauges or {}).items():
+        if value is None:
+            continue
+        lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {float(value)}'])
+    return '\n'.join(lines) + '\n'
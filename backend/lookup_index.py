@@ -0,0 +1,220 @@
+"""
+Índices de búsqueda exacta para `find_songs`.
+
+- `titles`: mapa hash del título normalizado a las filas con ese título.
+- `artists`: índice de tokens sobre la lista de artistas ya parseada; cada
+  artista se indexa por su nombre completo y por cada secuencia contigua de
+  palabras ("the beatles", "beatles", ...).
+
+Todas las listas de filas se guardan ordenadas por año descendente (y por
+fila ante empates), que es el orden en que `find_songs` devuelve resultados.
+Cada mapa es una `PostingTable`: las listas van concatenadas en un único array
+int32 (memory-mapped al cargarlo) y solo las claves son objetos Python.
+"""
+import ast
+import os
+import uuid
+
+import joblib
+import numpy as np
+
+from search_index import normalize
+
+LOOKUP_INDEX_FORMAT_VERSION = 2
+LOOKUP_INDEX_FILENAME = 'lookup_index.joblib'
+
+# Palabras máximas por artista para generar sus secuencias de tokens
+MAX_ARTIST_WORDS = 8
+
+_EMPTY = np.zeros(0, dtype=np.int32)
+
+
+def parse_artists(value):
+    """Lista de artistas a partir del texto del CSV (p. ej. "['Queen', 'David Bowie']")."""
+    if not isinstance(value, str):
+        return []
+    text = value.strip()
+    if text.startswith('['):
+        try:
+            parsed = ast.literal_eval(text)
+            if isinstance(parsed, (list, tuple)):
+                return [str(artist) for artist in parsed]
+        except (ValueError, SyntaxError):
+            pass
+    return [text]
+
+
+def normalize_phrase(text):
+    """Normalizar un título o nombre: minúsculas y espacios colapsados."""
+    return ' '.join(normalize(text).split())
+
+
+def artist_tokens(artist):
+    """Nombre completo y secuencias contiguas de palabras de un artista."""
+    words = normalize_phrase(artist).split()[:MAX_ARTIST_WORDS]
+    return {' '.join(words[i:j]) for i in range(len(words)) for j in range(i + 1, len(words) + 1)}
+
+
+class PostingTable:
+    """Mapa clave -> filas con todas las listas concatenadas en un solo array."""
+
+    def __init__(self, keys, offsets, rows):
+        self.keys = keys
+        self.slots = {key: slot for slot, key in enumerate(keys)}
+        self.offsets = offsets
+        self.rows = rows
+
+    @classmethod
+    def from_lists(cls, lists):
+        """Construir la tabla a partir de {clave: [filas]}."""
+        keys = list(lists)
+        lengths = np.fromiter((len(lists[k]) for k in keys), dtype=np.int64, count=len(keys))
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        rows = np.fromiter((row for k in keys for row in lists[k]), dtype=np.int32, count=int(offsets[-1]))
+        return cls(keys, offsets, rows)
+
+    def extended(self, lists, year):
+        """
+        Tabla con filas nuevas añadidas a las listas de `lists` {clave: [filas]}.
+
+        Solo se reordenan (por año descendente y fila) las listas de esas
+        claves; el resto se copian en bloque a sus nuevos offsets.
+        """
+        updates = {}
+        for key, new_rows in lists.items():
+            rows = np.concatenate([self.get(key, _EMPTY), np.asarray(new_rows)]).astype(np.int64)
+            updates[key] = rows[np.lexsort((rows, -year[rows]))]
+
+        keys = list(self.keys) + [key for key in updates if key not in self.slots]
+        old_lengths = np.diff(self.offsets)
+        lengths = np.zeros(len(keys), dtype=np.int64)
+        lengths[:len(self.keys)] = old_lengths
+        slots = {key: slot for slot, key in enumerate(keys)}
+        for key, rows in updates.items():
+            lengths[slots[key]] = len(rows)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        rows = np.empty(offsets[-1], dtype=np.int32)
+        unchanged = np.ones(len(self.keys), dtype=bool)
+        unchanged[[self.slots[key] for key in updates if key in self.slots]] = False
+        slot_of = np.repeat(np.arange(len(self.keys)), old_lengths)
+        keep = unchanged[slot_of]
+        within = np.arange(len(self.rows)) - np.repeat(self.offsets[:-1], old_lengths)
+        rows[offsets[slot_of[keep]] + within[keep]] = self.rows[keep]
+        for key, key_rows in updates.items():
+            slot = slots[key]
+            rows[offsets[slot]:offsets[slot + 1]] = key_rows
+        return PostingTable(keys, offsets, rows)
+
+    def get(self, key, default=None):
+        slot = self.slots.get(key)
+        if slot is None:
+            return default
+        return self.rows[self.offsets[slot]:self.offsets[slot + 1]]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _posting_lists(df, start):
+    """Listas {título: [filas]} y {token de artista: [filas]} de las filas desde `start`."""
+    year = df['year_original'].to_numpy()[start:]
+    names = df['name'].to_numpy()[start:]
+    artists = df['artists'].to_numpy()[start:]
+
+    titles = {}
+    tokens = {}
+    # Recorrer las filas ya en orden (año desc, fila asc) para que las listas salgan ordenadas
+    for i in np.lexsort((np.arange(len(year)), -year)).tolist():
+        row = start + i
+        titles.setdefault(normalize_phrase(names[i]), []).append(row)
+        row_tokens = set()
+        for artist in parse_artists(artists[i]):
+            row_tokens |= artist_tokens(artist)
+        for token in row_tokens:
+            tokens.setdefault(token, []).append(row)
+
+    titles.pop('', None)
+    return titles, tokens
+
+
+class LookupIndex:
+    """Mapa de títulos y listas de artistas ordenadas por año descendente."""
+
+    def __init__(self, titles, artists, year):
+        self.titles = titles
+        self.artists = artists
+        self.year = year
+
+    @classmethod
+    def build(cls, df):
+        year = df['year_original'].to_numpy()
+        titles, tokens = _posting_lists(df, 0)
+        return cls(PostingTable.from_lists(titles), PostingTable.from_lists(tokens), year)
+
+    def extended(self, df, start):
+        """Índice con las filas nuevas de `df` (a partir de `start`) añadidas."""
+        year = df['year_original'].to_numpy()
+        titles, tokens = _posting_lists(df, start)
+        return LookupIndex(self.titles.extended(titles, year), self.artists.extended(tokens, year), year)
+
+    def find(self, query):
+        """
+        Filas cuyo título es igual a la consulta o con un artista que la contiene como palabras.
+
+        Returns:
+            np.ndarray: Filas por año descendente; ante empates, primero las que
+            coinciden por título y después por orden de fila
+        """
+        query = normalize_phrase(query)
+        title_rows = self.titles.get(query, _EMPTY)
+        artist_rows = self.artists.get(query, _EMPTY)
+        if not len(artist_rows):
+            return title_rows
+        if not len(title_rows):
+            return artist_rows
+
+        artist_only = np.setdiff1d(artist_rows, title_rows, assume_unique=True)
+        rows = np.concatenate([title_rows, artist_only]).astype(np.int64)
+        from_artist = np.concatenate([np.zeros(len(title_rows), dtype=bool),
+                                      np.ones(len(artist_only), dtype=bool)])
+        return rows[np.lexsort((rows, from_artist, -self.year[rows]))]
+
+
+def save_lookup_index(index, directory, n_rows):
+    """Serializar el índice en `directory` de forma atómica."""
+    path = os.path.join(directory, LOOKUP_INDEX_FILENAME)
+    tmp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+    payload = {'format_version': LOOKUP_INDEX_FORMAT_VERSION, 'n_rows': int(n_rows)}
+    for name, table in (('titles', index.titles), ('artists', index.artists)):
+        payload[name] = {'keys': table.keys, 'offsets': table.offsets, 'rows': table.rows}
+    try:
+        joblib.dump(payload, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def load_lookup_index(directory, df):
+    """
+    Cargar el índice guardado en `directory`.
+
+    Returns:
+        LookupIndex: Índice cargado, o None si no existe o no corresponde al catálogo
+    """
+    path = os.path.join(directory, LOOKUP_INDEX_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        payload = joblib.load(path, mmap_mode='r')
+    except Exception:
+        return None
+    if payload.get('format_version') != LOOKUP_INDEX_FORMAT_VERSION or payload.get('n_rows') != len(df):
+        return None
+    titles, artists = (PostingTable(payload[name]['keys'], payload[name]['offsets'], payload[name]['rows'])
+                       for name in ('titles', 'artists'))
+    return LookupIndex(titles, artists, df['year_original'].to_numpy())
@@ -0,0 +1,258 @@
+"""
+Tabla precalculada de vecinos más cercanos.
+
+`get_recommendations` busca los vecinos de una canción dentro de su cluster
+con el índice KD-tree en cada petición. Esta tabla guarda, para cada canción,
+sus `k` vecinos (filas int32 y distancias float32, ordenados por distancia y
+por fila ante empates, sin la propia canción) y se abre con memory-mapping:
+una recomendación pasa a ser un corte de una fila de la tabla.
+
+La tabla se construye con un proceso por lotes (`python neighbor_table.py`),
+no al arrancar. Las distancias se calculan por bloques con un producto de
+matrices (|y|² - 2x·y) para preseleccionar candidatos y se recalculan
+exactas (diferencias en float64) para ordenarlos. Los bloques se reparten
+entre procesos que escriben directamente en los ficheros `.npy` de salida.
+Con `--popular N` solo se precalculan las N canciones más populares; el resto
+quedan a -1 y se resuelven con la búsqueda en vivo.
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from catalog import publish_directory
+from cluster_index import cluster_members, exact_neighbors
+
+NEIGHBOR_TABLE_FORMAT_VERSION = 1
+NEIGHBOR_TABLE_DIRNAME = 'neighbors'
+
+# Vecinos por canción (get_recommendations usa 5; el lote admite hasta k)
+DEFAULT_TABLE_K = 10
+
+# Elementos máximos de cada bloque de distancias (filas x miembros del cluster)
+BLOCK_ELEMENTS = 1_000_000
+
+# Candidatos extra que se recalculan exactos para absorber el error de redondeo
+EXTRA_CANDIDATES = 8
+
+# Estado de cada proceso del pool: matriz, clusters y miembros ya preparados
+_worker = {}
+
+
+class NeighborTable:
+    """Vecinos precalculados: filas (-1 = no calculada) y distancias por canción."""
+
+    def __init__(self, rows, distances):
+        self.rows = rows
+        self.distances = distances
+        self.k = rows.shape[1]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, row, k):
+        """
+        Los `k` primeros vecinos de `row`.
+
+        Returns:
+            tuple: (filas, distancias), o None si la fila no está en la tabla
+        """
+        if k > self.k or not 0 <= row < len(self.rows):
+            return None
+        rows = self.rows[row, :k]
+        if rows[0] < 0:
+            return None
+        valid = rows >= 0
+        return rows[valid], self.distances[row, :k][valid]
+
+
+def _init_worker(snapshot_path, tmp_path):
+    _worker['X'] = np.load(os.path.join(snapshot_path, 'features.npy'), mmap_mode='r')
+    _worker['clusters'] = np.load(os.path.join(snapshot_path, 'cluster.npy'), mmap_mode='r')
+    _worker['rows'] = np.load(os.path.join(tmp_path, 'rows.npy'), mmap_mode='r+')
+    _worker['distances'] = np.load(os.path.join(tmp_path, 'distances.npy'), mmap_mode='r+')
+    _worker['members'] = {}
+
+
+def _cluster_matrix(cluster_id):
+    """Miembros del cluster y su matriz float64 con normas (una vez por proceso y cluster)."""
+    cached = _worker['members'].get(cluster_id)
+    if cached is None:
+        members = cluster_members(np.asarray(_worker['clusters']), cluster_id)
+        M = _worker['X'][members].astype(np.float64)
+        cached = _worker['members'][cluster_id] = (members, M, (M ** 2).sum(axis=1))
+    return cached
+
+
+def _compute_block(cluster_id, rows):
+    """Calcular y escribir los vecinos de `rows` (todas del cluster `cluster_id`)."""
+    members, M, member_norms = _cluster_matrix(cluster_id)
+    k = _worker['rows'].shape[1]
+    Q = _worker['X'][rows].astype(np.float64)
+
+    # Preselección con el producto de matrices (BLAS), sin materializar
+    # diferencias: |y|² - 2x·y ordena igual que la distancia (|x|² es constante por fila)
+    approx = Q @ M.T
+    approx *= -2
+    approx += member_norms
+    n_candidates = min(k + 1 + EXTRA_CANDIDATES, len(members))
+    candidates = np.argpartition(approx, n_candidates - 1, axis=1)[:, :n_candidates]
+
+    # Distancias exactas de los candidatos; orden por (distancia, fila) sin la propia canción
+    candidate_rows = members[candidates]
+    exact = np.sqrt(((M[candidates] - Q[:, None, :]) ** 2).sum(axis=2))
+    exact[candidate_rows == np.asarray(rows)[:, None]] = np.inf
+    order = np.lexsort((candidate_rows, exact), axis=1)
+    candidate_rows = np.take_along_axis(candidate_rows, order, axis=1)[:, :k]
+    exact = np.take_along_axis(exact, order, axis=1)[:, :k]
+
+    found = np.isfinite(exact)
+    out_rows = np.full((len(rows), k), -1, dtype=np.int32)
+    out_distances = np.full((len(rows), k), np.inf, dtype=np.float32)
+    n = candidate_rows.shape[1]
+    out_rows[:, :n] = np.where(found, candidate_rows, -1)
+    out_distances[:, :n] = np.where(found, exact, np.inf)
+    _worker['rows'][rows] = out_rows
+    _worker['distances'][rows] = out_distances
+    return len(rows)
+
+
+def _blocks(clusters, rows):
+    """Bloques (cluster, filas) con como mucho BLOCK_ELEMENTS distancias cada uno."""
+    blocks = []
+    for cluster_id in np.unique(clusters[rows]):
+        cluster_rows = rows[clusters[rows] == cluster_id]
+        n_members = len(cluster_members(clusters, cluster_id))
+        size = max(1, BLOCK_ELEMENTS // n_members)
+        for start in range(0, len(cluster_rows), size):
+            blocks.append((int(cluster_id), cluster_rows[start:start + size]))
+    return blocks
+
+
+def _version_tag(n_rows):
+    return [str(NEIGHBOR_TABLE_FORMAT_VERSION), str(n_rows)]
+
+
+def build_neighbor_table(snapshot, k=DEFAULT_TABLE_K, rows=None, workers=None):
+    """
+    Construir la tabla de vecinos y publicarla dentro del snapshot.
+
+    Args:
+        snapshot (CatalogSnapshot): Snapshot del catálogo
+        k (int): Vecinos por canción
+        rows (np.ndarray): Filas a precalcular (por defecto, todas)
+        workers (int): Procesos del pool (por defecto, uno por CPU; 1 = sin pool)
+
+    Returns:
+        str: Ruta de la tabla publicada
+    """
+    clusters = np.asarray(snapshot.columns['cluster'])
+    rows = np.arange(snapshot.n_rows) if rows is None else np.sort(np.asarray(rows, dtype=np.int64))
+    workers = workers or os.cpu_count() or 1
+
+    path = os.path.join(snapshot.path, NEIGHBOR_TABLE_DIRNAME)
+    tmp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+    os.makedirs(tmp_path)
+    try:
+        table_rows = np.lib.format.open_memmap(os.path.join(tmp_path, 'rows.npy'), mode='w+',
+                                               dtype=np.int32, shape=(snapshot.n_rows, k))
+        table_rows[:] = -1
+        table_distances = np.lib.format.open_memmap(os.path.join(tmp_path, 'distances.npy'), mode='w+',
+                                                    dtype=np.float32, shape=(snapshot.n_rows, k))
+        table_distances[:] = np.inf
+        table_rows.flush()
+        table_distances.flush()
+        del table_rows, table_distances
+
+        blocks = _blocks(clusters, rows)
+        if workers == 1:
+            _init_worker(snapshot.path, tmp_path)
+            for cluster_id, block in blocks:
+                _compute_block(cluster_id, block)
+            _worker.clear()
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(snapshot.path, tmp_path)) as pool:
+                for future in [pool.submit(_compute_block, *block) for block in blocks]:
+                    future.result()
+
+        with open(os.path.join(tmp_path, 'VERSION'), 'w') as f:
+            f.write(' '.join(_version_tag(snapshot.n_rows)))
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    publish_directory(tmp_path, path)
+    return path
+
+
+def load_neighbor_table(directory, n_rows):
+    """
+    Cargar la tabla guardada en `directory` (memory-mapped).
+
+    Returns:
+        NeighborTable: Tabla cargada, o None si no existe o no corresponde al catálogo
+    """
+    path = os.path.join(directory, NEIGHBOR_TABLE_DIRNAME)
+    try:
+        with open(os.path.join(path, 'VERSION')) as f:
+            if f.read().split() != _version_tag(n_rows):
+                return None
+        rows = np.load(os.path.join(path, 'rows.npy'), mmap_mode='r')
+        distances = np.load(os.path.join(path, 'distances.npy'), mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    return NeighborTable(rows, distances)
+
+
+def verify_neighbor_table(table, X, clusters, sample_size=200, seed=0):
+    """
+    Comparar la tabla con la búsqueda euclídea exacta en una muestra de filas.
+
+    Returns:
+        dict: {'checked': int, 'mismatches': [filas con resultados distintos]}
+    """
+    rng = np.random.default_rng(seed)
+    computed = np.flatnonzero(table.rows[:, 0] >= 0)
+    rows = rng.choice(computed, size=min(sample_size, len(computed)), replace=False)
+    mismatches = []
+    for row in rows:
+        members = cluster_members(clusters, clusters[row])
+        members = members[members != row]
+        _, expected = exact_neighbors(X, members, row, table.k)
+        _, distances = table.get(int(row), table.k)
+        if not np.allclose(distances, expected[:len(distances)], rtol=1e-5, atol=1e-6):
+            mismatches.append(int(row))
+    return {'checked': int(len(rows)), 'mismatches': mismatches}
+
+
+if __name__ == "__main__":
+    # Precalcular la tabla: python neighbor_table.py [ruta/al/csv] [--k 10] [--popular N]
+    from catalog import load_snapshot, resolve_data_path
+
+    parser = argparse.ArgumentParser(description='Precalcular los vecinos de cada canción')
+    parser.add_argument('data', nargs='?', help='CSV del catálogo (por defecto, el del servidor)')
+    parser.add_argument('--k', type=int, default=DEFAULT_TABLE_K, help='Vecinos por canción')
+    parser.add_argument('--popular', type=int, help='Precalcular solo las N canciones más populares')
+    parser.add_argument('--workers', type=int, help='Procesos (por defecto, uno por CPU)')
+    args = parser.parse_args()
+
+    snapshot = load_snapshot(args.data or resolve_data_path())
+    rows = None
+    if args.popular:
+        popularity = np.asarray(snapshot.columns['popularity_original'])
+        rows = np.argsort(-popularity, kind='stable')[:args.popular]
+
+    start = time.perf_counter()
+    path = build_neighbor_table(snapshot, args.k, rows, args.workers)
+    elapsed = time.perf_counter() - start
+    table = load_neighbor_table(snapshot.path, snapshot.n_rows)
+    report = verify_neighbor_table(table, snapshot.features, np.asarray(snapshot.columns['cluster']))
+    print(f"Tabla de vecinos (k={args.k}) guardada en {path} en {elapsed:.2f}s")
+    print(f"Verificación: {report['checked']} canciones, {len(report['mismatches'])} discrepancias")
+    sys.exit(1 if report['mismatches'] else 0)
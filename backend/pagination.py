@@ -0,0 +1,59 @@
+"""
+Paginación por cursor de los listados precalculados.
+
+Los listados (`/api/popular-songs`, `/api/songs-by-mood`,
+`/api/songs-by-feature`) son cortes de las vistas materializadas: rankings
+fijos para cada versión del catálogo. Un cursor guarda la vista, la posición
+en el ranking y la versión del catálogo, así que pedir la página siguiente es
+otro corte del mismo array, sin recalcular las anteriores.
+
+El cursor es opaco para los clientes (JSON en base64 url-safe). Si el catálogo
+cambia entre dos páginas, el ranking puede haber cambiado y el cursor deja de
+ser válido (`StaleCursorError`): el cliente debe empezar de nuevo.
+"""
+import base64
+import binascii
+import json
+
+
+class StaleCursorError(ValueError):
+    """El cursor es de otra versión del catálogo."""
+
+
+def encode_cursor(view, offset, version):
+    """Cursor opaco que apunta a la posición `offset` de la vista `view`."""
+    payload = json.dumps({'view': view, 'offset': int(offset), 'version': version},
+                         sort_keys=True, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, view, version):
+    """
+    Posición en el ranking a la que apunta un cursor.
+
+    Args:
+        cursor (str): Cursor devuelto en `next_cursor`
+        view (str): Vista del listado pedido
+        version (str): Versión del catálogo activo
+
+    Returns:
+        int: Posición de la primera canción de la página
+
+    Raises:
+        ValueError: Si el cursor no es válido o es de otro listado
+        StaleCursorError: Si el cursor es de otra versión del catálogo
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        offset = payload['offset']
+        cursor_view, cursor_version = payload['view'], payload['version']
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise ValueError('Cursor no válido')
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        raise ValueError('Cursor no válido')
+    if cursor_view != view:
+        raise ValueError('El cursor no corresponde a este listado')
+    if cursor_version != version:
+        raise StaleCursorError('El catálogo ha cambiado; vuelve a pedir la primera página')
+    return offset
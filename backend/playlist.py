@@ -0,0 +1,360 @@
+"""
+Listas de reproducción a partir de varias canciones semilla.
+
+- La consulta es el centroide (ponderado) de las semillas en el espacio de
+  características; los candidatos salen de los clusters más cercanos a él.
+- Se excluyen las semillas y todo lo ya reproducido en la sesión.
+- Diversidad: máximo de canciones por artista y reordenación MMR (Maximal
+  Marginal Relevance), que penaliza candidatos muy parecidos a los ya elegidos.
+- La sesión guarda ese estado y la bolsa de candidatos, de modo que "dame N
+  más" continúa la lista en lugar de recalcularla desde cero.
+
+Las sesiones viven en memoria de cada proceso (`PlaylistSessions`); con
+`PLAYLIST_SESSION_DIR` su estado ligero se comparte entre workers en disco
+(cada worker comprueba en cada petición si otro tiene una revisión más nueva)
+y la bolsa de candidatos se recalcula si la petición llega a otro worker. Sin
+directorio compartido y con varios workers, las sesiones necesitan
+enrutamiento fijo (sticky) al worker que las creó; `gunicorn_config.py` fija
+un directorio compartido por defecto cuando hay más de un worker.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from lookup_index import parse_artists
+
+MAX_SEEDS = 50
+MAX_PLAYLIST_LENGTH = 500
+
+DEFAULT_LENGTH = 20
+DEFAULT_ARTIST_CAP = 2
+DEFAULT_DIVERSITY = 0.3
+
+# Clusters (por distancia del centroide a la consulta) en los que se buscan candidatos
+PLAYLIST_CLUSTERS = 3
+
+# Candidatos por canción pedida; la bolsa se amplía cuando se agota
+POOL_FACTOR = 5
+
+# Límite de la bolsa y de ampliaciones por tanda cuando el tope de artistas
+# descarta candidatos: al alcanzarlo, la tanda sale más corta
+MAX_POOL_SIZE = 20000
+MAX_REFILLS = 3
+
+# Últimas canciones elegidas que cuentan para la penalización MMR
+MMR_MEMORY = 50
+
+DEFAULT_SESSION_TTL = int(os.environ.get('PLAYLIST_SESSION_TTL', 3600))
+DEFAULT_MAX_SESSIONS = int(os.environ.get('PLAYLIST_MAX_SESSIONS', 10000))
+
+
+@functools.lru_cache(maxsize=65536)
+def primary_artist(artists):
+    """Artista principal (el primero de la lista) en minúsculas."""
+    parsed = parse_artists(artists)
+    return parsed[0].lower() if parsed else ''
+
+
+class PlaylistSession:
+    """Estado de una lista en curso."""
+
+    def __init__(self, session_id, seeds, seed_weights, artist_cap, diversity,
+                 played=(), artist_counts=None, recent=(), created_at=None, catalog_version=None,
+                 revision=0):
+        self.id = session_id
+        self.seeds = [int(s) for s in seeds]
+        self.seed_weights = [float(w) for w in seed_weights]
+        self.artist_cap = int(artist_cap)
+        self.diversity = float(diversity)
+        self.played = set(int(r) for r in played) | set(self.seeds)
+        self.artist_counts = dict(artist_counts or {})
+        self.recent = [int(r) for r in recent]
+        self.created_at = created_at or time.time()
+        self.catalog_version = catalog_version
+        # Se incrementa en cada `PlaylistSessions.save`: la copia con más revisiones es la última
+        self.revision = int(revision)
+
+        # Bolsa de candidatos (no se persiste): filas ordenadas por distancia
+        self.query = None
+        self.pool_rows = None
+        self.pool_distances = None
+        self.pool_size = 0
+        self.lock = threading.Lock()
+
+    def to_dict(self):
+        return {'id': self.id, 'seeds': self.seeds, 'seed_weights': self.seed_weights,
+                'artist_cap': self.artist_cap, 'diversity': self.diversity,
+                'played': sorted(self.played), 'artist_counts': self.artist_counts,
+                'recent': self.recent, 'created_at': self.created_at,
+                'catalog_version': self.catalog_version, 'revision': self.revision}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['id'], data['seeds'], data['seed_weights'], data['artist_cap'],
+                   data['diversity'], data['played'], data['artist_counts'], data['recent'],
+                   data['created_at'], data.get('catalog_version'), data.get('revision', 0))
+
+
+class PlaylistEngine:
+    """Genera y amplía listas con centroide ponderado, exclusiones y diversidad."""
+
+    def __init__(self, X, similarity, artists):
+        """
+        Args:
+            X (np.ndarray): Matriz de características (n_canciones, n_features)
+            similarity (ClusterSimilarity): Búsqueda de candidatos por clusters
+            artists (np.ndarray): Texto de artistas de cada canción
+        """
+        self.X = X
+        self.similarity = similarity
+        self.artists = artists
+
+    def start(self, seeds, seed_weights=None, artist_cap=DEFAULT_ARTIST_CAP, diversity=DEFAULT_DIVERSITY):
+        """
+        Crear una sesión a partir de las canciones semilla.
+
+        Raises:
+            ValueError: Si las semillas, los pesos o los parámetros no son válidos
+        """
+        if not isinstance(seeds, list) or not seeds:
+            raise ValueError("Se requiere una lista de canciones semilla")
+        if len(seeds) > MAX_SEEDS:
+            raise ValueError(f"Se admiten como máximo {MAX_SEEDS} canciones semilla")
+        for seed in seeds:
+            if not isinstance(seed, (int, np.integer)) or not 0 <= seed < len(self.X):
+                raise ValueError(f"No se encuentra la canción con índice {seed}")
+        seed_weights = [1.0] * len(seeds) if seed_weights is None else seed_weights
+        if len(seed_weights) != len(seeds) or any(float(w) < 0 for w in seed_weights) \
+                or sum(float(w) for w in seed_weights) <= 0:
+            raise ValueError("Los pesos deben ser no negativos, uno por semilla y no todos cero")
+        if int(artist_cap) < 1:
+            raise ValueError("artist_cap debe ser mayor que 0")
+        if not 0 <= float(diversity) <= 1:
+            raise ValueError("diversity debe estar entre 0 y 1")
+        return PlaylistSession(uuid.uuid4().hex, seeds, seed_weights, artist_cap, diversity)
+
+    def query_vector(self, session):
+        """Centroide ponderado de las semillas."""
+        weights = np.asarray(session.seed_weights)
+        return (self.X[session.seeds] * weights[:, None]).sum(axis=0) / weights.sum()
+
+    def _refill(self, session, size):
+        """Recalcular la bolsa con los `size` candidatos no reproducidos más cercanos."""
+        if session.query is None:
+            session.query = self.query_vector(session)
+        size = min(len(self.X), MAX_POOL_SIZE, size)
+        positions = self.similarity.clusters_near(session.query, PLAYLIST_CLUSTERS)
+        rows, distances = self.similarity.candidates(session.query, positions, size + len(session.played))
+        if len(rows) < size + len(session.played):
+            # Los clusters cercanos no bastan: buscar en todos
+            positions = np.arange(len(self.similarity.cluster_ids))
+            rows, distances = self.similarity.candidates(session.query, positions, size + len(session.played))
+
+        played = np.fromiter(session.played, dtype=np.int64, count=len(session.played))
+        keep = ~np.isin(rows, played)
+        rows, distances = rows[keep], distances[keep]
+        order = np.lexsort((rows, distances))[:size]
+        session.pool_rows, session.pool_distances = rows[order], distances[order]
+        session.pool_size = size
+
+    def exclude(self, session, rows):
+        """Marcar como reproducidas canciones externas a la lista (y quitarlas de la bolsa)."""
+        rows = [int(r) for r in rows if isinstance(r, (int, np.integer)) and 0 <= r < len(self.X)]
+        session.played.update(rows)
+        if session.pool_rows is not None and rows:
+            keep = ~np.isin(session.pool_rows, rows)
+            session.pool_rows, session.pool_distances = session.pool_rows[keep], session.pool_distances[keep]
+
+    def remap(self, session, mapping):
+        """
+        Traducir las filas de una sesión a otra versión del catálogo.
+
+        Args:
+            session (PlaylistSession): Sesión a actualizar
+            mapping (np.ndarray): Fila nueva de cada fila anterior (-1 si la canción ya no existe)
+        """
+        def _map(rows):
+            rows = np.asarray(list(rows), dtype=np.int64)
+            rows = mapping[rows[(rows >= 0) & (rows < len(mapping))]]
+            return rows[rows >= 0].tolist()
+
+        pairs = [(int(mapping[s]), w) for s, w in zip(session.seeds, session.seed_weights)
+                 if s < len(mapping) and mapping[s] >= 0]
+        if not pairs:
+            raise ValueError("Las canciones semilla ya no están en el catálogo")
+        session.seeds = [seed for seed, _ in pairs]
+        session.seed_weights = [weight for _, weight in pairs]
+        session.played = set(_map(session.played)) | set(session.seeds)
+        session.recent = _map(session.recent)
+        session.query = session.pool_rows = session.pool_distances = None
+        session.pool_size = 0
+
+    def extend(self, session, n):
+        """
+        Elegir las `n` siguientes canciones de la sesión (MMR con tope por artista).
+
+        Si el tope por artista descarta demasiados candidatos, la bolsa se amplía
+        como mucho MAX_REFILLS veces (hasta MAX_POOL_SIZE) y la tanda puede
+        salir con menos de `n` canciones.
+
+        Returns:
+            tuple: (filas elegidas, distancias al centroide de las semillas)
+        """
+        if not 1 <= n <= MAX_PLAYLIST_LENGTH:
+            raise ValueError(f"n debe estar entre 1 y {MAX_PLAYLIST_LENGTH}")
+
+        # La bolsa se rellena con margen para que las siguientes tandas no recalculen
+        if session.pool_rows is None or len(session.pool_rows) < n * POOL_FACTOR:
+            self._refill(session, 2 * n * POOL_FACTOR)
+
+        selected, selected_distances = self._pick(session, n)
+        for _ in range(MAX_REFILLS):
+            if len(selected) >= n or session.pool_size >= min(len(self.X), MAX_POOL_SIZE):
+                break
+            # La bolsa se quedó corta (p. ej. por el tope de artistas): ampliarla
+            self._refill(session, max(session.pool_size * 2, (n - len(selected)) * POOL_FACTOR))
+            more_rows, more_distances = self._pick(session, n - len(selected))
+            selected = np.concatenate([selected, more_rows])
+            selected_distances = np.concatenate([selected_distances, more_distances])
+        return selected, selected_distances
+
+    def _pick(self, session, n):
+        """Elegir hasta `n` canciones de la bolsa actual y quitarlas de ella."""
+        rows, distances = session.pool_rows, session.pool_distances
+        pool_artists = np.array([primary_artist(a) for a in self.artists[rows]], dtype=object)
+        capped = [a for a, count in session.artist_counts.items() if count >= session.artist_cap]
+        eligible = ~np.isin(pool_artists, capped) if capped else np.ones(len(rows), dtype=bool)
+
+        # MMR: relevancia frente a la consulta menos redundancia con lo ya elegido
+        # (similitud = 1 / (1 + distancia) en ambos casos)
+        features = self.X[rows]
+        relevance = 1 / (1 + distances)
+        redundancy = np.zeros(len(rows))
+        for row in session.recent:
+            np.maximum(redundancy, 1 / (1 + np.sqrt(((features - self.X[row]) ** 2).sum(axis=1))),
+                       out=redundancy)
+
+        chosen = []
+        for _ in range(n):
+            if not eligible.any():
+                break
+            scores = (1 - session.diversity) * relevance - session.diversity * redundancy
+            scores[~eligible] = -np.inf
+            best = int(np.argmax(scores))
+            chosen.append(best)
+            eligible[best] = False
+
+            artist = pool_artists[best]
+            session.artist_counts[artist] = session.artist_counts.get(artist, 0) + 1
+            if session.artist_counts[artist] >= session.artist_cap:
+                eligible &= pool_artists != artist
+            similarity = 1 / (1 + np.sqrt(((features - features[best]) ** 2).sum(axis=1)))
+            np.maximum(redundancy, similarity, out=redundancy)
+
+        selected = rows[chosen]
+        selected_distances = distances[chosen]
+        session.played.update(int(r) for r in selected)
+        session.recent = (session.recent + selected.tolist())[-MMR_MEMORY:]
+
+        # Quitar de la bolsa lo elegido; los descartes por artista siguen en ella
+        keep = np.ones(len(rows), dtype=bool)
+        keep[chosen] = False
+        session.pool_rows, session.pool_distances = rows[keep], distances[keep]
+        return selected, selected_distances
+
+
+class PlaylistSessions:
+    """Sesiones de listas con expulsión LRU/TTL y nivel compartido opcional en disco."""
+
+    def __init__(self, ttl=DEFAULT_SESSION_TTL, max_sessions=DEFAULT_MAX_SESSIONS, shared_dir=None):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.shared_dir = shared_dir
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+        self._sessions = OrderedDict()
+        self._touched = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """
+        Sesión por id, o None si no existe o ha caducado.
+
+        Con directorio compartido, la copia en memoria solo se usa si está al
+        día: si otro worker ha ampliado la lista después, se carga la suya (y
+        la bolsa de candidatos se recalcula).
+        """
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and self._touched[session_id] + self.ttl <= now:
+                self._remove(session_id)
+                session = None
+
+        shared = self._shared_get(session_id, now)
+        if shared is not None and (session is None or shared.revision > session.revision):
+            session = shared
+        if session is not None:
+            with self._lock:
+                self._store(session, now)
+        return session
+
+    def save(self, session):
+        """Guardar (o actualizar) una sesión tras crearla o ampliarla."""
+        session.revision += 1
+        with self._lock:
+            self._store(session, time.time())
+        self._shared_set(session)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    # --- Memoria (llamar con el lock tomado) ---
+
+    def _store(self, session, now):
+        self._sessions[session.id] = session
+        self._sessions.move_to_end(session.id)
+        self._touched[session.id] = now
+        while len(self._sessions) > self.max_sessions:
+            self._remove(next(iter(self._sessions)))
+
+    def _remove(self, session_id):
+        self._sessions.pop(session_id, None)
+        self._touched.pop(session_id, None)
+
+    # --- Nivel compartido en disco ---
+
+    def _shared_path(self, session_id):
+        # Los ids son hexadecimales (uuid4): no hay riesgo de salir del directorio
+        return os.path.join(self.shared_dir, f'{session_id}.json')
+
+    def _shared_get(self, session_id, now):
+        if not self.shared_dir or not all(c in '0123456789abcdef' for c in session_id):
+            return None
+        path = self._shared_path(session_id)
+        try:
+            if os.stat(path).st_mtime + self.ttl <= now:
+                os.remove(path)
+                return None
+            with open(path) as f:
+                return PlaylistSession.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _shared_set(self, session):
+        if not self.shared_dir:
+            return
+        path = self._shared_path(session.id)
+        tmp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(session.to_dict(), f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
@@ -1,65 +1,210 @@
 import pandas as pd
 import numpy as np
-from sklearn.neighbors import NearestNeighbors
+import threading
+import time
 import os
 
+from catalog import (NUMERIC_FEATURES, catalog_version, load_snapshot, resolve_data_path,
+                     source_fingerprint, validate_columns)
+from cluster_index import (N_NEIGHBORS, build_cluster_index, build_cluster_indexes, cluster_members,
+                           load_cluster_indexes, save_cluster_indexes)
+from harmonic_build import load_build, read_build_manifest
+from instrumentation import stage
+from lookup_index import LookupIndex, load_lookup_index, save_lookup_index
+from neighbor_table import load_neighbor_table
+from playlist import DEFAULT_ARTIST_CAP, DEFAULT_DIVERSITY, DEFAULT_LENGTH, PlaylistEngine
+from rules import RuleEngine, load_rules
+from search_index import MIN_QUERY_LENGTH, SearchIndex, load_search_index, save_search_index
+from serializers import STREAM_CHUNK_SIZE, SongSerializer
+from similarity import (ClusterSimilarity, DEFAULT_K, DEFAULT_NEIGHBOR_CLUSTERS,
+                        DEFAULT_RERANK_WEIGHT, MAX_K, RERANK_COLUMNS)
+from views import MaterializedViews, POPULAR_SORT, POPULAR_VIEW, load_views, save_views
+
 class SongRecommender:
-    def __init__(self):
-        # Obtener la ruta del archivo de datos
-        # Primero intenta en backend/data/ (para Railway con Root Directory = backend)
-        # Luego intenta en ../data/ (para desarrollo local)
-        backend_dir = os.path.dirname(os.path.abspath(__file__))
-        data_path = os.path.join(backend_dir, 'data', 'datos_procesados.csv')
-        
-        # Si no existe, intentar en la carpeta padre (desarrollo local)
-        if not os.path.exists(data_path):
-            parent_dir = os.path.dirname(backend_dir)
-            data_path = os.path.join(parent_dir, 'data', 'datos_procesados.csv')
-        
-        if not os.path.exists(data_path):
-            raise FileNotFoundError(f"No se encontró el archivo de datos en: {data_path}")
-            
-        self.df = pd.read_csv(data_path)
+    def __init__(self, data_path=None, use_snapshot=True, artifact_dir=None):
+        # Directorio de artefactos generado con harmonic_build.py: se carga tal
+        # cual, sin leer el CSV ni construir nada en tiempo de ejecución
+        self.artifact_dir = artifact_dir or os.environ.get('HARMONIC_ARTIFACT_DIR')
+        
+        if self.artifact_dir:
+            self.data_path = data_path
+            self.snapshot = load_build(self.artifact_dir)
+            self.source = self.snapshot.manifest['source']
+        else:
+            # Obtener la ruta del archivo de datos (backend/data/ o ../data/)
+            self.data_path = data_path or resolve_data_path()
+            
+            # Huella del CSV tomada antes de leerlo
+            self.source = source_fingerprint(self.data_path)
+            
+            # Cargar el snapshot binario memory-mapped (compartido entre workers);
+            # si no se puede compilar (p. ej. disco de solo lectura), leer el CSV
+            self.snapshot = None
+            if use_snapshot:
+                try:
+                    self.snapshot = load_snapshot(self.data_path)
+                except OSError:
+                    self.snapshot = None
+        
+        # Versión del catálogo; la correspondencia de filas con la versión
+        # anterior la fija link_previous()
+        self.version = catalog_version(self.source)
+        self.previous_version = None
+        self.previous_rows = None
+
+        if self.snapshot is not None:
+            self.df = self.snapshot.to_dataframe()
+        else:
+            self.df = pd.read_csv(self.data_path)
         
         # Verificar que tenemos todas las columnas originales necesarias
-        required_original_columns = ['year_original', 'popularity_original', 
-                                   'duration_ms_original', 'loudness_original', 
-                                   'tempo_original']
-        missing_columns = [col for col in required_original_columns if col not in self.df.columns]
-        if missing_columns:
-            raise ValueError(f"Faltan columnas originales en el CSV: {missing_columns}")
+        validate_columns(self.df)
             
-        self.numeric_features = ['acousticness', 'danceability', 'duration_ms', 
-                               'instrumentalness', 'liveness', 'loudness', 
-                               'popularity', 'speechiness', 'tempo']
+        self.numeric_features = list(NUMERIC_FEATURES)
         
-        # Inicializar diccionario de modelos KNN por cluster
-        self.knn_models = {}
+        # Protege los modelos KNN que se construyen bajo demanda (modo con hilos)
+        self._knn_lock = threading.Lock()
         
-    def _get_cluster_knn(self, cluster_id):
-        """Obtener o crear el modelo KNN para un cluster específico."""
-        if cluster_id not in self.knn_models:
-            # Filtrar canciones del cluster
-            cluster_songs = self.df[self.df['cluster'] == cluster_id]
-            
-            if len(cluster_songs) < 6:
-                # Si el cluster es muy pequeño, usar todas las canciones
-                cluster_songs = self.df
-            
-            # Crear y entrenar modelo KNN para este cluster
-            knn = NearestNeighbors(n_neighbors=min(6, len(cluster_songs)), metric='euclidean')
-            knn.fit(cluster_songs[self.numeric_features])
+        # Matriz de características para los índices KNN: float32 C-contigua,
+        # directamente la del snapshot (memory-mapped, compartida entre workers)
+        if self.snapshot is not None and self.snapshot.feature_names == self.numeric_features:
+            self.feature_matrix = self.snapshot.features
+        else:
+            self.feature_matrix = np.ascontiguousarray(self.df[self.numeric_features].to_numpy(dtype=np.float32))
+        
+        # Modelos KNN por cluster: se cargan ya construidos junto al snapshot
+        self.knn_models = self._load_artifact(
+            lambda path: load_cluster_indexes(path, len(self.df)),
+            lambda: build_cluster_indexes(self.feature_matrix, self.df['cluster'].to_numpy()),
+            lambda indexes, path: save_cluster_indexes(indexes, path, len(self.df)))
+        
+        # Vecinos precalculados por el proceso por lotes (neighbor_table.py), si existen
+        self.neighbor_table = None
+        if self.snapshot is not None:
+            self.neighbor_table = load_neighbor_table(self.snapshot.path, len(self.df))
+        
+        # Búsqueda de similares en el cluster de la semilla y en los vecinos
+        self.similarity = ClusterSimilarity(
+            self.feature_matrix, self.df['cluster'].to_numpy(), self._get_cluster_knn,
+            self.numeric_features,
+            {name: self.df[column].to_numpy(dtype=np.float64) for name, column in RERANK_COLUMNS.items()})
+        
+        # Serializador por columnas compartido por todos los métodos
+        self.serializer = SongSerializer(self.df)
+        
+        # Listas de reproducción a partir de varias semillas
+        self.playlists = PlaylistEngine(self.feature_matrix, self.similarity,
+                                        self.serializer.column('artists'))
+        
+        # Índice de n-gramas para el autocompletado
+        self.search_index = self._load_artifact(
+            lambda path: load_search_index(path, self.df),
+            lambda: SearchIndex.build(self.df),
+            lambda index, path: save_search_index(index, path, len(self.df)))
+        
+        # Índices de título y artista para find_songs
+        self.lookup_index = self._load_artifact(
+            lambda path: load_lookup_index(path, self.df),
+            lambda: LookupIndex.build(self.df),
+            lambda index, path: save_lookup_index(index, path, len(self.df)))
+        
+        # Reglas de estados de ánimo y características (rules.json) y su motor
+        self.rules = load_rules()
+        self.rule_engine = RuleEngine(self.df)
+        
+        # Rankings precalculados (populares, estados de ánimo y características)
+        self.views = self._load_artifact(
+            lambda path: load_views(path, len(self.df), self.rules),
+            lambda: MaterializedViews.build(self.rule_engine, self.rules),
+            lambda views, path: save_views(views, path, len(self.df)))
+        
+    def is_stale(self):
+        """Indicar si el CSV (o el build de artefactos) ha cambiado desde que se cargó este recomendador."""
+        try:
+            if self.artifact_dir:
+                return read_build_manifest(self.artifact_dir)['source'] != self.source
+            return source_fingerprint(self.data_path) != self.source
+        except (OSError, ValueError):
+            return False
+    
+    def link_previous(self, previous):
+        """
+        Calcular la correspondencia de filas con la versión anterior del catálogo.
+        
+        Las canciones se emparejan por `id`; las que ya no existen quedan en -1.
+        """
+        if previous is None or previous.version == self.version:
+            return
+        positions = pd.Series(np.arange(len(self.df), dtype=np.int64), index=self.df['id'].to_numpy())
+        positions = positions[~positions.index.duplicated()]
+        mapping = positions.reindex(previous.df['id'].to_numpy()).fillna(-1).to_numpy(dtype=np.int64)
+        self.previous_version = previous.version
+        self.previous_rows = mapping
+    
+    def map_song_indices(self, indices, version=None):
+        """
+        Traducir índices de canción obtenidos de otra versión del catálogo.
+        
+        Args:
+            indices (list): Índices de canción
+            version (str): Versión del catálogo de la que proceden (None = la actual)
             
-            self.knn_models[cluster_id] = {
-                'model': knn,
-                'indices': cluster_songs.index
-            }
+        Returns:
+            list: Índices en la versión actual
             
-        return self.knn_models[cluster_id]
+        Raises:
+            ValueError: Si la versión es desconocida o alguna canción ya no existe
+        """
+        if version is None or version == self.version:
+            return indices
+        if version != self.previous_version:
+            raise ValueError(f"Versión de catálogo desconocida: {version}")
+        mapped = []
+        for idx in indices:
+            if not isinstance(idx, (int, np.integer)) or not 0 <= idx < len(self.previous_rows):
+                raise ValueError(f"No se encuentra la canción con índice {idx}")
+            row = int(self.previous_rows[idx])
+            if row < 0:
+                raise ValueError(f"La canción con índice {idx} ya no está en el catálogo")
+            mapped.append(row)
+        return mapped
+        
+    def _load_artifact(self, load, build, save):
+        """
+        Cargar un artefacto derivado (índices) guardado junto al snapshot.
         
-    def _convert_to_json_serializable(self, song_dict):
-        """Convertir valores numpy a tipos Python nativos."""
-        return {k: float(v) if isinstance(v, np.number) else v for k, v in song_dict.items()}
+        Si no existe o está desactualizado se construye y se intenta guardar;
+        sin snapshot, simplemente se construye en memoria. Con un directorio de
+        artefactos (harmonic_build.py) no se construye nada: si falta, es un error.
+        """
+        if self.snapshot is None:
+            return build()
+        
+        artifact = load(self.snapshot.path)
+        if artifact is None:
+            if self.artifact_dir:
+                raise FileNotFoundError(f"Artefacto ausente o desactualizado en {self.artifact_dir}; "
+                                        "vuelve a generarlo con harmonic_build.py")
+            artifact = build()
+            try:
+                save(artifact, self.snapshot.path)
+            except OSError:
+                pass
+        return artifact
+        
+    def _get_cluster_knn(self, cluster_id):
+        """Obtener o crear el modelo KNN para un cluster específico."""
+        cluster_knn = self.knn_models.get(cluster_id)
+        if cluster_knn is None:
+            with self._knn_lock:
+                cluster_knn = self.knn_models.get(cluster_id)
+                if cluster_knn is None:
+                    with stage('knn_fit'):
+                        members = cluster_members(self.df['cluster'].to_numpy(), cluster_id)
+                        cluster_knn = build_cluster_index(self.feature_matrix, members)
+                    self.knn_models[cluster_id] = cluster_knn
+            
+        return cluster_knn
         
     def find_songs(self, name):
         """
@@ -71,36 +216,13 @@ class SongRecommender:
         Returns:
             list: Lista de diccionarios con información de las canciones encontradas
         """
-        # Buscar por nombre de canción (ignorando mayúsculas/minúsculas)
-        name_matches = self.df[self.df['name'].str.lower() == name.lower()].copy()
+        # Buscar por nombre de canción y por artista (ignorando mayúsculas/minúsculas);
+        # las filas ya vienen ordenadas por año de más reciente a más antiguo
+        with stage('lookup'):
+            matches = self.lookup_index.find(name)
         
-        # Buscar por artista (ignorando mayúsculas/minúsculas)
-        artist_matches = self.df[self.df['artists'].str.lower().str.contains(name.lower(), na=False)].copy()
-        
-        # Combinar ambos resultados y eliminar duplicados
-        matches = pd.concat([name_matches, artist_matches]).drop_duplicates()
-        
-        if matches.empty:
-            return []
-            
-        # Convertir todas las coincidencias a formato serializable
-        results = []
-        for _, song in matches.iterrows():
-            result = self._convert_to_json_serializable(song.to_dict())
-            result['index'] = int(song.name)  # song.name es el índice
-            
-            # Usar valores originales
-            result['year'] = int(song['year_original'])
-            result['popularity'] = float(song['popularity_original'])
-            result['duration_ms'] = int(song['duration_ms_original'])
-            result['loudness'] = float(song['loudness_original'])
-            result['tempo'] = float(song['tempo_original'])
-            
-            results.append(result)
-            
-        # Ordenar por año de más reciente a más antiguo
-        results.sort(key=lambda x: x['year'], reverse=True)
-        return results
+        with stage('serialize'):
+            return self.serializer.records(matches)
     
     def get_popular_songs(self, limit=20):
         """
@@ -112,24 +234,11 @@ class SongRecommender:
         Returns:
             list: Lista de diccionarios con información de las canciones populares
         """
-        # Ordenar por popularidad descendente
-        popular_songs = self.df.nlargest(limit, 'popularity_original')
+        # Ordenar por popularidad descendente (ranking precalculado)
+        popular_songs = self.views.top(POPULAR_VIEW, limit)
         
-        results = []
-        for _, song in popular_songs.iterrows():
-            result = self._convert_to_json_serializable(song.to_dict())
-            result['index'] = int(song.name)
-            
-            # Usar valores originales
-            result['year'] = int(song['year_original'])
-            result['popularity'] = float(song['popularity_original'])
-            result['duration_ms'] = int(song['duration_ms_original'])
-            result['loudness'] = float(song['loudness_original'])
-            result['tempo'] = float(song['tempo_original'])
-            
-            results.append(result)
-            
-        return results
+        with stage('serialize'):
+            return self.serializer.records(popular_songs)
     
     def get_songs_by_mood(self, mood, limit=10):
         """
@@ -142,111 +251,59 @@ class SongRecommender:
         Returns:
             list: Lista de diccionarios con información de las canciones filtradas
         """
-        mood = mood.lower()
-        filtered_df = self.df.copy()
-        
-        # Definir filtros por estado de ánimo basados en atributos musicales
-        # Nota: El CSV no tiene columna 'energy', usamos 'danceability' y 'liveness' como proxies
-        if mood in ['ansiedad', 'nervios', 'estrés', 'estres', 'tranquilidad', 'tranquilo', 'calma', 'relajante', 'relajado']:
-            # Para ansiedad/nervios: bajo tempo, alta acousticness, baja danceability, bajo loudness
-            filtered_df = filtered_df[
-                (filtered_df['tempo_original'] < 90) &  # Tempo lento
-                (filtered_df['acousticness'] > 0.5) &    # Alta acousticness
-                (filtered_df['danceability'] < 0.5) &     # Baja danceability (más calmada)
-                (filtered_df['loudness_original'] > -15)  # No muy fuerte
-            ]
-            # Ordenar por acousticness descendente y tempo ascendente
-            filtered_df = filtered_df.sort_values(['acousticness', 'tempo_original'], ascending=[False, True])
-            
-        elif mood in ['triste', 'tristeza', 'depresión', 'depresion']:
-            # Para tristeza: tempo medio-bajo, baja danceability, alta acousticness
-            filtered_df = filtered_df[
-                (filtered_df['tempo_original'] < 100) &
-                (filtered_df['danceability'] < 0.6) &
-                (filtered_df['acousticness'] > 0.4)
-            ]
-            filtered_df = filtered_df.sort_values(['acousticness', 'tempo_original'], ascending=[False, True])
-            
-        elif mood in ['feliz', 'alegría', 'alegria']:
-            # Para felicidad: tempo medio-alto, alta danceability, bajo acousticness (más electrónica)
-            filtered_df = filtered_df[
-                (filtered_df['tempo_original'] > 100) &
-                (filtered_df['danceability'] > 0.6) &
-                (filtered_df['acousticness'] < 0.5)  # Menos acústica = más electrónica/energética
-            ]
-            filtered_df = filtered_df.sort_values(['danceability', 'tempo_original'], ascending=[False, False])
-            
-        elif mood in ['energético', 'energia', 'energía', 'focus', 'concentración', 'concentracion']:
-            # Para energía: tempo alto, alta danceability, bajo acousticness
-            filtered_df = filtered_df[
-                (filtered_df['tempo_original'] > 120) &
-                (filtered_df['danceability'] > 0.7) &
-                (filtered_df['acousticness'] < 0.4)  # Menos acústica = más electrónica
-            ]
-            filtered_df = filtered_df.sort_values(['danceability', 'tempo_original'], ascending=[False, False])
-            
-        else:
+        # Los filtros por estado de ánimo (basados en atributos musicales) se
+        # definen en rules.json y están precalculados en las vistas materializadas
+        view = self.views.mood_view(mood)
+        if view is None:
             # Si no se reconoce el estado de ánimo, devolver canciones populares
             return self.get_popular_songs(limit)
         
-        # Limitar resultados
-        filtered_df = filtered_df.head(limit)
-        
-        # Convertir a formato JSON
-        results = []
-        for _, song in filtered_df.iterrows():
-            result = self._convert_to_json_serializable(song.to_dict())
-            result['index'] = int(song.name)
-            
-            # Usar valores originales
-            result['year'] = int(song['year_original'])
-            result['popularity'] = float(song['popularity_original'])
-            result['duration_ms'] = int(song['duration_ms_original'])
-            result['loudness'] = float(song['loudness_original'])
-            result['tempo'] = float(song['tempo_original'])
-            
-            results.append(result)
-        
-        return results
+        # Limitar resultados y convertir a formato JSON
+        with stage('serialize'):
+            return self.serializer.records(self.views.top(view, limit))
     
-    def search_suggestions(self, query, limit=10):
+    def search_suggestions(self, query, limit=10, ranked=False, prefix=False):
         """
         Buscar sugerencias de canciones y artistas para autocompletado.
         
         Args:
             query (str): Texto de búsqueda
             limit (int): Número máximo de sugerencias
+            ranked (bool): Ordenar por popularidad en lugar de por posición en el catálogo
+            prefix (bool): Solo coincidencias al inicio del nombre o de una palabra
             
         Returns:
             list: Lista de sugerencias con nombre y artista
         """
-        if not query or len(query) < 2:
+        if not query or len(query) < MIN_QUERY_LENGTH or limit <= 0:
             return []
         
-        query_lower = query.lower()
-        
-        # Buscar en nombres de canciones
-        name_matches = self.df[
-            self.df['name'].str.lower().str.contains(query_lower, na=False)
-        ].head(limit)
-        
-        # Buscar en artistas
-        artist_matches = self.df[
-            self.df['artists'].str.lower().str.contains(query_lower, na=False)
-        ].head(limit)
-        
-        # Combinar y eliminar duplicados
-        matches = pd.concat([name_matches, artist_matches]).drop_duplicates(subset=['name', 'artists']).head(limit)
-        
-        suggestions = []
-        for _, song in matches.iterrows():
-            suggestions.append({
-                'name': song['name'],
-                'artists': song['artists'],
-                'index': int(song.name)
-            })
-        
-        return suggestions
+        # Buscar en nombres de canciones y en artistas
+        # (en modo ranking hacen falta todas las coincidencias para ordenarlas)
+        field_limit = None if ranked else limit
+        with stage('search'):
+            name_matches = self.search_index.search('name', query, field_limit, prefix)
+            artist_matches = self.search_index.search('artists', query, field_limit, prefix)
+            
+            rows = name_matches + artist_matches
+            if ranked:
+                rows = self.search_index.rank(np.unique(rows)).tolist()
+        
+        # Combinar y eliminar duplicados (misma canción y artista)
+        names = self.serializer.column('name')
+        artists = self.serializer.column('artists')
+        seen = set()
+        matches = []
+        for row in rows:
+            key = (names[row], artists[row])
+            if key not in seen:
+                seen.add(key)
+                matches.append(row)
+                if len(matches) >= limit:
+                    break
+        
+        with stage('serialize'):
+            return self.serializer.records(matches, columns=['name', 'artists'])
     
     def get_songs_by_feature(self, feature, limit=20):
         """
@@ -259,73 +316,92 @@ class SongRecommender:
         Returns:
             list: Lista de diccionarios con información de las canciones filtradas
         """
-        filtered_df = self.df.copy()
-        
-        if feature == 'recent':
-            # Canciones recientes (últimos 10 años)
-            current_year = 2024  # Ajustar según sea necesario
-            min_year = current_year - 10
-            filtered_df = filtered_df[filtered_df['year_original'] >= min_year]
-            filtered_df = filtered_df.sort_values(['year_original', 'popularity_original'], ascending=[False, False])
-            
-        elif feature == 'danceable':
-            # Alta danceability (música para bailar)
-            filtered_df = filtered_df[filtered_df['danceability'] > 0.7]
-            filtered_df = filtered_df.sort_values(['danceability', 'popularity_original'], ascending=[False, False])
-            
-        elif feature == 'acoustic':
-            # Alta acousticness (música acústica)
-            filtered_df = filtered_df[filtered_df['acousticness'] > 0.5]
-            filtered_df = filtered_df.sort_values(['acousticness', 'popularity_original'], ascending=[False, False])
-            
-        elif feature == 'high-energy':
-            # Alta energía (alta danceability y tempo)
-            filtered_df = filtered_df[
-                (filtered_df['danceability'] > 0.7) &
-                (filtered_df['tempo_original'] > 120)
-            ]
-            filtered_df = filtered_df.sort_values(['danceability', 'tempo_original'], ascending=[False, False])
-            
-        elif feature == 'instrumental':
-            # Alta instrumentalness (música instrumental)
-            filtered_df = filtered_df[filtered_df['instrumentalness'] > 0.5]
-            filtered_df = filtered_df.sort_values(['instrumentalness', 'popularity_original'], ascending=[False, False])
-            
-        elif feature == 'live':
-            # Alta liveness (grabaciones en vivo)
-            filtered_df = filtered_df[filtered_df['liveness'] > 0.3]
-            filtered_df = filtered_df.sort_values(['liveness', 'popularity_original'], ascending=[False, False])
-            
-        elif feature == 'speech':
-            # Alta speechiness (música con habla)
-            filtered_df = filtered_df[filtered_df['speechiness'] > 0.3]
-            filtered_df = filtered_df.sort_values(['speechiness', 'popularity_original'], ascending=[False, False])
-            
-        else:
+        # Filtros y ordenaciones definidos en rules.json y precalculados en las vistas
+        view = self.views.feature_view(feature)
+        if view is None:
             # Si no se reconoce la característica, devolver canciones populares
             return self.get_popular_songs(limit)
         
-        # Limitar resultados
-        filtered_df = filtered_df.head(limit)
+        # Limitar resultados y convertir a formato JSON
+        with stage('serialize'):
+            return self.serializer.records(self.views.top(view, limit))
+    
+    def listing_view(self, listing, name=None):
+        """
+        Vista materializada de un listado paginable.
         
-        # Convertir a formato JSON
-        results = []
-        for _, song in filtered_df.iterrows():
-            result = self._convert_to_json_serializable(song.to_dict())
-            result['index'] = int(song.name)
+        Args:
+            listing (str): 'popular', 'mood' o 'feature'
+            name (str): Estado de ánimo o característica
             
-            # Usar valores originales
-            result['year'] = int(song['year_original'])
-            result['popularity'] = float(song['popularity_original'])
-            result['duration_ms'] = int(song['duration_ms_original'])
-            result['loudness'] = float(song['loudness_original'])
-            result['tempo'] = float(song['tempo_original'])
-            result['danceability'] = float(song['danceability'])
-            result['acousticness'] = float(song['acousticness'])
+        Returns:
+            str: Nombre de la vista (la de populares si no se reconoce, como en
+            get_songs_by_mood y get_songs_by_feature)
+        """
+        view = None
+        if listing == 'mood':
+            view = self.views.mood_view(name)
+        elif listing == 'feature':
+            view = self.views.feature_view(name)
+        return view or POPULAR_VIEW
+    
+    def get_view_page(self, view, offset=0, limit=20):
+        """
+        Obtener una página de un ranking precalculado.
+        
+        Args:
+            view (str): Nombre de la vista (ver listing_view)
+            offset (int): Posición de la primera canción en el ranking
+            limit (int): Número máximo de canciones de la página
             
-            results.append(result)
+        Returns:
+            tuple: (canciones, posición de la página siguiente o None si es la última, total)
+        """
+        rows = self.views.page(view, offset, limit)
+        total = self.views.size(view)
         
-        return results
+        with stage('serialize'):
+            songs = self.serializer.records(rows)
+        next_offset = offset + len(rows)
+        return songs, (next_offset if next_offset < total else None), total
+    
+    def iter_view_records(self, view, offset=0, limit=None, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Recorrer un ranking precalculado por bloques (para exportaciones en streaming).
+        
+        Cada bloque se serializa al pedirlo, así que la memoria no depende del
+        número de canciones.
+        
+        Args:
+            view (str): Nombre de la vista (ver listing_view)
+            offset (int): Posición de la primera canción
+            limit (int): Número máximo de canciones (None = hasta el final)
+            chunk_size (int): Canciones por bloque
+            
+        Yields:
+            list: Lista de diccionarios con las canciones de cada bloque
+        """
+        total = self.views.size(view)
+        end = total if limit is None else min(total, offset + limit)
+        for start in range(offset, end, chunk_size):
+            yield self.serializer.records(self.views.page(view, start, min(chunk_size, end - start)))
+    
+    def get_songs_by_filter(self, conditions, sort=None, limit=20):
+        """
+        Obtener canciones que cumplen un filtro ad-hoc.
+        
+        Args:
+            conditions (list): Condiciones (columna, operador, valor), p. ej. ('tempo_original', '>=', 90)
+            sort (list): Claves de ordenación (columna, descendente); por defecto, popularidad
+            limit (int): Número de canciones a retornar
+            
+        Returns:
+            list: Lista de diccionarios con información de las canciones filtradas
+        """
+        with stage('filter'):
+            rows = self.rule_engine.evaluate(conditions, sort or POPULAR_SORT)
+        with stage('serialize'):
+            return self.serializer.records(rows[:max(limit, 0)])
     
     def get_recommendations(self, song_idx):
         """
@@ -337,6 +413,13 @@ class SongRecommender:
         Returns:
             list: Lista de diccionarios con información de las canciones recomendadas
         """
+        # Vecinos precalculados: un corte de la tabla memory-mapped
+        if self.neighbor_table is not None and isinstance(song_idx, (int, np.integer)):
+            found = self.neighbor_table.get(int(song_idx), N_NEIGHBORS - 1)
+            if found is not None:
+                with stage('serialize'):
+                    return self.serializer.records(found[0], extra={'distance': found[1]})
+        
         try:
             # Obtener el cluster de la canción
             song_cluster = self.df.loc[song_idx, 'cluster']
@@ -345,34 +428,198 @@ class SongRecommender:
             cluster_knn = self._get_cluster_knn(song_cluster)
             
             # Obtener las características de la canción
-            song_features = self.df.iloc[song_idx][self.numeric_features].values.reshape(1, -1)
+            song_features = self.feature_matrix[song_idx].reshape(1, -1)
             
             # Encontrar los vecinos más cercanos
-            distances, indices = cluster_knn['model'].kneighbors(song_features)
+            with stage('kneighbors'):
+                distances, indices = cluster_knn['model'].kneighbors(song_features)
             
             # Convertir índices locales del cluster a índices globales
             global_indices = cluster_knn['indices'][indices[0]]
             
             # Excluir la primera canción (que es la misma) y tomar las siguientes 5
-            recommendations = []
-            for idx, distance in zip(global_indices[1:], distances[0][1:]):
-                song_info = self._convert_to_json_serializable(self.df.iloc[idx].to_dict())
-                song_info['index'] = int(idx)
-                song_info['distance'] = float(distance)
-                
-                # Usar valores originales
-                song_info['year'] = int(song_info['year_original'])
-                song_info['popularity'] = float(song_info['popularity_original'])
-                song_info['duration_ms'] = int(song_info['duration_ms_original'])
-                song_info['loudness'] = float(song_info['loudness_original'])
-                song_info['tempo'] = float(song_info['tempo_original'])
-                
-                recommendations.append(song_info)
-                
-            return recommendations
+            with stage('serialize'):
+                return self.serializer.records(global_indices[1:], extra={'distance': distances[0][1:]})
         except IndexError:
             raise ValueError(f"No se encuentra la canción con índice {song_idx}")
 
+    def get_similar_songs(self, song_idx, k=DEFAULT_K, neighbor_clusters=DEFAULT_NEIGHBOR_CLUSTERS,
+                          weights=None, rerank=None, rerank_weight=DEFAULT_RERANK_WEIGHT):
+        """
+        Obtener canciones similares buscando también en los clusters vecinos.
+        
+        A diferencia de `get_recommendations`, las canciones cercanas a la
+        frontera de su cluster reciben sus vecinos reales aunque estén en otro
+        cluster, y se puede pedir cualquier número de resultados.
+        
+        Args:
+            song_idx (int): Índice de la canción en el DataFrame
+            k (int): Número de canciones a retornar
+            neighbor_clusters (int): Clusters vecinos (por distancia entre centroides) en los que buscar
+            weights (dict): Pesos por característica, p. ej. {'tempo': 2, 'liveness': 0}
+            rerank (str): 'popularity' o 'year' para favorecer canciones populares o recientes
+            rerank_weight (float): Peso de la reordenación frente a la similitud (0-1)
+            
+        Returns:
+            list: Canciones con su 'distance' (y 'score' si se reordena)
+        """
+        if not isinstance(song_idx, (int, np.integer)) or not 0 <= song_idx < len(self.df):
+            raise ValueError(f"No se encuentra la canción con índice {song_idx}")
+        
+        with stage('similarity'):
+            rows, distances, scores = self.similarity.search(
+                int(song_idx), k, neighbor_clusters, weights, rerank, rerank_weight)
+        
+        extra = {'distance': distances}
+        if scores is not None:
+            extra['score'] = scores
+        with stage('serialize'):
+            return self.serializer.records(rows, extra=extra)
+
+    def start_playlist(self, seeds, n=DEFAULT_LENGTH, seed_weights=None,
+                       artist_cap=DEFAULT_ARTIST_CAP, diversity=DEFAULT_DIVERSITY):
+        """
+        Crear una lista de reproducción a partir de varias canciones semilla.
+        
+        Args:
+            seeds (list): Índices de las canciones semilla
+            n (int): Número de canciones de la primera tanda
+            seed_weights (list): Peso de cada semilla en el centroide (por defecto, iguales)
+            artist_cap (int): Máximo de canciones por artista en toda la lista
+            diversity (float): Peso de la diversidad frente a la similitud (0-1, MMR)
+            
+        Returns:
+            tuple: (PlaylistSession, lista de canciones con su 'distance')
+        """
+        session = self.playlists.start(seeds, seed_weights, artist_cap, diversity)
+        session.catalog_version = self.version
+        return session, self.extend_playlist(session, n)
+    
+    def extend_playlist(self, session, n=DEFAULT_LENGTH, played=None):
+        """
+        Añadir las `n` siguientes canciones a una lista en curso.
+        
+        Args:
+            session (PlaylistSession): Sesión devuelta por `start_playlist`
+            n (int): Número de canciones a añadir
+            played (list): Canciones reproducidas o descartadas fuera de la lista
+            
+        Returns:
+            list: Lista de canciones con su 'distance' al centroide de las semillas
+        """
+        with session.lock:
+            if session.catalog_version != self.version:
+                # Sesión creada con la versión anterior del catálogo: traducir sus filas
+                if session.catalog_version != self.previous_version:
+                    raise ValueError("La sesión pertenece a una versión del catálogo que ya no está disponible")
+                self.playlists.remap(session, self.previous_rows)
+                session.catalog_version = self.version
+            if played:
+                self.playlists.exclude(session, played)
+            with stage('playlist'):
+                rows, distances = self.playlists.extend(session, n)
+        with stage('serialize'):
+            return self.serializer.records(rows, extra={'distance': distances})
+
+    def get_recommendations_batch(self, indices, k=5):
+        """
+        Obtener canciones similares para varias canciones a la vez.
+        
+        Las canciones que están en la tabla de vecinos precalculados se
+        resuelven con ella; el resto se agrupan por cluster y se hace una sola
+        llamada vectorizada a `kneighbors` por cluster.
+        
+        Args:
+            indices (list): Índices de las canciones semilla
+            k (int): Número de recomendaciones por canción
+            
+        Returns:
+            list: Una entrada {'index', 'recommendations'} por semilla, en el mismo orden
+        """
+        for idx in indices:
+            if not isinstance(idx, (int, np.integer)) or isinstance(idx, bool) or not 0 <= idx < len(self.df):
+                raise ValueError(f"No se encuentra la canción con índice {idx}")
+        seeds = np.asarray(indices, dtype=np.int64)
+        if not 1 <= k <= MAX_K:
+            raise ValueError(f"k debe estar entre 1 y {MAX_K}")
+        
+        clusters = self.df['cluster'].to_numpy()[seeds]
+        neighbor_rows = [None] * len(seeds)
+        neighbor_distances = [None] * len(seeds)
+        
+        # Vecinos precalculados (si k cabe en la tabla); el resto, con los índices KNN
+        pending = np.ones(len(seeds), dtype=bool)
+        if self.neighbor_table is not None:
+            for position, seed in enumerate(seeds.tolist()):
+                found = self.neighbor_table.get(seed, k)
+                if found is not None:
+                    neighbor_rows[position], neighbor_distances[position] = found
+                    pending[position] = False
+        
+        for cluster_id in np.unique(clusters[pending]):
+            positions = np.flatnonzero(pending & (clusters == cluster_id))
+            cluster_knn = self._get_cluster_knn(cluster_id)
+            n_neighbors = min(k + 1, len(cluster_knn['indices']))
+            with stage('kneighbors'):
+                distances, local = cluster_knn['model'].kneighbors(
+                    self.feature_matrix[seeds[positions]], n_neighbors=n_neighbors)
+            global_rows = cluster_knn['indices'][local]
+            
+            for position, rows, dists in zip(positions, global_rows, distances):
+                # Excluir la propia canción (o el vecino más lejano si no aparece)
+                keep = rows != seeds[position]
+                if keep.all():
+                    keep[-1] = False
+                neighbor_rows[position] = rows[keep][:k]
+                neighbor_distances[position] = dists[keep][:k]
+        
+        # Serializar todas las filas necesarias de una vez
+        with stage('serialize'):
+            unique_rows, inverse = np.unique(np.concatenate(neighbor_rows), return_inverse=True)
+            records = self.serializer.records(unique_rows)
+        
+            results = []
+            offset = 0
+            for seed, rows, dists in zip(seeds, neighbor_rows, neighbor_distances):
+                recommendations = []
+                for position, distance in zip(inverse[offset:offset + len(rows)], dists.tolist()):
+                    song_info = dict(records[position])
+                    song_info['distance'] = distance
+                    recommendations.append(song_info)
+                offset += len(rows)
+                results.append({'index': int(seed), 'recommendations': recommendations})
+            
+        return results
+
+    def warm_up(self):
+        """
+        Ejecutar consultas representativas para dejar listos índices y vistas.
+        
+        Toca todas las vistas, el índice de búsqueda, el índice de títulos y
+        al menos una canción de cada cluster, de modo que en el modo preload
+        todo queda cargado en el proceso maestro antes del fork.
+        
+        Returns:
+            dict: Segundos empleados por cada grupo de consultas
+        """
+        timings = {}
+        
+        def timed(name, fn):
+            start = time.perf_counter()
+            fn()
+            timings[name] = time.perf_counter() - start
+        
+        popular = self.get_popular_songs(20)
+        timed('moods', lambda: [self.get_songs_by_mood(mood, 10) for mood in self.rules.moods])
+        timed('features', lambda: [self.get_songs_by_feature(feature, 20) for feature in self.rules.features])
+        timed('search', lambda: self.search_suggestions(popular[0]['name'][:3] if popular else 'lo'))
+        timed('find', lambda: self.find_songs(popular[0]['name']) if popular else None)
+        
+        # Una canción semilla por cluster
+        _, first_rows = np.unique(self.df['cluster'].to_numpy(), return_index=True)
+        timed('recommendations', lambda: self.get_recommendations_batch(first_rows))
+        return timings
+
 # Ejemplo de uso:
 if __name__ == "__main__":
     # Inicializar el recomendador
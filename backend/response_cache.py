@@ -0,0 +1,245 @@
+"""
+Caché de respuestas HTTP para las rutas GET de listados.
+
+- Clave: ruta + argumentos de la petición normalizados (ordenados), dentro
+  de la versión de los datos (versión del catálogo).
+- Memoria acotada por número de entradas y por bytes, con expulsión LRU y TTL.
+- Opcionalmente, un segundo nivel en disco (`RESPONSE_CACHE_DIR`) compartido
+  por todos los workers de la máquina, sin servicios externos. Cada fichero
+  lleva la versión en el nombre: al recargar el catálogo solo se borran los
+  de la versión anterior y los workers que ya sirven la nueva no pierden sus
+  entradas.
+- Cada respuesta lleva `ETag` y `Cache-Control`, de modo que las repeticiones
+  del navegador o de la CDN con `If-None-Match` se responden con 304.
+"""
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import Response, request
+
+DEFAULT_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+DEFAULT_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Cada cuántas escrituras se purga el directorio compartido
+_SHARED_PRUNE_EVERY = 100
+
+
+class _Entry:
+    __slots__ = ('body', 'mimetype', 'etag', 'expires_at')
+
+    def __init__(self, body, mimetype, etag, expires_at):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """Caché LRU/TTL de cuerpos de respuesta, con nivel compartido opcional en disco."""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=DEFAULT_MAX_BYTES, shared_dir=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.shared_dir = shared_dir
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {'hits': 0, 'shared_hits': 0, 'misses': 0,
+                      'not_modified': 0, 'evictions': 0}
+
+    @staticmethod
+    def make_key(path, args):
+        """Clave normalizada: ruta + argumentos ordenados."""
+        items = sorted((k, v) for k in args for v in args.getlist(k))
+        return path + '?' + '&'.join(f'{k}={v}' for k, v in items)
+
+    def get(self, key, version=None):
+        key = self._scoped(key, version)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return entry
+                self._remove(key)
+
+        entry = self._shared_get(key, version, now)
+        with self._lock:
+            if entry is not None:
+                self.stats['shared_hits'] += 1
+                self._store(key, entry)
+            else:
+                self.stats['misses'] += 1
+        return entry
+
+    def set(self, key, body, mimetype, ttl=None, version=None):
+        key = self._scoped(key, version)
+        ttl = self.ttl if ttl is None else ttl
+        entry = _Entry(body, mimetype, hashlib.sha1(body).hexdigest(), time.time() + ttl)
+        # Las respuestas demasiado grandes no se cachean para no vaciar la caché
+        if len(body) > self.max_bytes // 8:
+            return entry
+        with self._lock:
+            self._store(key, entry)
+        self._shared_set(key, version, entry)
+        return entry
+
+    def clear(self, version=None):
+        """
+        Vaciar la memoria y, si se indica `version`, borrar del disco las
+        entradas de esa versión (las de otras versiones se conservan).
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.shared_dir and version is not None:
+            prefix = f'{version}-'
+            for filename in os.listdir(self.shared_dir):
+                if filename.startswith(prefix):
+                    try:
+                        os.remove(os.path.join(self.shared_dir, filename))
+                    except OSError:
+                        pass
+
+    def record_not_modified(self):
+        with self._lock:
+            self.stats['not_modified'] += 1
+
+    def snapshot_stats(self):
+        """Contadores para monitorización."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update(entries=len(self._entries), bytes=self._bytes,
+                         shared=bool(self.shared_dir))
+        return stats
+
+    @staticmethod
+    def _scoped(key, version):
+        return key if version is None else f'{version}:{key}'
+
+    # --- Memoria (llamar con el lock tomado) ---
+
+    def _store(self, key, entry):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += len(entry.body)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats['evictions'] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+    # --- Nivel compartido en disco ---
+
+    def _shared_path(self, key, version):
+        # Versiones hexadecimales (catalog_version): válidas como nombre de fichero
+        filename = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.shared_dir, filename if version is None else f'{version}-{filename}')
+
+    def _shared_get(self, key, version, now):
+        if not self.shared_dir:
+            return None
+        try:
+            with open(self._shared_path(key, version), 'rb') as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if header['key'] != key or header['expires_at'] <= now:
+            return None
+        return _Entry(body, header['mimetype'], header['etag'], header['expires_at'])
+
+    def _shared_set(self, key, version, entry):
+        if not self.shared_dir:
+            return
+        path = self._shared_path(key, version)
+        tmp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+        header = {'key': key, 'mimetype': entry.mimetype, 'etag': entry.etag,
+                  'expires_at': entry.expires_at}
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(json.dumps(header).encode('utf-8') + b'\n')
+                f.write(entry.body)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self._writes += 1
+        if self._writes % _SHARED_PRUNE_EVERY == 0:
+            self._shared_prune()
+
+    def _shared_prune(self):
+        """Borrar las entradas más antiguas del disco por encima de `max_entries`."""
+        try:
+            files = [os.path.join(self.shared_dir, name) for name in os.listdir(self.shared_dir)]
+            files.sort(key=lambda path: os.stat(path).st_mtime)
+        except OSError:
+            return
+        for path in files[:max(0, len(files) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _conditional_response(entry, ttl):
+    """Respuesta completa, o 304 si el cliente ya tiene esta versión."""
+    if entry.etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(entry.body, mimetype=entry.mimetype)
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = f'public, max-age={ttl}'
+    return response
+
+
+def cached_response(cache, ttl=None, version=None, bypass=None):
+    """
+    Decorador para rutas GET: sirve desde la caché y añade ETag/Cache-Control.
+
+    Solo se cachean las respuestas 200; los errores se devuelven tal cual.
+    `version` (callable) devuelve la versión de los datos, que forma parte de
+    la clave y del nombre de los ficheros compartidos: tras recargar el
+    catálogo no se sirven respuestas antiguas.
+    Si `bypass` (callable) devuelve True, la petición no pasa por la caché
+    (exportaciones en streaming, que no deben acumularse en memoria).
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if bypass is not None and bypass():
+                return view(*args, **kwargs)
+            entry_ttl = cache.ttl if ttl is None else ttl
+            key = cache.make_key(request.path, request.args)
+            data_version = version() if version is not None else None
+            entry = cache.get(key, data_version)
+            if entry is None:
+                response = view(*args, **kwargs)
+                status = response[1] if isinstance(response, tuple) else response.status_code
+                if status != 200:
+                    return response
+                entry = cache.set(key, response.get_data(), response.mimetype, entry_ttl, data_version)
+
+            if entry.etag in request.if_none_match:
+                cache.record_not_modified()
+            return _conditional_response(entry, entry_ttl)
+        return wrapper
+    return decorator
@@ -0,0 +1,183 @@
+"""
+Motor de reglas declarativo para los filtros por estado de ánimo y característica.
+
+Las reglas se definen en `rules.json`: cada una indica condiciones sobre
+columnas (`where`), claves de ordenación (`sort`) y, para los estados de
+ánimo, sus alias. Al compilarse, cada condición atómica (p. ej.
+`danceability > 0.7`) se evalúa una sola vez como predicado vectorizado de
+NumPy y se guarda como bitset empaquetado; las reglas que comparten
+condiciones reutilizan ese bitset.
+
+El mismo motor evalúa filtros ad-hoc de la API (rango de tempo, década,
+popularidad mínima o expresiones `columna>=valor;...`).
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json')
+
+OPERATORS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+# Bitsets de condiciones ad-hoc que se conservan en memoria (LRU)
+MAX_CACHED_CONDITIONS = 256
+
+_EXPRESSION_RE = re.compile(r'^\s*([A-Za-z_][A-Za-z0-9_]*)\s*(<=|>=|==|!=|<|>)\s*(-?[0-9.]+(?:[eE]-?[0-9]+)?)\s*$')
+
+
+class Rule:
+    """Regla compilada: condiciones (columna, operador, valor) y claves de ordenación."""
+
+    def __init__(self, name, where, sort, aliases=(), description=''):
+        self.name = name
+        self.where = [(column, op, float(value)) for column, op, value in where]
+        self.sort = [(column, direction == 'desc') for column, direction in sort]
+        self.aliases = list(aliases)
+        self.description = description
+
+        for column, op, _ in self.where:
+            if op not in OPERATORS:
+                raise ValueError(f"Operador no soportado en la regla '{name}': {op}")
+
+
+class RuleSet:
+    """Reglas de estados de ánimo y características cargadas de la configuración."""
+
+    def __init__(self, moods, features, fingerprint):
+        self.moods = moods
+        self.features = features
+        self.fingerprint = fingerprint
+        self.aliases = {}
+        for name, rule in moods.items():
+            for alias in [name] + rule.aliases:
+                self.aliases[alias.lower()] = name
+
+    def mood(self, mood):
+        """Regla de un estado de ánimo a partir de cualquiera de sus alias."""
+        name = self.aliases.get(mood.lower())
+        return self.moods[name] if name else None
+
+
+def load_rules(path=RULES_PATH):
+    """
+    Cargar las reglas desde un fichero JSON.
+
+    Returns:
+        RuleSet: Reglas compiladas, con una huella del contenido del fichero
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    config = json.loads(raw.decode('utf-8'))
+
+    def _rules(section):
+        return {name: Rule(name, spec.get('where', []), spec.get('sort', []),
+                           spec.get('aliases', []), spec.get('description', ''))
+                for name, spec in config.get(section, {}).items()}
+
+    return RuleSet(_rules('moods'), _rules('features'), hashlib.sha256(raw).hexdigest()[:16])
+
+
+def parse_filter_expression(expression):
+    """
+    Convertir una expresión `columna>=valor;columna<valor` en condiciones.
+
+    Raises:
+        ValueError: Si alguna parte de la expresión no es válida
+    """
+    conditions = []
+    for part in filter(None, (p.strip() for p in expression.split(';'))):
+        match = _EXPRESSION_RE.match(part)
+        if not match:
+            raise ValueError(f"Expresión de filtro no válida: '{part}'")
+        column, op, value = match.groups()
+        conditions.append((column, op, float(value)))
+    return conditions
+
+
+class RuleEngine:
+    """Evalúa condiciones sobre las columnas numéricas del catálogo con bitsets cacheados."""
+
+    def __init__(self, df, max_cached=MAX_CACHED_CONDITIONS):
+        self.n_rows = len(df)
+        self.columns = {name: df[name].to_numpy() for name in df.columns
+                        if df[name].dtype.kind in 'biuf'}
+        self.max_cached = max_cached
+        self._bitsets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _column(self, name):
+        if name not in self.columns:
+            raise ValueError(f"Columna no válida para filtrar: '{name}'")
+        return self.columns[name]
+
+    def _bitset(self, condition):
+        """Bitset empaquetado de una condición atómica (calculado una sola vez)."""
+        with self._lock:
+            bits = self._bitsets.get(condition)
+            if bits is not None:
+                self._bitsets.move_to_end(condition)
+                return bits
+
+        column, op, value = condition
+        if op not in OPERATORS:
+            raise ValueError(f"Operador no soportado: {op}")
+        bits = np.packbits(OPERATORS[op](self._column(column), value))
+
+        with self._lock:
+            self._bitsets[condition] = bits
+            if len(self._bitsets) > self.max_cached:
+                self._bitsets.popitem(last=False)
+        return bits
+
+    def mask(self, conditions):
+        """Máscara booleana con la conjunción de todas las condiciones."""
+        if not conditions:
+            return np.ones(self.n_rows, dtype=bool)
+        bits = self._bitset(conditions[0])
+        for condition in conditions[1:]:
+            bits = bits & self._bitset(condition)
+        return np.unpackbits(bits, count=self.n_rows).astype(bool)
+
+    def rank(self, mask, sort):
+        """
+        Filas que cumplen `mask` ordenadas por `sort` [(columna, descendente), ...].
+
+        La ordenación es estable: ante empates se conserva el orden del catálogo.
+        """
+        return self.order(np.flatnonzero(mask), sort)
+
+    def order(self, rows, sort):
+        """Ordenar `rows` por `sort` (estable: ante empates se conserva el orden de `rows`)."""
+        sort_keys = []
+        for column, descending in reversed(sort):
+            values = self._column(column)[rows]
+            sort_keys.append(-values if descending else values)
+        order = np.lexsort(sort_keys) if sort_keys else np.arange(len(rows))
+        return rows[order].astype(np.int32)
+
+    def evaluate(self, conditions, sort):
+        """Filas ordenadas que cumplen una lista de condiciones."""
+        return self.rank(self.mask(conditions), sort)
+
+    def evaluate_rules(self, rules):
+        """
+        Evaluar varias reglas de una vez.
+
+        Primero se calcula cada condición atómica distinta (una pasada por
+        columna y condición) y después se combinan los bitsets de cada regla.
+        """
+        for condition in dict.fromkeys(c for rule in rules.values() for c in rule.where):
+            self._bitset(condition)
+        return {name: self.evaluate(rule.where, rule.sort) for name, rule in rules.items()}
@@ -0,0 +1,254 @@
+"""
+Índice invertido de n-gramas para el autocompletado.
+
+Cada texto normalizado (en minúsculas) se descompone en bigramas y trigramas.
+Los n-gramas se codifican como enteros de 64 bits a partir de sus code points,
+de modo que el índice completo son tres arrays de NumPy (claves ordenadas,
+offsets y listas de filas) que se guardan dentro del snapshot del catálogo y
+se abren con memory-mapping, compartidos entre workers.
+
+Una consulta intersecta las listas de sus n-gramas y verifica los candidatos
+con una comparación de substring real, así que no hay falsos positivos.
+"""
+import os
+import uuid
+
+import numpy as np
+
+from catalog import publish_directory
+
+SEARCH_INDEX_FORMAT_VERSION = 1
+SEARCH_INDEX_DIRNAME = 'search_index'
+
+# Longitud mínima de consulta (igual que el autocompletado del frontend)
+MIN_QUERY_LENGTH = 2
+
+# Code point fuera del rango Unicode para marcar los bigramas
+_BIGRAM_MARK = 0x1FFFFF
+_SEPARATOR = '\x00'
+
+
+def normalize(text):
+    """Normalizar un texto para búsqueda (los nulos no coinciden con nada)."""
+    if not isinstance(text, str):
+        return ''
+    return text.lower()
+
+
+def _encode_ngrams(codes):
+    """Codificar todos los bigramas y trigramas de un array de code points."""
+    codes = codes.astype(np.int64)
+    bigrams = (codes[:-1] << 42) | (codes[1:] << 21) | _BIGRAM_MARK
+    trigrams = (codes[:-2] << 42) | (codes[1:-1] << 21) | codes[2:]
+    return bigrams, trigrams
+
+
+def _query_ngrams(query):
+    codes = np.frombuffer(query.encode('utf-32-le'), dtype=np.uint32)
+    bigrams, trigrams = _encode_ngrams(codes)
+    # Los trigramas son más selectivos; el bigrama solo para consultas de 2 caracteres
+    return np.unique(trigrams if len(trigrams) else bigrams)
+
+
+def _normalized_texts(values):
+    """Textos normalizados de una columna; los valores repetidos comparten el mismo str."""
+    cache = {}
+    texts = []
+    for value in values:
+        text = cache.get(value) if isinstance(value, str) else None
+        if text is None:
+            text = normalize(value).replace(_SEPARATOR, '')
+            if isinstance(value, str):
+                cache[value] = text
+        texts.append(text)
+    return texts
+
+
+class NgramIndex:
+    """Índice de bigramas/trigramas sobre una columna de texto."""
+
+    def __init__(self, texts, keys, offsets, postings):
+        self.texts = texts
+        self.keys = keys
+        self.offsets = offsets
+        self.postings = postings
+
+    @classmethod
+    def build(cls, values):
+        """
+        Construir el índice de forma vectorizada.
+
+        Todos los textos se concatenan (separados por un carácter nulo) en un
+        único array de code points; los n-gramas que cruzan un separador se
+        descartan.
+        """
+        texts = _normalized_texts(values)
+        joined = _SEPARATOR.join(texts) + _SEPARATOR
+        codes = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32)
+
+        # Fila de cada posición del texto concatenado
+        lengths = np.fromiter((len(t) + 1 for t in texts), dtype=np.int64, count=len(texts))
+        row_of = np.repeat(np.arange(len(texts), dtype=np.int32), lengths)
+        is_sep = codes == 0
+
+        bigrams, trigrams = _encode_ngrams(codes)
+        valid_bi = ~(is_sep[:-1] | is_sep[1:])
+        valid_tri = ~(is_sep[:-2] | is_sep[1:-1] | is_sep[2:])
+
+        keys = np.concatenate([bigrams[valid_bi], trigrams[valid_tri]])
+        rows = np.concatenate([row_of[:-1][valid_bi], row_of[:-2][valid_tri]])
+
+        # Ordenar por (n-grama, fila) y quitar repeticiones dentro de una fila
+        order = np.lexsort((rows, keys))
+        keys, rows = keys[order], rows[order]
+        keep = np.ones(len(keys), dtype=bool)
+        keep[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+        keys, rows = keys[keep], rows[keep]
+
+        unique_keys, starts = np.unique(keys, return_index=True)
+        offsets = np.append(starts, len(keys)).astype(np.int64)
+        return cls(texts, unique_keys, offsets, rows.astype(np.int32))
+
+    def extended(self, new, start):
+        """
+        Índice con las filas de `new` (construido solo con las filas nuevas,
+        que empiezan en `start`) añadidas.
+
+        Las filas nuevas son posteriores a todas las existentes, así que cada
+        lista combinada es la antigua seguida de la nueva: no hace falta
+        reordenar, solo recolocar los bloques en los nuevos offsets.
+        """
+        keys = np.union1d(self.keys, new.keys)
+        old_slots = np.searchsorted(keys, self.keys)
+        new_slots = np.searchsorted(keys, new.keys)
+        old_counts = np.zeros(len(keys), dtype=np.int64)
+        old_counts[old_slots] = np.diff(self.offsets)
+        new_counts = np.zeros(len(keys), dtype=np.int64)
+        new_counts[new_slots] = np.diff(new.offsets)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(old_counts + new_counts, out=offsets[1:])
+
+        postings = np.empty(offsets[-1], dtype=np.int32)
+        for source, base, shift in ((self, offsets[old_slots], 0),
+                                    (new, offsets[new_slots] + old_counts[new_slots], start)):
+            # Posición de cada elemento dentro de su lista, desplazada al inicio de la lista combinada
+            lengths = np.diff(source.offsets)
+            within = np.arange(len(source.postings)) - np.repeat(source.offsets[:-1], lengths)
+            postings[np.repeat(base, lengths) + within] = source.postings + shift
+        return NgramIndex(self.texts + new.texts, keys, offsets, postings)
+
+    def _posting(self, key):
+        pos = np.searchsorted(self.keys, key)
+        if pos == len(self.keys) or self.keys[pos] != key:
+            return self.postings[:0]
+        return self.postings[self.offsets[pos]:self.offsets[pos + 1]]
+
+    def candidates(self, query):
+        """Filas que contienen todos los n-gramas de la consulta (en orden de fila)."""
+        lists = sorted((self._posting(key) for key in _query_ngrams(query)), key=len)
+        result = lists[0]
+        for posting in lists[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, posting, assume_unique=True)
+        return result
+
+    def search(self, query, limit=None, prefix=False):
+        """
+        Buscar filas cuyo texto contiene la consulta.
+
+        Args:
+            query (str): Texto normalizado a buscar (al menos 2 caracteres)
+            limit (int): Máximo de filas (None = todas)
+            prefix (bool): Solo coincidencias al inicio del texto o de una palabra
+
+        Returns:
+            list: Filas coincidentes en orden del catálogo
+        """
+        texts = self.texts
+        word_prefix = ' ' + query
+        matches = []
+        for row in self.candidates(query).tolist():
+            text = texts[row]
+            if prefix:
+                found = text.startswith(query) or word_prefix in text
+            else:
+                found = query in text
+            if found:
+                matches.append(row)
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
+
+    def save(self, directory, name):
+        np.save(os.path.join(directory, f'{name}.keys.npy'), self.keys)
+        np.save(os.path.join(directory, f'{name}.offsets.npy'), self.offsets)
+        np.save(os.path.join(directory, f'{name}.postings.npy'), self.postings)
+
+    @classmethod
+    def load(cls, directory, name, values):
+        def _load(part):
+            return np.load(os.path.join(directory, f'{name}.{part}.npy'), mmap_mode='r')
+        texts = _normalized_texts(values)
+        return cls(texts, _load('keys'), _load('offsets'), _load('postings'))
+
+
+class SearchIndex:
+    """Índices de n-gramas para `name` y `artists`, con ranking por popularidad."""
+
+    FIELDS = ('name', 'artists')
+
+    def __init__(self, fields, popularity):
+        self.fields = fields
+        self.popularity = popularity
+
+    @classmethod
+    def build(cls, df):
+        fields = {field: NgramIndex.build(df[field].to_numpy()) for field in cls.FIELDS}
+        return cls(fields, df['popularity_original'].to_numpy())
+
+    def search(self, field, query, limit=None, prefix=False):
+        return self.fields[field].search(normalize(query), limit, prefix)
+
+    def extended(self, df, start):
+        """Índice con las filas nuevas de `df` (a partir de `start`) añadidas."""
+        fields = {field: index.extended(NgramIndex.build(df[field].to_numpy()[start:]), start)
+                  for field, index in self.fields.items()}
+        return SearchIndex(fields, df['popularity_original'].to_numpy())
+
+    def rank(self, rows):
+        """Ordenar filas por `popularity_original` descendente (estable)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows[np.argsort(-self.popularity[rows], kind='stable')]
+
+
+def save_search_index(index, directory, n_rows):
+    """Guardar el índice en `directory` de forma atómica."""
+    path = os.path.join(directory, SEARCH_INDEX_DIRNAME)
+    tmp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+    os.makedirs(tmp_path)
+    for field, ngram_index in index.fields.items():
+        ngram_index.save(tmp_path, field)
+    with open(os.path.join(tmp_path, 'VERSION'), 'w') as f:
+        f.write(f'{SEARCH_INDEX_FORMAT_VERSION} {n_rows}')
+    publish_directory(tmp_path, path)
+    return path
+
+
+def load_search_index(directory, df):
+    """
+    Cargar el índice guardado en `directory`.
+
+    Returns:
+        SearchIndex: Índice memory-mapped, o None si no existe o no corresponde al catálogo
+    """
+    path = os.path.join(directory, SEARCH_INDEX_DIRNAME)
+    try:
+        with open(os.path.join(path, 'VERSION')) as f:
+            if f.read().split() != [str(SEARCH_INDEX_FORMAT_VERSION), str(len(df))]:
+                return None
+        fields = {field: NgramIndex.load(path, field, df[field].to_numpy())
+                  for field in SearchIndex.FIELDS}
+    except OSError:
+        return None
+    return SearchIndex(fields, df['popularity_original'].to_numpy())
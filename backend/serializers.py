@@ -0,0 +1,93 @@
+"""
+Serialización de canciones a JSON orientada a columnas.
+
+En lugar de recorrer las filas con `iterrows()` + `to_dict()`, se seleccionan
+las columnas una sola vez, se indexan los arrays con todas las filas pedidas
+y se convierten a tipos nativos de Python con `tolist()`.
+"""
+import json
+
+import numpy as np
+
+# Columnas escaladas que se devuelven con su valor original: destino -> (origen, tipo)
+ORIGINAL_VALUE_COLUMNS = {
+    'year': ('year_original', np.int64),
+    'popularity': ('popularity_original', np.float64),
+    'duration_ms': ('duration_ms_original', np.int64),
+    'loudness': ('loudness_original', np.float64),
+    'tempo': ('tempo_original', np.float64),
+}
+
+# Canciones por fragmento al generar respuestas JSON en streaming
+STREAM_CHUNK_SIZE = 256
+
+
+class SongSerializer:
+    """Convierte filas del catálogo en diccionarios serializables a JSON."""
+
+    def __init__(self, df):
+        self.columns = list(df.columns)
+        self._arrays = {col: df[col].to_numpy() for col in self.columns}
+
+    def column(self, name):
+        """Array de una columna (sin copia)."""
+        return self._arrays[name]
+
+    def records(self, rows, columns=None, extra=None):
+        """
+        Construir los diccionarios de varias filas de una vez.
+
+        Args:
+            rows (array-like): Filas globales a serializar (en el orden deseado)
+            columns (list): Columnas a incluir (por defecto, todas)
+            extra (dict): Columnas adicionales {nombre: valores alineados con rows}
+
+        Returns:
+            list: Lista de diccionarios con 'index' y los valores originales aplicados
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = self.columns if columns is None else columns
+
+        values = {col: self._arrays[col][rows].tolist() for col in columns}
+        values['index'] = rows.tolist()
+
+        # Usar valores originales
+        for target, (source, dtype) in ORIGINAL_VALUE_COLUMNS.items():
+            if target in values and source in self._arrays:
+                values[target] = self._arrays[source][rows].astype(dtype).tolist()
+
+        for name, column in (extra or {}).items():
+            values[name] = np.asarray(column).tolist()
+
+        names = list(values)
+        return [dict(zip(names, row)) for row in zip(*values.values())]
+
+
+def iter_json_array(records, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Codificar una lista de canciones como array JSON por fragmentos.
+
+    Pensado para `Response(iter_json_array(...))`: el cuerpo se envía a medida
+    que se codifica en lugar de construir un único string enorme.
+    """
+    yield '['
+    for start in range(0, len(records), chunk_size):
+        chunk = json.dumps(records[start:start + chunk_size], sort_keys=True,
+                           separators=(',', ':'))
+        # Quitar los corchetes del fragmento y unirlo con el anterior
+        yield (',' if start else '') + chunk[1:-1]
+    yield ']'
+
+
+def iter_ndjson(chunks):
+    """
+    Codificar canciones como NDJSON (un objeto JSON por línea).
+
+    Args:
+        chunks (iterable): Listas de canciones; se codifica una lista cada vez,
+            así que la memoria no depende del número total de canciones
+    """
+    for records in chunks:
+        if records:
+            yield '\n'.join(json.dumps(record, sort_keys=True, separators=(',', ':'))
+                            for record in records) + '\n'
@@ -0,0 +1,187 @@
+"""
+Búsqueda de canciones similares entre clusters.
+
+`get_recommendations` solo busca dentro del cluster de la canción semilla, así
+que una canción cerca de la frontera entre clusters recibe peores vecinos.
+`ClusterSimilarity` busca en el cluster de la semilla y en los clusters más
+cercanos (según la distancia entre centroides, precalculada sobre las
+características numéricas), combina los candidatos quedándose solo con los
+`k` mejores y permite:
+
+- un `k` configurable,
+- pesos por característica (distancia euclídea ponderada),
+- reordenar por popularidad o año mezclando esa señal con la similitud.
+
+Todas las operaciones sobre candidatos están vectorizadas con NumPy.
+"""
+import numpy as np
+
+DEFAULT_K = 10
+MAX_K = 500
+
+# Clusters vecinos (además del de la semilla) en los que se busca
+DEFAULT_NEIGHBOR_CLUSTERS = 2
+
+# Columnas escaladas en [0, 1] con las que se puede reordenar
+RERANK_COLUMNS = {'popularity': 'popularity', 'year': 'year'}
+DEFAULT_RERANK_WEIGHT = 0.3
+
+# Al reordenar se parte de `k * RERANK_POOL_FACTOR` candidatos por similitud
+RERANK_POOL_FACTOR = 3
+
+
+def select_nearest(rows, distances, n):
+    """
+    Los `n` candidatos más cercanos (sin filas repetidas), ordenados.
+
+    Selección acotada vectorizada: `argpartition` descarta en O(len) todo lo
+    que no puede estar entre los `n` mejores y solo esos se ordenan (ante
+    empates de distancia, por fila).
+    """
+    if len(rows) > n:
+        keep = np.argpartition(distances, n - 1)[:n]
+        rows, distances = rows[keep], distances[keep]
+    order = np.lexsort((rows, distances))
+    return rows[order], distances[order]
+
+
+class ClusterSimilarity:
+    """Centroides, radios y distancias entre clusters para la búsqueda global."""
+
+    def __init__(self, X, clusters, get_index, feature_names, rerank_values):
+        """
+        Args:
+            X (np.ndarray): Matriz de características (n_canciones, n_features)
+            clusters (np.ndarray): Cluster de cada canción
+            get_index (callable): cluster_id -> {'model', 'indices'} (índice KNN del cluster)
+            feature_names (list): Nombre de cada columna de `X`
+            rerank_values (dict): {nombre: valores en [0, 1]} para reordenar
+        """
+        self.X = X
+        self.clusters = clusters
+        self.get_index = get_index
+        self.feature_names = list(feature_names)
+        self.rerank_values = rerank_values
+
+        # Miembros de cada cluster (una sola ordenación para todos)
+        order = np.argsort(clusters, kind='stable')
+        self.cluster_ids, starts = np.unique(clusters[order], return_index=True)
+        self.members = np.split(order, starts[1:])
+        self._position = {int(c): i for i, c in enumerate(self.cluster_ids)}
+
+        self.centroids = np.stack([X[m].mean(axis=0, dtype=np.float64) for m in self.members])
+        self.radii = np.array([np.sqrt(((X[m] - c) ** 2).sum(axis=1)).max()
+                               for m, c in zip(self.members, self.centroids)])
+        diff = self.centroids[:, None, :] - self.centroids[None, :, :]
+        self.centroid_distances = np.sqrt((diff ** 2).sum(axis=2))
+
+    def nearest_clusters(self, cluster_id, n_neighbors):
+        """Posiciones del cluster de la semilla y de sus `n_neighbors` clusters más cercanos."""
+        seed = self._position[int(cluster_id)]
+        order = np.argsort(self.centroid_distances[seed], kind='stable')
+        order = order[order != seed][:n_neighbors]
+        return np.concatenate([[seed], order])
+
+    def clusters_near(self, query, n_clusters):
+        """Posiciones de los `n_clusters` clusters con el centroide más cercano a `query`."""
+        distances = ((self.centroids - query) ** 2).sum(axis=1)
+        return np.argsort(distances, kind='stable')[:n_clusters]
+
+    def weight_vector(self, weights):
+        """Vector de pesos a partir de {característica: peso} (1 por defecto)."""
+        vector = np.ones(len(self.feature_names))
+        for name, weight in weights.items():
+            if name not in self.feature_names:
+                raise ValueError(f"Característica no válida: '{name}'")
+            weight = float(weight)
+            if not np.isfinite(weight) or weight < 0:
+                raise ValueError(f"El peso de '{name}' debe ser un número no negativo")
+            vector[self.feature_names.index(name)] = weight
+        return vector
+
+    def _index_candidates(self, query, positions, n):
+        """
+        Candidatos con los índices KD-tree de cada cluster (distancia euclídea).
+
+        Un cluster se descarta sin consultarlo si su cota inferior
+        (distancia al centroide menos su radio) ya supera al n-ésimo mejor
+        candidato encontrado.
+        """
+        bounds = np.sqrt(((self.centroids[positions] - query) ** 2).sum(axis=1)) - self.radii[positions]
+        rows, distances = [], []
+        kth = np.inf
+        for position, bound in zip(positions, bounds):
+            if bound > kth:
+                continue
+            index = self.get_index(self.cluster_ids[position])
+            found_distances, local = index['model'].kneighbors(
+                query.reshape(1, -1), n_neighbors=min(n, len(index['indices'])))
+            rows.append(index['indices'][local[0]])
+            distances.append(found_distances[0])
+            merged = np.concatenate(distances)
+            if len(merged) >= n:
+                kth = np.partition(merged, n - 1)[n - 1]
+        # Los clusters pequeños se indexan con todo el catálogo: quitar repetidos
+        rows, first = np.unique(np.concatenate(rows), return_index=True)
+        return rows, np.concatenate(distances)[first]
+
+    def _weighted_candidates(self, query, positions, weights):
+        """Candidatos por fuerza bruta vectorizada con distancia euclídea ponderada."""
+        rows = np.concatenate([self.members[p] for p in positions])
+        distances = np.sqrt((((self.X[rows] - query) ** 2) * weights).sum(axis=1))
+        return rows, distances
+
+    def candidates(self, query, positions, n, weights=None):
+        """
+        Al menos los `n` candidatos más cercanos a `query` en los clusters `positions`.
+
+        Returns:
+            tuple: (filas, distancias), sin ordenar
+        """
+        if weights:
+            return self._weighted_candidates(query, positions, self.weight_vector(weights))
+        return self._index_candidates(query, positions, n)
+
+    def search(self, row, k=DEFAULT_K, neighbor_clusters=DEFAULT_NEIGHBOR_CLUSTERS,
+               weights=None, rerank=None, rerank_weight=DEFAULT_RERANK_WEIGHT):
+        """
+        Canciones más parecidas a `row` en su cluster y en los clusters vecinos.
+
+        Args:
+            row (int): Fila de la canción semilla
+            k (int): Número de resultados
+            neighbor_clusters (int): Clusters vecinos en los que buscar además del propio
+            weights (dict): Pesos por característica {nombre: peso}
+            rerank (str): 'popularity' o 'year' para mezclar esa señal con la similitud
+            rerank_weight (float): Peso de la señal de reordenación, entre 0 y 1
+
+        Returns:
+            tuple: (filas, distancias, puntuaciones o None)
+        """
+        if not 1 <= k <= MAX_K:
+            raise ValueError(f"k debe estar entre 1 y {MAX_K}")
+        if neighbor_clusters < 0:
+            raise ValueError("neighbor_clusters no puede ser negativo")
+        if rerank is not None and rerank not in self.rerank_values:
+            raise ValueError(f"Reordenación no válida: '{rerank}'")
+        if not 0 <= rerank_weight <= 1:
+            raise ValueError("rerank_weight debe estar entre 0 y 1")
+
+        query = self.X[row].astype(np.float64)
+        positions = self.nearest_clusters(self.clusters[row], neighbor_clusters)
+        pool = k * RERANK_POOL_FACTOR if rerank else k
+
+        # Un candidato más para poder excluir la propia canción
+        rows, distances = self.candidates(query, positions, pool + 1, weights)
+        keep = rows != row
+        rows, distances = select_nearest(rows[keep], distances[keep], pool)
+
+        if not rerank:
+            return rows, distances, None
+
+        # Similitud normalizada en [0, 1] mezclada con la señal de reordenación
+        max_distance = distances.max() if len(distances) else 0.0
+        similarity = 1 - distances / max_distance if max_distance > 0 else np.ones(len(distances))
+        scores = (1 - rerank_weight) * similarity + rerank_weight * self.rerank_values[rerank][rows]
+        order = np.lexsort((distances, -scores))[:k]
+        return rows[order], distances[order], scores[order]
@@ -0,0 +1,277 @@
+"""
+Recursos estáticos del frontend (páginas HTML e imágenes).
+
+`python static_assets.py` los prepara en la fase de build, dentro de
+`<frontend>/.assets/`:
+
+- el ETag de cada fichero (SHA-256 del contenido),
+- variantes precomprimidas gzip (y brotli, si el módulo `brotli` está
+  instalado) de los ficheros de texto,
+- páginas HTML con las referencias a imágenes versionadas
+  (`images/foto.jpg?v=<etag>`): esas URLs cambian con el contenido y se
+  sirven con caché inmutable; las páginas se revalidan con su ETag.
+
+El servidor carga el manifiesto una sola vez al arrancar y sirve cada fichero
+con `send_file` (respuestas 304 y peticiones Range incluidas). Los ficheros
+que no están en el manifiesto o han cambiado desde el build se sirven sin
+comprimir, con el ETag calculado al arrancar.
+
+Uso: python static_assets.py [ruta/al/frontend]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import uuid
+
+from flask import request, send_file
+
+from catalog import publish_directory, source_fingerprint
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_FORMAT_VERSION = 1
+STATIC_BUILD_DIRNAME = '.assets'
+
+# Tipos que merece la pena comprimir (JPEG y PNG ya van comprimidos)
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+# Una variante solo se guarda si ahorra al menos esta fracción del tamaño
+MIN_COMPRESSION_SAVING = 0.1
+
+# Codificaciones por orden de preferencia (nombre en Accept-Encoding, extensión)
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+class StaticAsset:
+    """Fichero servible: ruta del contenido, ETag, tipo y variantes comprimidas."""
+
+    def __init__(self, path, etag, mimetype, last_modified, encodings=None):
+        self.path = path
+        self.etag = etag
+        self.mimetype = mimetype
+        self.last_modified = last_modified
+        self.encodings = encodings or {}
+
+
+class StaticAssets:
+    """Recursos del frontend por ruta relativa ('index.html', 'images/foto.jpg')."""
+
+    def __init__(self, root, assets):
+        self.root = root
+        self.assets = assets
+
+    def __len__(self):
+        return len(self.assets)
+
+    def get(self, name):
+        """Recurso `name`, o None si no existe."""
+        return self.assets.get(name)
+
+
+def get_frontend_path():
+    """Obtener la ruta del frontend, intentando primero en backend/frontend (Railway) y luego en ../frontend (local)."""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    # Primero intentar en backend/frontend (para Railway)
+    frontend_path = os.path.join(backend_dir, 'frontend')
+    if os.path.exists(frontend_path):
+        return frontend_path
+    # Si no existe, intentar en ../frontend (desarrollo local)
+    parent_dir = os.path.dirname(backend_dir)
+    frontend_path = os.path.join(parent_dir, 'frontend')
+    return frontend_path
+
+
+def content_etag(data):
+    """ETag de un contenido (prefijo del SHA-256)."""
+    return hashlib.sha256(data).hexdigest()[:20]
+
+
+def guess_mimetype(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def iter_asset_names(root):
+    """Rutas relativas de los ficheros del frontend (sin ficheros ni directorios ocultos)."""
+    for directory, subdirs, files in os.walk(root):
+        subdirs[:] = sorted(name for name in subdirs if not name.startswith('.'))
+        for name in sorted(files):
+            if not name.startswith('.'):
+                yield os.path.relpath(os.path.join(directory, name), root).replace(os.sep, '/')
+
+
+def compress_variants(data, mimetype):
+    """
+    Variantes comprimidas de un contenido.
+
+    Returns:
+        dict: {codificación: bytes}, solo las que ahorran MIN_COMPRESSION_SAVING
+    """
+    if not mimetype.startswith(COMPRESSIBLE_TYPES):
+        return {}
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in variants.items()
+            if len(body) <= len(data) * (1 - MIN_COMPRESSION_SAVING)}
+
+
+def version_references(html, etags):
+    """Añadir ?v=<etag> a las referencias entre comillas a los recursos de `etags`."""
+    for name, etag in etags.items():
+        for quote in ('"', "'"):
+            for reference in (name, '/' + name):
+                html = html.replace(f'{quote}{reference}{quote}', f'{quote}{reference}?v={etag}{quote}')
+    return html
+
+
+def _write(directory, name, data):
+    path = os.path.join(directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return name
+
+
+def build_static_assets(root):
+    """
+    Precalcular ETags, variantes comprimidas y páginas versionadas del frontend.
+
+    Args:
+        root (str): Directorio del frontend
+
+    Returns:
+        dict: Manifiesto publicado en `<root>/.assets/manifest.json`
+    """
+    names = list(iter_asset_names(root))
+    tmp_dir = os.path.join(root, f'{STATIC_BUILD_DIRNAME}.tmp-{uuid.uuid4().hex}')
+    os.makedirs(tmp_dir)
+    try:
+        files = {}
+        etags = {}
+        # Primero los recursos que no son páginas: sus ETags versionan las referencias del HTML
+        for name in sorted(names, key=lambda name: guess_mimetype(name) == 'text/html'):
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            mimetype = guess_mimetype(name)
+            entry = {'source': source_fingerprint(path), 'mimetype': mimetype, 'file': None}
+
+            if mimetype == 'text/html':
+                try:
+                    versioned = version_references(data.decode('utf-8'), etags).encode('utf-8')
+                except UnicodeDecodeError:
+                    versioned = data
+                if versioned != data:
+                    data = versioned
+                    entry['file'] = _write(tmp_dir, name, data)
+            else:
+                etags[name] = content_etag(data)
+
+            entry['etag'] = content_etag(data)
+            entry['bytes'] = len(data)
+            variants = compress_variants(data, mimetype)
+            entry['encodings'] = {encoding: _write(tmp_dir, name + extension, variants[encoding])
+                                  for encoding, extension in ENCODINGS if encoding in variants}
+            files[name] = entry
+
+        manifest = {'format_version': STATIC_FORMAT_VERSION, 'files': files}
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    publish_directory(tmp_dir, os.path.join(root, STATIC_BUILD_DIRNAME))
+    return manifest
+
+
+def _read_manifest(build_dir):
+    try:
+        with open(os.path.join(build_dir, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('format_version') != STATIC_FORMAT_VERSION:
+        return {}
+    return manifest['files']
+
+
+def load_static_assets(root):
+    """
+    Cargar los recursos del frontend (una vez, al arrancar).
+
+    Se usa el manifiesto de `build_static_assets` para los ficheros que no han
+    cambiado desde el build; el resto se sirven tal cual.
+    """
+    build_dir = os.path.join(root, STATIC_BUILD_DIRNAME)
+    manifest = _read_manifest(build_dir)
+    assets = {}
+    for name in iter_asset_names(root):
+        path = os.path.join(root, name)
+        fingerprint = source_fingerprint(path)
+        last_modified = fingerprint['mtime_ns'] / 1e9
+        entry = manifest.get(name)
+        if entry is not None and entry['source'] == fingerprint:
+            content = os.path.join(build_dir, entry['file']) if entry['file'] else path
+            encodings = {encoding: os.path.join(build_dir, variant)
+                         for encoding, variant in entry['encodings'].items()}
+            assets[name] = StaticAsset(content, entry['etag'], entry['mimetype'], last_modified, encodings)
+        else:
+            with open(path, 'rb') as f:
+                etag = content_etag(f.read())
+            assets[name] = StaticAsset(path, etag, guess_mimetype(name), last_modified)
+    return StaticAssets(root, assets)
+
+
+def send_asset(asset, version=None):
+    """
+    Responder con un recurso, en la variante comprimida que acepte el cliente.
+
+    `send_file` responde 304 a If-None-Match/If-Modified-Since, atiende Range
+    e If-Range (206) y envía el fichero sin copiarlo a memoria (sendfile con
+    gunicorn). Cada variante tiene su propio ETag.
+
+    Args:
+        asset (StaticAsset): Recurso a servir
+        version (str): Parámetro `v` de la URL; si coincide con el ETag, la
+            respuesta se puede cachear indefinidamente
+    """
+    path, etag, content_encoding = asset.path, asset.etag, None
+    for encoding, _ in ENCODINGS:
+        if encoding in asset.encodings and request.accept_encodings.quality(encoding) > 0:
+            path, etag, content_encoding = asset.encodings[encoding], f'{asset.etag}-{encoding}', encoding
+            break
+
+    response = send_file(path, mimetype=asset.mimetype, etag=etag,
+                         last_modified=asset.last_modified, conditional=True)
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    response.vary.add('Accept-Encoding')
+    immutable = version is not None and version == asset.etag
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    return response
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Precalcular ETags y variantes comprimidas del frontend')
+    parser.add_argument('frontend', nargs='?', help='Directorio del frontend (por defecto, el del servidor)')
+    args = parser.parse_args()
+
+    root = args.frontend or get_frontend_path()
+    manifest = build_static_assets(root)
+    total = sum(entry['bytes'] for entry in manifest['files'].values())
+    compressed = sum(min([entry['bytes']] + [os.path.getsize(os.path.join(root, STATIC_BUILD_DIRNAME, variant))
+                                             for variant in entry['encodings'].values()])
+                     for entry in manifest['files'].values())
+    print(f"{len(manifest['files'])} recursos en {os.path.join(root, STATIC_BUILD_DIRNAME)}: "
+          f"{total / 1024:.1f} KB, {compressed / 1024:.1f} KB con la mejor variante comprimida")
@@ -0,0 +1,60 @@
+"""
+Fixtures de las pruebas: catálogos sintéticos generados con
+`benchmarks/generate_catalog.py` en directorios temporales.
+
+Uso (desde backend/):
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(TESTS_DIR)
+for path in (BACKEND_DIR, os.path.join(BACKEND_DIR, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from catalog import DATA_FILENAME  # noqa: E402
+from generate_catalog import generate  # noqa: E402
+
+CATALOG_ROWS = 3000
+CATALOG_CLUSTERS = 8
+
+
+def write_catalog(directory, df):
+    """Escribir un catálogo como `datos_procesados.csv` en `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    csv_path = os.path.join(directory, DATA_FILENAME)
+    df.to_csv(csv_path, index=False)
+    return csv_path
+
+
+@pytest.fixture(scope='session')
+def catalog_df():
+    """Catálogo sintético (el mismo en todas las pruebas)."""
+    return generate(CATALOG_ROWS, CATALOG_CLUSTERS, seed=0)
+
+
+@pytest.fixture
+def catalog_csv(catalog_df, tmp_path):
+    """CSV propio de la prueba: puede compilar snapshots o añadir artefactos sin afectar a otras."""
+    return write_catalog(str(tmp_path / 'data'), catalog_df)
+
+
+@pytest.fixture(scope='session')
+def app_module(catalog_df, tmp_path_factory):
+    """`app_flask` sirviendo el catálogo sintético."""
+    root = tmp_path_factory.mktemp('app')
+    os.environ['HARMONIC_DATA_PATH'] = write_catalog(str(root / 'data'), catalog_df)
+    os.environ['HARMONIC_RELOAD_TRIGGER'] = str(root / 'reload-trigger')
+    os.environ.pop('PLAYLIST_SESSION_DIR', None)
+    os.environ.pop('RESPONSE_CACHE_DIR', None)
+    import app_flask
+    return app_flask
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
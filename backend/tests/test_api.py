@@ -0,0 +1,84 @@
+"""Validación de entradas y paginación por cursor de la API."""
+import pytest
+
+from pagination import encode_cursor
+from similarity import MAX_K
+
+
+@pytest.mark.parametrize('body', [
+    [],
+    {'song_indices': []},
+    {'song_indices': 3},
+    {'song_indices': [1.5]},
+    {'song_indices': [True]},
+    {'song_indices': ['3']},
+    {'song_indices': [[1, 2]]},
+    {'song_indices': [None]},
+    {'song_indices': [-1]},
+    {'song_indices': [10 ** 9]},
+    {'song_indices': [1], 'k': 0},
+    {'song_indices': [1], 'k': MAX_K + 1},
+    {'song_indices': [1], 'k': '5'},
+    {'song_indices': [1], 'k': True},
+    {'song_indices': [1], 'catalog_version': 'desconocida'},
+])
+def test_batch_rejects_invalid_input(client, body):
+    response = client.post('/api/get-recommendations/batch', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_batch_rejects_oversized_batch(client, app_module):
+    body = {'song_indices': list(range(app_module.MAX_BATCH_SIZE + 1))}
+    assert client.post('/api/get-recommendations/batch', json=body).status_code == 400
+
+
+def test_batch_rejects_non_json_body(client):
+    response = client.post('/api/get-recommendations/batch', data='song_indices=1',
+                           content_type='application/x-www-form-urlencoded')
+    assert response.status_code == 400
+
+
+def test_batch_returns_one_entry_per_seed(client, app_module):
+    response = client.post('/api/get-recommendations/batch', json={'song_indices': [0, 7, 0]})
+    assert response.status_code == 200
+    results = response.get_json()
+    assert [entry['index'] for entry in results] == [0, 7, 0]
+    assert all(len(entry['recommendations']) == 5 for entry in results)
+
+    # Mismo resultado que la consulta individual
+    single = app_module.get_recommender().get_recommendations(7)
+    assert [song['id'] for song in results[1]['recommendations']] == [song['id'] for song in single]
+
+
+def test_cursor_pages_cover_the_listing(client):
+    expected = [song['id'] for song in client.get('/api/popular-songs?limit=500').get_json()]
+
+    ids, cursor, pages = [], '', 0
+    while cursor is not None and len(ids) < len(expected):
+        page = client.get('/api/popular-songs', query_string={'cursor': cursor, 'limit': 120}).get_json()
+        assert page['total'] >= len(expected)
+        ids.extend(song['id'] for song in page['songs'])
+        cursor = page['next_cursor']
+        pages += 1
+    assert ids[:len(expected)] == expected
+    assert pages == -(-len(expected) // 120)
+
+
+def test_stale_cursor_returns_410(client, app_module):
+    recommender = app_module.get_recommender()
+    view = recommender.listing_view('popular', None)
+    stale = encode_cursor(view, 20, 'version-anterior')
+    response = client.get('/api/popular-songs', query_string={'cursor': stale})
+    assert response.status_code == 410
+
+    current = encode_cursor(view, 20, recommender.version)
+    response = client.get('/api/popular-songs', query_string={'cursor': current, 'limit': 5})
+    assert response.status_code == 200
+    first = client.get('/api/popular-songs?limit=25').get_json()
+    assert [song['id'] for song in response.get_json()['songs']] == [song['id'] for song in first[20:25]]
+
+
+@pytest.mark.parametrize('cursor', ['no-es-un-cursor', encode_cursor('otra-vista', 0, 'v')])
+def test_invalid_cursor_returns_400(client, cursor):
+    assert client.get('/api/popular-songs', query_string={'cursor': cursor}).status_code == 400
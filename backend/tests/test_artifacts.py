@@ -0,0 +1,80 @@
+"""Artefactos precalculados: tabla de vecinos e ingesta incremental."""
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog import load_snapshot
+from conftest import write_catalog
+from ingest import ingest_csv
+from neighbor_table import build_neighbor_table
+from recommender import SongRecommender
+
+
+def assert_same_songs(actual, expected):
+    assert [song['id'] for song in actual] == [song['id'] for song in expected]
+    assert np.allclose([song['distance'] for song in actual], [song['distance'] for song in expected], atol=1e-5)
+
+
+def test_neighbor_table_matches_live_search(catalog_csv):
+    live = SongRecommender(catalog_csv)
+    assert live.neighbor_table is None
+
+    snapshot = load_snapshot(catalog_csv)
+    rows = np.arange(0, snapshot.n_rows, 3)
+    build_neighbor_table(snapshot, rows=rows, workers=1)
+    table = SongRecommender(catalog_csv)
+    assert table.neighbor_table is not None
+
+    # Filas con vecinos precalculados y filas que siguen resolviéndose con los índices KNN
+    for row in list(rows[:150]) + [1, 2, 4, 5, snapshot.n_rows - 1]:
+        assert_same_songs(table.get_recommendations(int(row)), live.get_recommendations(int(row)))
+
+    seeds = [int(row) for row in rows[:20]] + [1, 2]
+    for with_table, without in zip(table.get_recommendations_batch(seeds, 7), live.get_recommendations_batch(seeds, 7)):
+        assert with_table['index'] == without['index']
+        assert_same_songs(with_table['recommendations'], without['recommendations'])
+
+
+@pytest.fixture
+def split_catalog(catalog_df, tmp_path):
+    """Catálogo base, CSV de canciones nuevas (con algunas repetidas) y número de filas nuevas."""
+    n_new = 400
+    base, delta = catalog_df.iloc[:-n_new], catalog_df.iloc[-n_new:]
+    csv_path = write_catalog(str(tmp_path / 'incremental'), base)
+    delta_path = str(tmp_path / 'nuevas.csv')
+    pd.concat([delta, base.iloc[:25]]).drop(columns=['cluster']).to_csv(delta_path, index=False)
+    return csv_path, delta_path, n_new
+
+
+def test_ingest_matches_full_recompile(split_catalog, tmp_path):
+    csv_path, delta_path, n_new = split_catalog
+    SongRecommender(csv_path).warm_up()
+
+    report = ingest_csv(delta_path, csv_path, chunk_rows=150)
+    assert (report['added'], report['skipped']) == (n_new, 25)
+
+    # Recompilar desde cero el CSV resultante
+    os.makedirs(tmp_path / 'full')
+    full_csv = shutil.copy(csv_path, str(tmp_path / 'full' / os.path.basename(csv_path)))
+
+    incremental, full = SongRecommender(csv_path), SongRecommender(full_csv)
+    assert incremental.snapshot.is_fresh(csv_path)
+    assert len(incremental.df) == len(full.df) == report['n_rows']
+    for column in full.df.columns:
+        assert incremental.df[column].astype(str).tolist() == full.df[column].astype(str).tolist(), column
+    assert np.array_equal(incremental.feature_matrix, full.feature_matrix)
+    assert report['rebuilt_clusters'] and len(full.knn_models) == len(incremental.knn_models)
+    for cluster in full.knn_models:
+        assert np.array_equal(incremental.knn_models[cluster]['indices'], full.knn_models[cluster]['indices'])
+    for name in full.views.views:
+        assert np.array_equal(incremental.views.views[name], full.views.views[name]), name
+
+    for row in np.random.default_rng(0).choice(len(full.df), 100, replace=False):
+        assert incremental.get_recommendations(int(row)) == full.get_recommendations(int(row))
+    assert incremental.search_suggestions('lov') == full.search_suggestions('lov')
+
+    # Repetir la ingesta no añade nada
+    assert ingest_csv(delta_path, csv_path)['added'] == 0
@@ -0,0 +1,67 @@
+"""Sesiones de listas de reproducción compartidas entre workers."""
+import pytest
+
+from playlist import MAX_POOL_SIZE, PlaylistSessions, primary_artist
+from recommender import SongRecommender
+
+
+@pytest.fixture
+def recommender(catalog_csv):
+    return SongRecommender(catalog_csv)
+
+
+def song_ids(songs):
+    return [song['id'] for song in songs]
+
+
+def test_session_hands_off_between_workers(recommender, tmp_path):
+    # Dos procesos con el mismo directorio compartido, atendiendo peticiones alternas
+    workers = [PlaylistSessions(shared_dir=str(tmp_path)), PlaylistSessions(shared_dir=str(tmp_path))]
+    session, songs = recommender.start_playlist([0, 1], n=10)
+    workers[0].save(session)
+    seen = song_ids(songs)
+
+    for turn in range(6):
+        sessions = workers[turn % 2]
+        current = sessions.get(session.id)
+        assert current is not None
+        page = recommender.extend_playlist(current, 10)
+        sessions.save(current)
+        assert not set(song_ids(page)) & set(seen)
+        seen.extend(song_ids(page))
+
+    assert len(seen) == len(set(seen))
+    assert workers[0].get(session.id).revision == workers[1].get(session.id).revision == 7
+
+
+def test_stale_in_memory_copy_is_replaced(recommender, tmp_path):
+    first, second = PlaylistSessions(shared_dir=str(tmp_path)), PlaylistSessions(shared_dir=str(tmp_path))
+    session, _ = recommender.start_playlist([3], n=5)
+    first.save(session)
+
+    # El segundo worker amplía la lista; el primero conserva su copia en memoria
+    other = second.get(session.id)
+    recommender.extend_playlist(other, 5)
+    second.save(other)
+
+    current = first.get(session.id)
+    assert current is not session
+    assert current.played == other.played
+
+
+def test_session_without_shared_dir_stays_in_process(recommender):
+    first, second = PlaylistSessions(), PlaylistSessions()
+    session, _ = recommender.start_playlist([0], n=5)
+    first.save(session)
+    assert first.get(session.id) is session
+    assert second.get(session.id) is None
+
+
+def test_artist_cap_keeps_pool_bounded(recommender):
+    session, songs = recommender.start_playlist([0, 1], n=50, artist_cap=1)
+    for _ in range(5):
+        songs += recommender.extend_playlist(session, 200)
+    assert session.pool_size <= MAX_POOL_SIZE
+    artists = [primary_artist(str(song['artists'])) for song in songs]
+    assert len(artists) == len(set(artists))
+    assert len(song_ids(songs)) == len(set(song_ids(songs)))
@@ -0,0 +1,132 @@
+"""
+Vistas materializadas con los rankings de canciones populares, por estado de
+ánimo y por característica.
+
+El vocabulario de estados de ánimo y características es pequeño y fijo (ver
+`rules.json`), así que la lista ordenada de filas de cada regla se calcula una
+sola vez al cargar el catálogo (y se guarda dentro del snapshot). Una petición
+solo tiene que cortar los primeros `limit` elementos.
+"""
+import os
+import uuid
+
+import numpy as np
+
+from catalog import publish_directory
+from rules import RuleEngine
+
+VIEWS_FORMAT_VERSION = 1
+VIEWS_DIRNAME = 'views'
+
+POPULAR_VIEW = 'popular'
+POPULAR_SORT = [('popularity_original', True)]
+
+
+class MaterializedViews:
+    """Rankings precalculados: nombre de vista -> filas ordenadas."""
+
+    def __init__(self, views, rules):
+        self.views = views
+        self.rules = rules
+
+    @classmethod
+    def build(cls, engine, rules):
+        """Evaluar todas las reglas con el motor de reglas."""
+        views = {POPULAR_VIEW: engine.evaluate([], POPULAR_SORT)}
+        views.update({f'mood:{name}': rows
+                      for name, rows in engine.evaluate_rules(rules.moods).items()})
+        views.update({f'feature:{name}': rows
+                      for name, rows in engine.evaluate_rules(rules.features).items()})
+        return cls(views, rules)
+
+    @staticmethod
+    def view_names(rules):
+        return list(_view_rules(rules))
+
+    def extended(self, df, start):
+        """
+        Vistas con las filas nuevas del catálogo (a partir de `start`) intercaladas.
+
+        Las condiciones solo se evalúan sobre las filas nuevas; después cada
+        vista se reordena con las filas antiguas delante, de modo que ante
+        empates se conserva el orden del catálogo, igual que al construirla
+        entera.
+        """
+        engine = RuleEngine(df)
+        delta_engine = RuleEngine(df.iloc[start:])
+        views = {}
+        for name, (where, sort) in _view_rules(self.rules).items():
+            new_rows = delta_engine.evaluate(where, sort).astype(np.int64) + start
+            views[name] = engine.order(np.concatenate([np.asarray(self.views[name], dtype=np.int64), new_rows]), sort)
+        return MaterializedViews(views, self.rules)
+
+    def top(self, name, limit):
+        """Primeras `limit` filas de una vista."""
+        return self.views[name][:limit]
+
+    def page(self, name, offset, limit):
+        """Filas de una vista a partir de la posición `offset` (como mucho `limit`)."""
+        return self.views[name][offset:offset + limit]
+
+    def size(self, name):
+        """Número de filas de una vista."""
+        return len(self.views[name])
+
+    def mood_view(self, mood):
+        """Nombre de la vista de un estado de ánimo (None si no se reconoce)."""
+        rule = self.rules.mood(mood)
+        return f'mood:{rule.name}' if rule else None
+
+    def feature_view(self, feature):
+        """Nombre de la vista de una característica (None si no se reconoce)."""
+        return f'feature:{feature}' if feature in self.rules.features else None
+
+
+def _view_rules(rules):
+    """Condiciones y ordenación de cada vista: {nombre: (where, sort)}."""
+    views = {POPULAR_VIEW: ([], POPULAR_SORT)}
+    views.update({f'mood:{name}': (rule.where, rule.sort) for name, rule in rules.moods.items()})
+    views.update({f'feature:{name}': (rule.where, rule.sort) for name, rule in rules.features.items()})
+    return views
+
+
+def _view_filename(name):
+    return name.replace(':', '__') + '.npy'
+
+
+def _version_tag(rules, n_rows):
+    # Las vistas dependen del catálogo y del contenido de rules.json
+    return [str(VIEWS_FORMAT_VERSION), str(n_rows), rules.fingerprint]
+
+
+def save_views(views, directory, n_rows):
+    """Guardar las vistas en `directory` de forma atómica."""
+    path = os.path.join(directory, VIEWS_DIRNAME)
+    tmp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+    os.makedirs(tmp_path)
+    for name, rows in views.views.items():
+        np.save(os.path.join(tmp_path, _view_filename(name)), rows)
+    with open(os.path.join(tmp_path, 'VERSION'), 'w') as f:
+        f.write(' '.join(_version_tag(views.rules, n_rows)))
+    publish_directory(tmp_path, path)
+    return path
+
+
+def load_views(directory, n_rows, rules):
+    """
+    Cargar las vistas guardadas en `directory` (memory-mapped).
+
+    Returns:
+        MaterializedViews: Vistas cargadas, o None si no existen o no corresponden
+        al catálogo o a las reglas actuales
+    """
+    path = os.path.join(directory, VIEWS_DIRNAME)
+    try:
+        with open(os.path.join(path, 'VERSION')) as f:
+            if f.read().split() != _version_tag(rules, n_rows):
+                return None
+        views = {name: np.load(os.path.join(path, _view_filename(name)), mmap_mode='r')
+                 for name in MaterializedViews.view_names(rules)}
+    except OSError:
+        return None
+    return MaterializedViews(views, rules)